@@ -1,20 +1,54 @@
 import os
+import io
+import random
 import json
+import asyncio
 import base64
+import email.utils
 import hashlib
 import ipaddress
-import urllib.request
-import urllib.error
+import http.client
+import ssl
+import threading
+import time
 import urllib.parse
-from urllib.parse import urlparse, urljoin
+import urllib.request
+from urllib.parse import unquote, urlparse, urljoin, urlunparse
 import logging
 import socket
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Union, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union, Tuple
+
+from metrics import counter, histogram
 
 
 logger = logging.getLogger(__name__)
 
+API_LATENCY = histogram(
+    "nanobanano_api_request_seconds", "API request attempt duration incl. redirects, by client and outcome.",
+    ("client", "outcome"),
+)
+API_ERRORS = counter(
+    "nanobanano_api_errors_total", "Failed API request attempts by HTTP status (or network/circuit_open/other).",
+    ("client", "status"),
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return int(raw) if raw else int(default)
+    except Exception:
+        return int(default)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return float(raw) if raw else float(default)
+    except Exception:
+        return float(default)
+
 
 def get_api_config() -> Dict[str, Any]:
     """Читает конфиг API из переменных окружения.
@@ -34,8 +68,75 @@ def get_api_config() -> Dict[str, Any]:
     }
 
 
-def _is_private_host(host: str) -> bool:
-    """SSRF guard.
+def _is_blocked_ip(ip: ipaddress._BaseAddress) -> bool:  # type: ignore[attr-defined]
+    return bool(
+        ip.is_private
+        or ip.is_loopback
+        or ip.is_link_local
+        or ip.is_reserved
+        or ip.is_multicast
+        or ip.is_unspecified
+    )
+
+
+class _HostResolutionCache:
+    """Кэш DNS-резолва для SSRF guard: hostname -> IP-адреса с коротким TTL.
+
+    Неудачный резолв тоже кэшируется (negative_ttl), чтобы сломанный DNS
+    не превращал каждый запрос в блокирующий getaddrinfo.
+    """
+
+    def __init__(self, ttl: float = 30.0, negative_ttl: float = 5.0, max_entries: int = 256):
+        self.ttl = max(0.0, float(ttl))
+        self.negative_ttl = max(0.0, float(negative_ttl))
+        self.max_entries = max(1, int(max_entries))
+        self._entries: Dict[str, Tuple[Tuple[str, ...], float]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str) -> Tuple[str, ...]:
+        """Все A/AAAA адреса хоста; () если резолв не удался."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(host)
+            if hit is not None and hit[1] > now:
+                return hit[0]
+
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except OSError:
+            infos = []
+
+        resolved: List[str] = []
+        for family, _, _, _, sockaddr in infos:
+            if family in (socket.AF_INET, socket.AF_INET6) and sockaddr[0] not in resolved:
+                resolved.append(sockaddr[0])
+        ips = tuple(resolved)
+
+        ttl = self.ttl if ips else self.negative_ttl
+        if ttl > 0:
+            with self._lock:
+                if len(self._entries) >= self.max_entries and host not in self._entries:
+                    # Drop expired entries first, then the oldest inserted one.
+                    for k in [k for k, (_, exp) in self._entries.items() if exp <= now]:
+                        self._entries.pop(k, None)
+                    if len(self._entries) >= self.max_entries:
+                        self._entries.pop(next(iter(self._entries)), None)
+                self._entries[host] = (ips, now + ttl)
+        return ips
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_DNS_CACHE = _HostResolutionCache(
+    ttl=_env_float("NANOBANANO_DNS_CACHE_TTL_SEC", 30.0),
+    negative_ttl=_env_float("NANOBANANO_DNS_NEGATIVE_TTL_SEC", 5.0),
+)
+
+
+def _safe_host_ips(host: str) -> Tuple[str, ...]:
+    """SSRF guard: IP-адреса хоста, если он безопасен; () если хост заблокирован.
 
     Блокируем:
       - localhost / *.localhost / *.local
@@ -46,54 +147,35 @@ def _is_private_host(host: str) -> bool:
     """
     h = (host or "").strip().lower()
     if not h:
-        return True
+        return ()
     if h in {"localhost", "localhost."}:
-        return True
+        return ()
     if h.endswith(".localhost") or h.endswith(".local"):
-        return True
-
-    def _is_blocked_ip(ip: ipaddress._BaseAddress) -> bool:  # type: ignore[attr-defined]
-        return bool(
-            ip.is_private
-            or ip.is_loopback
-            or ip.is_link_local
-            or ip.is_reserved
-            or ip.is_multicast
-            or ip.is_unspecified
-        )
+        return ()
 
     # Если это IP-адрес — блокируем private/loopback/link-local и т.п.
     try:
         ip = ipaddress.ip_address(h)
-        return _is_blocked_ip(ip)
+        return () if _is_blocked_ip(ip) else (str(ip),)
     except ValueError:
         pass
 
-    # Если это домен — делаем DNS resolve и блокируем, если *любой* IP небезопасен.
-    try:
-        infos = socket.getaddrinfo(h, None, type=socket.SOCK_STREAM)
-    except OSError:
-        return True
-
-    resolved: set[str] = set()
-    for family, _, _, _, sockaddr in infos:
-        if family == socket.AF_INET:
-            resolved.add(sockaddr[0])
-        elif family == socket.AF_INET6:
-            resolved.add(sockaddr[0])
-
-    if not resolved:
-        return True
-
-    for ip_str in resolved:
+    # Если это домен — делаем DNS resolve (с TTL-кэшем) и блокируем, если *любой* IP небезопасен.
+    safe: List[str] = []
+    for ip_str in _DNS_CACHE.resolve(h):
         try:
             ip_obj = ipaddress.ip_address(ip_str)
         except ValueError:
             continue
         if _is_blocked_ip(ip_obj):
-            return True
+            return ()
+        safe.append(ip_str)
+    return tuple(safe)
 
-    return False
+
+def _is_private_host(host: str) -> bool:
+    """SSRF guard (см. `_safe_host_ips`)."""
+    return not _safe_host_ips(host)
 
 
 def _validate_base_url(base_url: str) -> str:
@@ -134,36 +216,179 @@ def _validate_base_url(base_url: str) -> str:
     )
 
 
-def _read_bytes(uploaded_file) -> bytes:
-    """Streamlit UploadedFile обычно имеет getvalue(); поддержим и read()."""
+# Chunk size for hashing/encoding uploads. Multiple of 3, so full chunks
+# encode to base64 without padding (short reads are re-aligned in iter_encoded).
+_FILE_CHUNK_BYTES = 3 * 256 * 1024
+
+
+def _iter_file_chunks(uploaded_file, chunk_size: int = _FILE_CHUNK_BYTES) -> Iterator[Union[bytes, memoryview]]:
+    """Итерирует содержимое файла кусками без полной копии в память.
+
+    Streamlit UploadedFile — это BytesIO: берём memoryview через getbuffer()
+    (zero-copy). Иначе — seek(0)+read() кусками; getvalue() — последний вариант.
+    """
     if uploaded_file is None:
-        return b""
-    if hasattr(uploaded_file, "getvalue"):
-        return uploaded_file.getvalue() or b""
+        return
+    if hasattr(uploaded_file, "getbuffer"):
+        # Fall back only if the buffer cannot be taken: once chunks are
+        # yielded, a fallback would yield the same bytes again.
+        try:
+            view = uploaded_file.getbuffer()
+        except (AttributeError, TypeError, ValueError, BufferError):
+            view = None
+        if view is not None:
+            try:
+                for i in range(0, len(view), chunk_size):
+                    yield view[i:i + chunk_size]
+            finally:
+                try:
+                    view.release()
+                except BufferError:
+                    pass
+            return
     if hasattr(uploaded_file, "read"):
-        return uploaded_file.read() or b""
-    return b""
+        try:
+            uploaded_file.seek(0)
+        except Exception:
+            pass
+        while True:
+            chunk = uploaded_file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        try:
+            uploaded_file.seek(0)
+        except Exception:
+            pass
+        return
+    if hasattr(uploaded_file, "getvalue"):
+        data = uploaded_file.getvalue() or b""
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+
+def _sha256_and_size(uploaded_file) -> Tuple[str, int]:
+    h = hashlib.sha256()
+    size = 0
+    for chunk in _iter_file_chunks(uploaded_file):
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+
+class InlineBase64:
+    """Ленивое base64-представление файла для payload.
+
+    Не хранит закодированную строку: при отправке (`JsonBody`) base64 пишется
+    в тело запроса кусками прямо из буфера файла.
+    """
+
+    __slots__ = ("file_obj", "size")
+
+    def __init__(self, file_obj, size: int):
+        self.file_obj = file_obj
+        self.size = int(size)
+
+    @property
+    def encoded_len(self) -> int:
+        return 4 * ((self.size + 2) // 3)
+
+    def iter_encoded(self) -> Iterator[bytes]:
+        # Encode only multiples of 3 bytes and carry the remainder: a short
+        # read() must not put "=" padding in the middle of the stream.
+        rest = b""
+        for chunk in _iter_file_chunks(self.file_obj):
+            data = rest + chunk if rest else chunk
+            cut = len(data) - len(data) % 3
+            if cut:
+                yield base64.b64encode(data[:cut])
+            rest = bytes(data[cut:])
+        if rest:
+            yield base64.b64encode(rest)
+
+    def __str__(self) -> str:
+        # Materializes the whole string; only for display/compatibility.
+        return b"".join(self.iter_encoded()).decode("ascii")
+
+    def __repr__(self) -> str:
+        return f"InlineBase64(size={self.size})"
+
+
+def json_default(obj: Any) -> Any:
+    """`default=` для json.dumps: материализует InlineBase64 (для совместимости)."""
+    if isinstance(obj, InlineBase64):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JsonBody:
+    """Re-iterable JSON request body that streams InlineBase64 values.
+
+    `len()` is known up front (for Content-Length) without encoding the files;
+    iterating again (e.g. on a 307/308 redirect) re-reads the file buffers.
+    """
+
+    def __init__(self, payload: Any):
+        self._parts = list(self._iter_parts(payload))
 
+    @classmethod
+    def _iter_parts(cls, obj: Any) -> Iterator[Union[bytes, InlineBase64]]:
+        if isinstance(obj, InlineBase64):
+            yield obj
+        elif isinstance(obj, dict):
+            yield b"{"
+            for i, (k, v) in enumerate(obj.items()):
+                prefix = b"," if i else b""
+                yield prefix + json.dumps(str(k), ensure_ascii=False).encode("utf-8") + b":"
+                yield from cls._iter_parts(v)
+            yield b"}"
+        elif isinstance(obj, (list, tuple)):
+            yield b"["
+            for i, v in enumerate(obj):
+                if i:
+                    yield b","
+                yield from cls._iter_parts(v)
+            yield b"]"
+        else:
+            yield json.dumps(obj, ensure_ascii=False).encode("utf-8")
 
-def _sha256(data: bytes) -> str:
-    return hashlib.sha256(data or b"").hexdigest()
+    def __len__(self) -> int:
+        return sum((p.encoded_len + 2) if isinstance(p, InlineBase64) else len(p) for p in self._parts)
 
+    def __iter__(self) -> Iterator[bytes]:
+        buf: List[bytes] = []
+        for p in self._parts:
+            if isinstance(p, InlineBase64):
+                buf.append(b'"')
+                yield b"".join(buf)
+                buf = []
+                yield from p.iter_encoded()
+                buf.append(b'"')
+            else:
+                buf.append(p)
+        if buf:
+            yield b"".join(buf)
 
-def _b64(data: bytes) -> str:
-    return base64.b64encode(data or b"").decode("utf-8")
 
+def encode_json_body(payload: Any) -> bytes:
+    """Полное тело запроса одним bytes (для тестов/логики вне HTTP-клиента)."""
+    return b"".join(JsonBody(payload))
 
-def _file_meta(file_obj, include_bytes: bool = False, max_inline_bytes: int = 2_000_000) -> Dict[str, Any]:
-    data = _read_bytes(file_obj)
+
+def _file_meta(
+    file_obj, include_bytes: bool = False, max_inline_bytes: int = 2_000_000, stream_bytes: bool = False
+) -> Dict[str, Any]:
+    digest, size = _sha256_and_size(file_obj)
     name = getattr(file_obj, "name", "file")
     out: Dict[str, Any] = {
         "name": name,
-        "size": len(data),
-        "sha256": _sha256(data),
+        "size": size,
+        "sha256": digest,
         "inline_included": False,
     }
-    if include_bytes and len(data) <= max_inline_bytes:
-        out["base64"] = _b64(data)
+    if include_bytes and size <= max_inline_bytes:
+        inline = InlineBase64(file_obj, size)
+        out["base64"] = inline if stream_bytes else str(inline)
         out["inline_included"] = True
     return out
 
@@ -188,102 +413,1004 @@ def normalize_refs(image_urls: Dict[str, List[str]]) -> Dict[str, List[Dict[str,
     return out
 
 
+@dataclass(frozen=True)
+class _Proxy:
+    host: str
+    port: int
+    headers: Tuple[Tuple[str, str], ...] = ()  # Proxy-Authorization
+
+    @property
+    def route(self) -> str:
+        return f"proxy:{self.host}:{self.port}"
+
+
+def _proxy_for(scheme: str, host: str) -> Optional[_Proxy]:
+    """HTTP(S)_PROXY / NO_PROXY, as urllib's opener (used before the pool) applied them.
+
+    Only http:// proxies are supported (CONNECT tunnel for https targets,
+    absolute-form requests for http); anything else fails loudly instead of
+    silently bypassing the proxy.
+    """
+    raw = urllib.request.getproxies().get(scheme)
+    if not raw or urllib.request.proxy_bypass(host):
+        return None
+    parsed = urlparse(raw if "://" in raw else "http://" + raw)
+    if parsed.scheme != "http" or not parsed.hostname:
+        raise RuntimeError(f"API request failed (unsupported {scheme}_proxy: only http://host:port proxies).")
+    headers: Tuple[Tuple[str, str], ...] = ()
+    if parsed.username:
+        cred = f"{unquote(parsed.username)}:{unquote(parsed.password or '')}".encode("utf-8")
+        headers = (("Proxy-Authorization", "Basic " + base64.b64encode(cred).decode("ascii")),)
+    return _Proxy(parsed.hostname, parsed.port or 80, headers)
+
+
+def _proxy_request(
+    url: str, target: str, headers: Dict[str, str], proxy: Optional[_Proxy]
+) -> Tuple[str, Dict[str, str]]:
+    """Plain-http requests through a proxy use the absolute URL and carry the proxy credentials."""
+    if proxy is None or urlparse(url).scheme != "http":
+        return target, headers
+    parsed = urlparse(url)
+    absolute = urlunparse((parsed.scheme, parsed.netloc, parsed.path or "/", "", parsed.query, ""))
+    return absolute, {**headers, **dict(proxy.headers)}
+
+
+# (scheme, hostname, port). The pinned IP is stored per idle connection and
+# checked on reuse, so DNS rotation does not leave keys with orphaned sockets.
+_PoolKey = Tuple[str, str, int]
+
+_RETRYABLE_STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+# The async parser reads with readexactly(): a peer closing an idle keep-alive
+# connection mid-response surfaces as IncompleteReadError.
+_ASYNC_RETRYABLE_STALE_ERRORS = _RETRYABLE_STALE_ERRORS + (asyncio.IncompleteReadError,)
+
+
+class HTTPConnectionPool:
+    """Keep-alive пул HTTP/1.1 соединений по (scheme, host, port).
+
+    Соединение открывается на заранее провалидированный IP (SSRF guard),
+    а Host/SNI/проверка сертификата идут по исходному hostname. Простаивающее
+    соединение переиспользуется только для того же pinned IP; после смены
+    IP в DNS старые закрываются.
+
+    - max_per_host: сколько простаивающих соединений держим на хост
+      (параллельные запросы сверх лимита открывают новые, лишние закрываются)
+    - max_idle_total: потолок простаивающих соединений на весь пул
+    - idle_timeout: простаивающее дольше соединение закрывается (проверка
+      по всему пулу на каждом acquire/release)
+    """
+
+    def __init__(self, max_per_host: int = 4, idle_timeout: float = 60.0, max_idle_total: int = 32):
+        self.max_per_host = max(0, int(max_per_host))
+        self.idle_timeout = max(0.0, float(idle_timeout))
+        self.max_idle_total = max(0, int(max_idle_total))
+        # key -> [(connection, last_used, pinned IP or proxy route)]
+        self._idle: Dict[_PoolKey, List[Tuple[http.client.HTTPConnection, float, str]]] = {}
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def _new_connection(
+        self, key: _PoolKey, pinned_ip: str, timeout: float, proxy: Optional[_Proxy] = None
+    ) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        conn: http.client.HTTPConnection
+        if scheme == "https" and self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        if proxy is not None:
+            # The proxy resolves and connects to the target; TLS (SNI, certificate) still uses the hostname.
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(proxy.host, proxy.port, timeout=timeout, context=self._ssl_context)
+                conn.set_tunnel(host, port, headers=dict(proxy.headers))
+            else:
+                conn = http.client.HTTPConnection(proxy.host, proxy.port, timeout=timeout)
+            return conn
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+        # DNS-rebinding mitigation: connect to the IP that passed the SSRF check,
+        # never re-resolve the hostname here.
+        def _create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+            return socket.create_connection((pinned_ip, address[1]), timeout, source_address)
+
+        conn._create_connection = _create_connection  # type: ignore[attr-defined]
+        return conn
+
+    def _sweep_locked(self, now: float) -> List[http.client.HTTPConnection]:
+        """Removes expired idle connections of every key; caller closes them outside the lock."""
+        expired: List[http.client.HTTPConnection] = []
+        for key in list(self._idle):
+            keep = []
+            for entry in self._idle[key]:
+                if now - entry[1] <= self.idle_timeout and entry[0].sock is not None:
+                    keep.append(entry)
+                else:
+                    expired.append(entry[0])
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        self._idle_count -= len(expired)
+        return expired
+
+    def acquire(
+        self, key: _PoolKey, pinned_ip: str, timeout: float, proxy: Optional[_Proxy] = None
+    ) -> Tuple[http.client.HTTPConnection, bool]:
+        """Returns (connection, reused)."""
+        route = proxy.route if proxy is not None else pinned_ip
+        conn = None
+        with self._lock:
+            stale = self._sweep_locked(time.monotonic())
+            idle = self._idle.get(key) or []
+            while idle:
+                cand, _, cand_route = idle.pop()
+                self._idle_count -= 1
+                if cand_route == route:
+                    conn = cand
+                    break
+                stale.append(cand)  # the host now resolves elsewhere (or the proxy changed)
+            if not idle:
+                self._idle.pop(key, None)
+        for c in stale:
+            c.close()
+        if conn is None:
+            return self._new_connection(key, pinned_ip, timeout, proxy), False
+        try:
+            conn.sock.settimeout(timeout)
+        except Exception:
+            conn.close()
+            return self._new_connection(key, pinned_ip, timeout, proxy), False
+        return conn, True
+
+    def release(self, key: _PoolKey, route: str, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        """`route`: the pinned IP, or _Proxy.route for proxied connections."""
+        if not reusable or conn.sock is None:
+            conn.close()
+            return
+        with self._lock:
+            now = time.monotonic()
+            stale = self._sweep_locked(now)
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host and self._idle_count < self.max_idle_total:
+                idle.append((conn, now, route))
+                self._idle_count += 1
+                conn = None
+            elif not idle:
+                del self._idle[key]
+        for c in stale:
+            c.close()
+        if conn is not None:
+            conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [entry[0] for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+            self._idle_count = 0
+        for c in conns:
+            c.close()
+
+
+_default_pool: Optional[HTTPConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> HTTPConnectionPool:
+    """Process-wide pool (NANOBANANO_HTTP_POOL_SIZE, NANOBANANO_HTTP_POOL_IDLE_SEC)."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HTTPConnectionPool(
+                max_per_host=_env_int("NANOBANANO_HTTP_POOL_SIZE", 4),
+                idle_timeout=_env_float("NANOBANANO_HTTP_POOL_IDLE_SEC", 60.0),
+            )
+        return _default_pool
+
+
+def _validate_request_url(u: str, allow_http: bool) -> str:
+    """Validate immediately before any network I/O; returns the IP to connect to.
+
+    The returned IP is the one that passed the SSRF check: connecting to it
+    (instead of re-resolving the hostname) closes the DNS-rebinding window.
+    """
+    parsed = urlparse(u)
+    if parsed.scheme not in {"https", "http"}:
+        raise RuntimeError("Invalid API URL scheme")
+    if parsed.scheme == "http" and not allow_http:
+        raise RuntimeError("Insecure http is not allowed")
+    if parsed.username or parsed.password:
+        raise RuntimeError("Invalid API URL userinfo")
+    host = parsed.hostname
+    if not host:
+        raise RuntimeError("Invalid API URL host")
+    ips = _safe_host_ips(host)
+    if not ips:
+        raise RuntimeError("Blocked private/loopback API host")
+    return ips[0]
+
+
+@dataclass
+class _Response:
+    status: int
+    reason: str
+    headers: http.client.HTTPMessage
+    body: bytes
+
+
+_MAX_REDIRECTS = 5
+
+
+def _allow_insecure_http() -> bool:
+    return os.getenv("NANOBANANO_ALLOW_INSECURE_HTTP", "").strip().lower() in {"1", "true", "yes"}
+
+
+def _api_headers(api_key: str) -> Dict[str, str]:
+    h = {"Content-Type": "application/json"}
+    if api_key:
+        h["Authorization"] = f"Bearer {api_key}"
+    return h
+
+
+def _decode_json_response(body: bytes) -> Dict[str, Any]:
+    raw = body.decode("utf-8", errors="ignore")
+    try:
+        return json.loads(raw) if raw else {"ok": True}
+    except Exception:
+        return {"ok": True, "raw": raw}
+
+
+def _redirect_target(resp: _Response, current_url: str, allow_http: bool) -> Optional[str]:
+    """Handle redirects safely: validate each target before following."""
+    if resp.status not in {301, 302, 303, 307, 308}:
+        return None
+    location = (resp.headers.get("Location") or "").strip()
+    if not location:
+        return None
+    next_url = urljoin(current_url, location)
+    _validate_request_url(next_url, allow_http)
+    return next_url
+
+
+# -----------------------------
+# Retry / circuit breaker
+# -----------------------------
+class APIRequestError(RuntimeError):
+    """Ошибка запроса к API. Текст прежний ("API request failed (...)"), плюс детали для retry."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def is_backend_failure(self) -> bool:
+        """Сетевая ошибка, 5xx или 429: считается падением бэкенда для circuit breaker."""
+        return self.status is None or self.status >= 500 or self.status == 429
+
+
+class CircuitOpenError(APIRequestError):
+    """Circuit breaker открыт: запрос не отправлялся."""
+
+
+def _record_attempt(client: str, started: float, err: Optional[BaseException] = None) -> None:
+    """Latency histogram + error counter for one attempt (metrics.py)."""
+    API_LATENCY.observe(time.perf_counter() - started, client=client, outcome="ok" if err is None else "error")
+    if isinstance(err, APIRequestError):
+        API_ERRORS.inc(client=client, status=str(err.status) if err.status else "network")
+    elif isinstance(err, Exception):
+        API_ERRORS.inc(client=client, status="other")
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After: delta-seconds или HTTP-date."""
+    raw = (value or "").strip()
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Повторы на 429/502/503/504 и отказ в соединении (запрос не дошёл до сервера).
+
+    Задержка — exponential backoff с full jitter: uniform(0, min(max_delay, base_delay * 2**n)).
+    Retry-After сервера соблюдается, но если он больше max_retry_after — не ждём, а падаем сразу.
+    max_attempts=1 отключает повторы.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    max_retry_after: float = 30.0
+    retry_statuses: frozenset = frozenset({429, 502, 503, 504})
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=max(1, _env_int("NANOBANANO_RETRY_MAX_ATTEMPTS", 3)),
+            base_delay=max(0.0, _env_float("NANOBANANO_RETRY_BASE_DELAY_SEC", 0.5)),
+            max_delay=max(0.0, _env_float("NANOBANANO_RETRY_MAX_DELAY_SEC", 8.0)),
+            max_retry_after=max(0.0, _env_float("NANOBANANO_RETRY_MAX_RETRY_AFTER_SEC", 30.0)),
+        )
+
+    def is_retryable(self, err: APIRequestError) -> bool:
+        if isinstance(err, CircuitOpenError):
+            return False
+        if err.status is None:
+            return isinstance(err.__cause__, ConnectionRefusedError)
+        return err.status in self.retry_statuses
+
+    def next_delay(self, attempt: int, err: APIRequestError) -> Optional[float]:
+        """Пауза перед попыткой attempt+1 (attempt с 0) или None, если повторять не нужно."""
+        if attempt + 1 >= self.max_attempts or not self.is_retryable(err):
+            return None
+        if err.retry_after is not None:
+            if err.retry_after > self.max_retry_after:
+                return None
+            return err.retry_after
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """closed -> (failure_threshold подряд ошибок) -> open -> (recovery_timeout) -> half-open.
+
+    В half-open пропускается один пробный запрос: успех закрывает breaker,
+    ошибка снова открывает его на recovery_timeout. failure_threshold=0 отключает breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = max(0, int(failure_threshold))
+        self.recovery_timeout = max(0.0, float(recovery_timeout))
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._probe_in_flight = False
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("API circuit breaker opened after %s failure(s)", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Запрос завершился без вердикта о здоровье бэкенда (например, ошибка валидации URL)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class CircuitBreakerRegistry:
+    """Breaker на каждый хост API (scheme://host:port), общий для sync и async клиентов."""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        key = f"{parsed.scheme}://{(parsed.hostname or '').lower()}:{port}"
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+                self._breakers[key] = breaker
+            return breaker
+
+
+_default_breakers: Optional[CircuitBreakerRegistry] = None
+
+
+def get_default_breakers() -> CircuitBreakerRegistry:
+    """Process-wide breakers (NANOBANANO_CB_FAILURE_THRESHOLD, NANOBANANO_CB_RECOVERY_SEC)."""
+    global _default_breakers
+    with _default_pool_lock:
+        if _default_breakers is None:
+            _default_breakers = CircuitBreakerRegistry(
+                failure_threshold=_env_int("NANOBANANO_CB_FAILURE_THRESHOLD", 5),
+                recovery_timeout=_env_float("NANOBANANO_CB_RECOVERY_SEC", 30.0),
+            )
+        return _default_breakers
+
+
+def _after_failure(
+    breaker: CircuitBreaker, policy: RetryPolicy, attempt: int, err: APIRequestError
+) -> Optional[float]:
+    """Учитывает ошибку в breaker; возвращает паузу перед повтором или None."""
+    if err.is_backend_failure:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    delay = policy.next_delay(attempt, err)
+    if delay is not None:
+        logger.info("API request retry in %.2fs (attempt %s): %s", delay, attempt + 2, err)
+    return delay
+
+
 @dataclass
 class NanoBananoAPIClient:
     api_url: str
     api_key: str = ""
     timeout: int = 30
+    pool: Optional[HTTPConnectionPool] = None
+    retry: Optional[RetryPolicy] = None
+    breakers: Optional[CircuitBreakerRegistry] = None
 
     def _headers(self) -> Dict[str, str]:
-        h = {"Content-Type": "application/json"}
-        if self.api_key:
-            h["Authorization"] = f"Bearer {self.api_key}"
-        return h
+        return _api_headers(self.api_key)
+
+    def _send(
+        self, url: str, pinned_ip: str, method: str, body: Optional[JsonBody], headers: Dict[str, str]
+    ) -> _Response:
+        """Один HTTP-запрос через пул (без редиректов) на провалидированный IP."""
+        parsed = urlparse(url)
+        scheme = parsed.scheme
+        port = parsed.port or (443 if scheme == "https" else 80)
+        key = (scheme, parsed.hostname or "", port)
+        target = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        proxy = _proxy_for(scheme, parsed.hostname or "")
+        target, headers = _proxy_request(url, target, headers, proxy)
+        route = proxy.route if proxy is not None else pinned_ip
+        pool = self.pool or get_default_pool()
+
+        for attempt in range(2):
+            conn, reused = pool.acquire(key, pinned_ip, self.timeout, proxy)
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except _RETRYABLE_STALE_ERRORS:
+                conn.close()
+                # The server closed an idle keep-alive connection: retry once on a fresh one.
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            pool.release(key, route, conn, reusable=not resp.will_close)
+            return _Response(status=resp.status, reason=resp.reason, headers=resp.headers, body=data)
+        raise RuntimeError("API request failed (network error).")
 
     def post_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         url = self.api_url.rstrip("/") + (path if path.startswith("/") else "/" + path)
+        policy = self.retry or RetryPolicy.from_env()
+        breaker = (self.breakers or get_default_breakers()).get(url)
 
-        allow_http = os.getenv("NANOBANANO_ALLOW_INSECURE_HTTP", "").strip().lower() in {"1", "true", "yes"}
-
-        def _validate_request_url(u: str) -> None:
-            # Validate immediately before any network I/O (best-effort DNS rebinding mitigation).
-            parsed = urlparse(u)
-            if parsed.scheme not in {"https", "http"}:
-                raise RuntimeError("Invalid API URL scheme")
-            if parsed.scheme == "http" and not allow_http:
-                raise RuntimeError("Insecure http is not allowed")
-            if parsed.username or parsed.password:
-                raise RuntimeError("Invalid API URL userinfo")
-            host = parsed.hostname
-            if not host:
-                raise RuntimeError("Invalid API URL host")
-            if _is_private_host(host):
-                raise RuntimeError("Blocked private/loopback API host")
-
-        # Disable automatic redirects and re-validate each redirect target.
-        class _NoRedirect(urllib.request.HTTPRedirectHandler):
-            def redirect_request(self, req, fp, code, msg, headers, newurl):  # type: ignore[override]
-                return None
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                logger.warning("API request skipped: circuit open url=%s", url)
+                API_ERRORS.inc(client="sync", status="circuit_open")
+                raise CircuitOpenError("API request failed (circuit open).")
+            started = time.perf_counter()
+            try:
+                result = self._post_once(url, payload)
+            except APIRequestError as e:
+                _record_attempt("sync", started, e)
+                delay = _after_failure(breaker, policy, attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException as e:
+                _record_attempt("sync", started, e)
+                breaker.release()
+                raise
+            _record_attempt("sync", started)
+            breaker.record_success()
+            return result
 
-        opener = urllib.request.build_opener(_NoRedirect())
+    def _post_once(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        allow_http = _allow_insecure_http()
 
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        # Streamed body: inline files are base64-encoded chunk by chunk while sending.
+        data = JsonBody(payload)
         method: str = "POST"
-        body: Optional[bytes] = data
+        body: Optional[JsonBody] = data
         headers = self._headers()
+        headers["Content-Length"] = str(len(data))
 
         current_url = url
-        max_redirects = 5
         try:
-            for _ in range(max_redirects + 1):
-                req = urllib.request.Request(current_url, data=body, headers=headers, method=method)
-                try:
-                    # Validate immediately before any network I/O (best-effort DNS rebinding mitigation).
-                    _validate_request_url(current_url)
-                    with opener.open(req, timeout=self.timeout) as resp:
-                        raw = resp.read().decode("utf-8", errors="ignore")
-                        try:
-                            return json.loads(raw) if raw else {"ok": True}
-                        except Exception:
-                            return {"ok": True, "raw": raw}
-                except urllib.error.HTTPError as e:
-                    # Handle redirects safely (validate each target before following).
-                    code = getattr(e, "code", None)
-                    if code in {301, 302, 303, 307, 308}:
-                        location = (e.headers.get("Location") or "").strip()
-                        if not location:
-                            raise
-                        next_url = urljoin(current_url, location)
-                        _validate_request_url(next_url)
-
-                        # Emulate urllib redirect semantics for POST.
-                        if code in {301, 302, 303} and method != "HEAD":
-                            method = "GET"
-                            body = None
-                        current_url = next_url
-                        continue
-                    raise
+            for _ in range(_MAX_REDIRECTS + 1):
+                # Validate immediately before any network I/O (best-effort DNS rebinding mitigation).
+                pinned_ip = _validate_request_url(current_url, allow_http)
+                resp = self._send(current_url, pinned_ip, method, body, headers)
+
+                if 200 <= resp.status < 300:
+                    return _decode_json_response(resp.body)
+
+                next_url = _redirect_target(resp, current_url, allow_http)
+                if next_url:
+                    # Emulate urllib redirect semantics for POST.
+                    if resp.status in {301, 302, 303} and method != "HEAD":
+                        method = "GET"
+                        body = None
+                        headers.pop("Content-Length", None)
+                    current_url = next_url
+                    continue
+
+                logger.warning(
+                    "API request failed: HTTP %s %s url=%s body_len=%s",
+                    resp.status,
+                    resp.reason,
+                    url,
+                    len(resp.body),
+                )
+                raise APIRequestError(
+                    f"API request failed (HTTP {resp.status}).",
+                    status=resp.status,
+                    retry_after=_parse_retry_after(resp.headers.get("Retry-After")),
+                )
             raise RuntimeError("API request failed (too many redirects).")
-        except urllib.error.HTTPError as e:
-            status = getattr(e, "code", None)
-            reason = getattr(e, "reason", "")
-            body_len = 0
+        except (OSError, http.client.HTTPException) as e:
+            logger.warning("API request failed: network error url=%s err=%r", url, e)
+            raise APIRequestError("API request failed (network error).") from e
+
+
+# -----------------------------
+# Async client
+# -----------------------------
+_AsyncConn = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+_MAX_HEADER_LINES = 100
+
+
+class AsyncHTTPConnectionPool:
+    """asyncio-вариант HTTPConnectionPool: тот же ключ (scheme, host, port), та же проверка pinned IP.
+
+    Привязан к одному event loop (как и сами StreamReader/StreamWriter),
+    поэтому общего process-wide экземпляра нет: пул живёт вместе с клиентом.
+    """
+
+    def __init__(self, max_per_host: int = 4, idle_timeout: float = 60.0, max_idle_total: int = 32):
+        self.max_per_host = max(0, int(max_per_host))
+        self.idle_timeout = max(0.0, float(idle_timeout))
+        self.max_idle_total = max(0, int(max_idle_total))
+        # key -> [(connection, last_used, pinned IP or proxy route)]
+        self._idle: Dict[_PoolKey, List[Tuple[_AsyncConn, float, str]]] = {}
+        self._idle_count = 0
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    async def _new_connection(self, key: _PoolKey, pinned_ip: str, proxy: Optional[_Proxy] = None) -> _AsyncConn:
+        scheme, host, port = key
+        if scheme == "https" and self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        if proxy is not None:
+            return await self._proxy_connection(key, proxy)
+        if scheme == "https":
+            # Connect to the validated IP; SNI and certificate checks use the hostname.
+            return await asyncio.open_connection(pinned_ip, port, ssl=self._ssl_context, server_hostname=host)
+        return await asyncio.open_connection(pinned_ip, port)
+
+    async def _proxy_connection(self, key: _PoolKey, proxy: _Proxy) -> _AsyncConn:
+        """Connection via an http proxy; https targets get a CONNECT tunnel, then TLS to the hostname."""
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(proxy.host, proxy.port)
+        if scheme != "https":
+            return reader, writer
+        try:
+            authority = f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+            lines = [f"CONNECT {authority} HTTP/1.1", f"Host: {authority}"]
+            lines.extend(f"{k}: {v}" for k, v in proxy.headers)
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            status_line = await _readline(reader)
+            parts = status_line.decode("latin-1").split(None, 2)
+            while (await _readline(reader)) not in (b"\r\n", b"\n", b""):
+                pass
+            if len(parts) < 2 or not parts[1].startswith("2"):
+                # Same error as http.client's set_tunnel.
+                raise OSError(f"Tunnel connection failed: {' '.join(parts[1:]).strip() or 'no response'}")
+            await writer.start_tls(self._ssl_context, server_hostname=host)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    def _sweep(self, now: float) -> None:
+        """Closes expired idle connections of every key."""
+        for key in list(self._idle):
+            keep = []
+            for entry in self._idle[key]:
+                (reader, writer), last_used, _ = entry
+                if now - last_used <= self.idle_timeout and not writer.is_closing() and not reader.at_eof():
+                    keep.append(entry)
+                else:
+                    writer.close()
+                    self._idle_count -= 1
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+    async def acquire(self, key: _PoolKey, pinned_ip: str, proxy: Optional[_Proxy] = None) -> Tuple[_AsyncConn, bool]:
+        """Returns ((reader, writer), reused)."""
+        route = proxy.route if proxy is not None else pinned_ip
+        self._sweep(time.monotonic())
+        idle = self._idle.get(key) or []
+        conn = None
+        while idle:
+            cand, _, cand_route = idle.pop()
+            self._idle_count -= 1
+            if cand_route == route:
+                conn = cand
+                break
+            cand[1].close()  # the host now resolves elsewhere (or the proxy changed)
+        if not idle:
+            self._idle.pop(key, None)
+        if conn is not None:
+            return conn, True
+        return await self._new_connection(key, pinned_ip, proxy), False
+
+    def release(self, key: _PoolKey, route: str, conn: _AsyncConn, reusable: bool) -> None:
+        writer = conn[1]
+        if reusable and not writer.is_closing():
+            now = time.monotonic()
+            self._sweep(now)
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host and self._idle_count < self.max_idle_total:
+                idle.append((conn, now, route))
+                self._idle_count += 1
+                return
+            if not idle:
+                del self._idle[key]
+        writer.close()
+
+    async def aclose(self) -> None:
+        writers = [entry[0][1] for idle in self._idle.values() for entry in idle]
+        self._idle.clear()
+        self._idle_count = 0
+        for w in writers:
+            w.close()
+        for w in writers:
             try:
-                raw = e.read() or b""
-                body_len = len(raw)
+                await w.wait_closed()
             except Exception:
-                body_len = 0
-            logger.warning(
-                "API request failed: HTTP %s %s url=%s body_len=%s",
-                status,
-                reason,
-                url,
-                body_len,
+                pass
+
+
+async def _readline(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError):
+        raise http.client.LineTooLong("response line")
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks: List[bytes] = []
+    while True:
+        line = await _readline(reader)
+        try:
+            size = int(line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise http.client.HTTPException("invalid chunk size")
+        if size == 0:
+            # Trailer section ends with an empty line.
+            while (await _readline(reader)) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+async def _read_response(reader: asyncio.StreamReader, method: str) -> Tuple[_Response, bool]:
+    """Минимальный парсер ответа HTTP/1.x. Returns (response, will_close)."""
+    while True:
+        status_line = await _readline(reader)
+        if not status_line:
+            raise http.client.RemoteDisconnected("Remote end closed connection without response")
+        parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        version = parts[0]
+        if not version.startswith("HTTP/1.") or len(parts) < 2:
+            raise http.client.BadStatusLine(status_line.decode("latin-1", errors="replace"))
+        try:
+            status = int(parts[1])
+        except ValueError:
+            raise http.client.BadStatusLine(status_line.decode("latin-1", errors="replace"))
+        reason = parts[2] if len(parts) > 2 else ""
+
+        raw_headers: List[bytes] = []
+        while True:
+            line = await _readline(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            raw_headers.append(line)
+            if len(raw_headers) > _MAX_HEADER_LINES:
+                raise http.client.HTTPException(f"got more than {_MAX_HEADER_LINES} headers")
+        # Interim 1xx responses (e.g. 100 Continue) carry no body: read the next one.
+        if 100 <= status < 200:
+            continue
+        break
+
+    headers = http.client.parse_headers(io.BytesIO(b"".join(raw_headers) + b"\r\n"))
+    conn_tokens = {t.strip().lower() for t in (headers.get("Connection") or "").split(",")}
+    will_close = "close" in conn_tokens or (version == "HTTP/1.0" and "keep-alive" not in conn_tokens)
+
+    transfer_encoding = (headers.get("Transfer-Encoding") or "").strip().lower()
+    length = (headers.get("Content-Length") or "").strip()
+    if method == "HEAD" or status in {204, 304}:
+        body = b""
+    elif transfer_encoding == "chunked":
+        body = await _read_chunked(reader)
+    elif length:
+        try:
+            n = int(length)
+        except ValueError:
+            raise http.client.HTTPException("invalid Content-Length")
+        body = await reader.readexactly(n)
+    else:
+        # Body delimited by connection close.
+        body = await reader.read()
+        will_close = True
+    return _Response(status=status, reason=reason, headers=headers, body=body), will_close
+
+
+async def _write_request(
+    writer: asyncio.StreamWriter,
+    method: str,
+    target: str,
+    host_header: str,
+    headers: Dict[str, str],
+    body: Optional[JsonBody],
+) -> None:
+    lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}", "Accept-Encoding: identity"]
+    lines.extend(f"{k}: {v}" for k, v in headers.items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if body is not None:
+        for chunk in body:
+            writer.write(chunk)
+            await writer.drain()
+    await writer.drain()
+
+
+@dataclass
+class AsyncNanoBananoAPIClient:
+    """asyncio-вариант NanoBananoAPIClient: те же SSRF-проверки, редиректы и ошибки.
+
+    Использование:
+        async with AsyncNanoBananoAPIClient(**get_api_config()) as client:
+            results = await client.post_many("/generate", payloads, concurrency=8)
+    """
+
+    api_url: str
+    api_key: str = ""
+    timeout: int = 30
+    pool: Optional[AsyncHTTPConnectionPool] = None
+    retry: Optional[RetryPolicy] = None
+    breakers: Optional[CircuitBreakerRegistry] = None
+
+    async def __aenter__(self) -> "AsyncNanoBananoAPIClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self.pool is not None:
+            await self.pool.aclose()
+
+    def _get_pool(self) -> AsyncHTTPConnectionPool:
+        if self.pool is None:
+            self.pool = AsyncHTTPConnectionPool(
+                max_per_host=_env_int("NANOBANANO_HTTP_POOL_SIZE", 4),
+                idle_timeout=_env_float("NANOBANANO_HTTP_POOL_IDLE_SEC", 60.0),
             )
-            raise RuntimeError(f"API request failed (HTTP {status}).")
-        except urllib.error.URLError as e:
+        return self.pool
+
+    async def _send(
+        self, url: str, pinned_ip: str, method: str, body: Optional[JsonBody], headers: Dict[str, str]
+    ) -> _Response:
+        """Один HTTP-запрос через пул (без редиректов) на провалидированный IP."""
+        parsed = urlparse(url)
+        scheme = parsed.scheme
+        host = parsed.hostname or ""
+        default_port = 443 if scheme == "https" else 80
+        port = parsed.port or default_port
+        key = (scheme, host, port)
+        target = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        proxy = _proxy_for(scheme, host)
+        target, headers = _proxy_request(url, target, headers, proxy)
+        route = proxy.route if proxy is not None else pinned_ip
+        host_header = f"[{host}]" if ":" in host else host
+        if port != default_port:
+            host_header += f":{port}"
+        pool = self._get_pool()
+
+        for attempt in range(2):
+            conn, reused = await pool.acquire(key, pinned_ip, proxy)
+            reader, writer = conn
+            try:
+                await _write_request(writer, method, target, host_header, headers, body)
+                resp, will_close = await _read_response(reader, method)
+            except _ASYNC_RETRYABLE_STALE_ERRORS:
+                writer.close()
+                # The server closed an idle keep-alive connection: retry once on a fresh one.
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            pool.release(key, route, conn, reusable=not will_close)
+            return resp
+        raise RuntimeError("API request failed (network error).")
+
+    async def post_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        url = self.api_url.rstrip("/") + (path if path.startswith("/") else "/" + path)
+        policy = self.retry or RetryPolicy.from_env()
+        breaker = (self.breakers or get_default_breakers()).get(url)
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                logger.warning("API request skipped: circuit open url=%s", url)
+                API_ERRORS.inc(client="async", status="circuit_open")
+                raise CircuitOpenError("API request failed (circuit open).")
+            started = time.perf_counter()
+            try:
+                result = await self._post_once(url, payload)
+            except APIRequestError as e:
+                _record_attempt("async", started, e)
+                delay = _after_failure(breaker, policy, attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException as e:
+                _record_attempt("async", started, e)
+                breaker.release()
+                raise
+            _record_attempt("async", started)
+            breaker.record_success()
+            return result
+
+    async def _post_once(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        allow_http = _allow_insecure_http()
+
+        data = JsonBody(payload)
+        method: str = "POST"
+        body: Optional[JsonBody] = data
+        headers = _api_headers(self.api_key)
+        headers["Content-Length"] = str(len(data))
+
+        current_url = url
+        try:
+            for _ in range(_MAX_REDIRECTS + 1):
+                # DNS lookups (cache misses) are blocking: keep them off the event loop.
+                pinned_ip = await asyncio.to_thread(_validate_request_url, current_url, allow_http)
+                resp = await asyncio.wait_for(
+                    self._send(current_url, pinned_ip, method, body, headers), timeout=self.timeout
+                )
+
+                if 200 <= resp.status < 300:
+                    return _decode_json_response(resp.body)
+
+                next_url = await asyncio.to_thread(_redirect_target, resp, current_url, allow_http)
+                if next_url:
+                    if resp.status in {301, 302, 303} and method != "HEAD":
+                        method = "GET"
+                        body = None
+                        headers.pop("Content-Length", None)
+                    current_url = next_url
+                    continue
+
+                logger.warning(
+                    "API request failed: HTTP %s %s url=%s body_len=%s",
+                    resp.status,
+                    resp.reason,
+                    url,
+                    len(resp.body),
+                )
+                raise APIRequestError(
+                    f"API request failed (HTTP {resp.status}).",
+                    status=resp.status,
+                    retry_after=_parse_retry_after(resp.headers.get("Retry-After")),
+                )
+            raise RuntimeError("API request failed (too many redirects).")
+        except (OSError, EOFError, asyncio.TimeoutError, http.client.HTTPException) as e:
             logger.warning("API request failed: network error url=%s err=%r", url, e)
-            raise RuntimeError("API request failed (network error).")
+            raise APIRequestError("API request failed (network error).") from e
+
+    async def post_many(
+        self,
+        path: str,
+        payloads: Iterable[Dict[str, Any]],
+        concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """Отправляет payloads параллельно, не больше `concurrency` запросов одновременно.
+
+        Результаты в порядке входа. С return_exceptions=True ошибка отдельного
+        запроса (RuntimeError) попадает в список вместо ответа, иначе первая
+        ошибка пробрасывается, а остальные запросы отменяются.
+
+        payloads читаются лениво: `concurrency` воркеров берут следующий
+        payload, только когда освободились (генератор не разворачивается целиком).
+        """
+        limit = max(1, int(concurrency if concurrency is not None else _env_int("NANOBANANO_ASYNC_CONCURRENCY", 8)))
+        items = enumerate(payloads)
+        results: Dict[int, Union[Dict[str, Any], BaseException]] = {}
+
+        async def _worker() -> None:
+            # Shared iterator: no await between next() calls, so each payload goes to one worker.
+            for i, p in items:
+                try:
+                    results[i] = await self.post_json(path, p)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[i] = e
+
+        workers = [asyncio.ensure_future(_worker()) for _ in range(limit)]
+        pending = set(workers)
+        try:
+            _, pending = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # First failure (or our own cancellation): stop the requests still in flight.
+            for t in pending:
+                t.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        for t in workers:
+            if not t.cancelled() and t.exception() is not None:
+                raise t.exception()  # type: ignore[misc]
+        return [results[i] for i in range(len(results))]
 
 
 # -----------------------------
@@ -302,10 +1429,14 @@ def build_api_payload_v2(
     image_urls: Optional[Dict[str, List[str]]] = None,
     include_file_bytes: bool = False,
     max_inline_bytes: int = 2_000_000,
+    stream_file_bytes: bool = False,
 ) -> Dict[str, Any]:
     """Новый payload (для будущего API).
 
     include_file_bytes: добавляет base64 только если файл <= max_inline_bytes
+    stream_file_bytes: вместо строки base64 кладёт ленивый InlineBase64 —
+        payload тогда только для post_json/JsonBody (json.dumps без
+        default=json_default его не сериализует). По умолчанию payload — обычный JSON.
     """
     uploaded_files = uploaded_files or {}
     image_urls = image_urls or {}
@@ -316,7 +1447,11 @@ def build_api_payload_v2(
             continue
         if not isinstance(files, list):
             files = [files]
-        metas = [_file_meta(f, include_bytes=include_file_bytes, max_inline_bytes=max_inline_bytes) for f in files if f]
+        metas = [
+            _file_meta(f, include_bytes=include_file_bytes, max_inline_bytes=max_inline_bytes, stream_bytes=stream_file_bytes)
+            for f in files
+            if f
+        ]
         if metas:
             files_out[var] = metas
 
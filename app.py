@@ -1,9 +1,8 @@
 import os
 import atexit
-import time
-import unicodedata
 import re
 import threading
+import time
 import datetime
 from pathlib import Path
 import json
@@ -11,13 +10,23 @@ import hashlib
 import sys
 import traceback
 
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait as futures_wait, FIRST_COMPLETED
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import List, Mapping, Tuple
 
 import streamlit as st
 import streamlit.components.v1 as components
 
+import metrics
+from form_schema import ATTACHMENT, ENUM, TEXTAREA, FormSchema, compile_form_schemas
 from prompt_manager import PromptManager
+from search_index import SearchIndex
+from timing import (
+    NULL_TRACE, STAGE_HISTORY, STAGE_UPLOAD_VALIDATION, STAGE_USAGE, RingBufferSink, Trace, TimingSink,
+    create_timing_sinks, emit as emit_timing,
+)
+from prompt_engine import NEG_CATEGORY_LABELS, NEG_CATEGORY_PRESETS, NEG_MODE_OPTIONS, build_prompt, find_missing_inputs
+from translation import TranslationCache, create_translator, has_cyrillic, normalize_translate_cache_key, translate_fields
+from ui_tables import IMAGE_FILE_EXTS, VAR_MAP
 
 # =========================================================
 # FUTURE_SAAS FOUNDATION (no auth/billing implemented)
@@ -25,7 +34,7 @@ from prompt_manager import PromptManager
 # These hooks are part of the repository and must load reliably.
 # Security principle: fail closed (do not silently disable limits / logging).
 try:
-    from future_saas.bootstrap import get_future_config, get_request_context, get_usage_recorder
+    from future_saas.bootstrap import get_future_config, get_request_context, get_usage_limiter, get_usage_recorder
     from future_saas.errors import public_error_message
     from future_saas.limits import enforce_usage_limits
     from future_saas.usage import UsageAction, make_event
@@ -90,13 +99,6 @@ except Exception:
             height=55,
         )
 
-# Перевод (защита от падения)
-try:
-    from deep_translator import GoogleTranslator
-except Exception:
-    GoogleTranslator = None
-
-
 # PIL is used only for lightweight image structure verification.
 try:
     from PIL import Image  # type: ignore
@@ -108,7 +110,8 @@ except Exception:
 # PATHS
 # =========================================================
 BASE_DIR = Path(__file__).resolve().parent
-PROMPTS_PATH = BASE_DIR / "prompts.json"
+# Prompt catalog: prompts.json, a shard directory or a SQLite file (see prompt_store.py).
+PROMPTS_PATH = Path(os.getenv("NANOBANANO_PROMPTS_PATH") or (BASE_DIR / "prompts.json"))
 ASSETS_DIR = BASE_DIR / "assets"
 
 
@@ -180,11 +183,27 @@ TRANSLATE_ACQUIRE_TIMEOUT_SEC = _env_float("NANOBANANO_TRANSLATE_ACQUIRE_TIMEOUT
 TRANSLATE_CACHE_TTL_SEC = _env_int("NANOBANANO_TRANSLATE_CACHE_TTL_SEC", 3600)
 TRANSLATE_CACHE_MAX_ENTRIES = _env_int("NANOBANANO_TRANSLATE_CACHE_MAX_ENTRIES", 256)
 TRANSLATE_CACHE_MAX_BYTES = _env_int("NANOBANANO_TRANSLATE_CACHE_MAX_BYTES", 2_000_000)
+# Optional SQLite file: translations survive restarts and are shared by workers on one host.
+TRANSLATE_CACHE_PATH = (os.getenv("NANOBANANO_TRANSLATE_CACHE_PATH") or "").strip()
+TRANSLATE_CACHE_DISK_MAX_ENTRIES = _env_int("NANOBANANO_TRANSLATE_CACHE_DISK_MAX_ENTRIES", 50_000)
+# Translator backends, tried in order: "glossary" (offline phrase table, no network),
+# "google" (deep_translator). Other engines: translation.register_translator_backend().
+TRANSLATOR_BACKEND = (os.getenv("NANOBANANO_TRANSLATOR_BACKEND") or "glossary,google").strip()
+# Batch mode: all pending fields of a run go to the translator in one request
+# (split back per field; per-field calls if the split fails).
+TRANSLATE_BATCH_ENABLED = _env_bool("NANOBANANO_TRANSLATE_BATCH", True)
 TRANSLATE_GLOBAL_BUDGET_SEC = _env_float(
     "NANOBANANO_TRANSLATE_GLOBAL_BUDGET_SEC",
     max(0.2, float(TRANSLATE_TIMEOUT_SEC) * max(1, int(TRANSLATE_MAX_CONCURRENCY))),
 )
 
+# Per-stage timing of the generate button: "ring" (shown in «Дополнительно»), "log", "prom"
+# (histogram in metrics.py, exported by its textfile/HTTP exporters); "off" disables.
+TIMING_SINKS = (os.getenv("NANOBANANO_TIMING_SINKS") or "ring").strip()
+
+# Prompt catalog hot reload: seconds between mtime checks (0 = on every rerun).
+PROMPTS_RELOAD_INTERVAL_SEC = _env_float("NANOBANANO_PROMPTS_RELOAD_SEC", 2.0)
+
 # Privacy/supply-chain hardening: allow disabling external font loads in public deployments.
 PUBLIC_DEPLOYMENT = _env_bool("NANOBANANO_PUBLIC_DEPLOYMENT", False)
 ALLOW_EXTERNAL_FONTS = _env_bool("NANOBANANO_ALLOW_EXTERNAL_FONTS", not PUBLIC_DEPLOYMENT)
@@ -210,6 +229,7 @@ def get_translate_executor() -> ThreadPoolExecutor:
             pass
 
     atexit.register(_shutdown_executor)
+    metrics.register_collector("translate_executor", lambda: metrics.executor_samples(ex, pool="translate"))
     return ex
 
 
@@ -220,15 +240,57 @@ def get_translate_semaphore() -> threading.Semaphore:
     return threading.Semaphore(max(1, int(TRANSLATE_MAX_CONCURRENCY)))
 
 
+@st.cache_resource
+def get_translate_cache() -> TranslationCache:
+    """Process-wide RU→EN cache shared by all sessions (TTL + entry/byte caps)."""
+    cache = TranslationCache(
+        ttl_sec=TRANSLATE_CACHE_TTL_SEC,
+        max_entries=TRANSLATE_CACHE_MAX_ENTRIES,
+        max_bytes=TRANSLATE_CACHE_MAX_BYTES,
+        path=TRANSLATE_CACHE_PATH,
+        disk_max_entries=TRANSLATE_CACHE_DISK_MAX_ENTRIES,
+    )
+    metrics.register_collector("translate_cache", cache.metric_samples)
+    return cache
+
+
 @st.cache_resource
 def get_translator_en():
-    """Кешируем переводчик."""
-    if GoogleTranslator is None:
-        return None
-    try:
-        return GoogleTranslator(source="auto", target="en")
-    except Exception:
-        return None
+    """Кешируем переводчик (бэкенд/цепочка из NANOBANANO_TRANSLATOR_BACKEND)."""
+    return create_translator(TRANSLATOR_BACKEND)
+
+
+@st.cache_resource
+def start_metrics_exporters() -> bool:
+    """Process-wide /metrics endpoint and/or textfile (NANOBANANO_METRICS_*); off by default."""
+    running = metrics.start_exporters_from_env()
+    if running:
+        # Register their collectors now, not at the first translation.
+        get_translate_executor()
+        get_translate_cache()
+        rec = get_usage_recorder()
+        metrics.register_collector("usage_recorder", lambda: metrics.usage_recorder_samples(rec))
+        limiter = get_usage_limiter()
+        metrics.register_collector("usage_limiter", lambda: metrics.usage_limiter_samples(limiter))
+    return running
+
+
+# Upload validation work per rerun (files are re-validated on every rerun while attached).
+UPLOAD_VALIDATED_BYTES = metrics.counter(
+    "nanobanano_upload_validated_bytes_total", "Bytes of uploaded images validated in the UI."
+)
+UPLOAD_FILES = metrics.counter(
+    "nanobanano_upload_files_total", "Uploaded files checked in the UI by result.", ("result",)
+)
+GENERATE_CLICKS = metrics.counter(
+    "nanobanano_generate_total", "Generate button clicks by result.", ("result",)
+)
+
+
+@st.cache_resource
+def get_timing_sinks() -> List[TimingSink]:
+    """Process-wide timing sinks (NANOBANANO_TIMING_SINKS)."""
+    return create_timing_sinks(TIMING_SINKS)
 
 
 # =========================================================
@@ -408,437 +470,13 @@ div.stButton > button p { color: #000000 !important; }
 # =========================================================
 
 # --- A. NEGATIVE PROMPTS ---
-NEG_GROUPS = {
-    1: {  # Photorealism & People
-        "Mini": {"en": "waxy/plastic skin, beauty retouch, identity drift, extra fingers, watermark, text", "ru": "восковая кожа, бьюти-ретушь, потеря сходства, водяной знак, текст"},
-        "Plus": {"en": "waxy/plastic skin, over-smoothing, beauty retouch, face reshaping, identity drift, extra teeth, deformed hands, extra fingers, watermark, text", "ru": "восковая кожа, пересглаживание, бьюти-ретушь, изменение лица, лишние зубы, деформированные руки, водяной знак, текст"},
-        "Full": {"en": "waxy/plastic skin, over-smoothing, beauty retouch, face reshaping, identity drift, uncanny face, extra teeth, deformed hands, extra limbs/fingers, AI glow, oversharpen halos, banding, watermark, logo, text", "ru": "восковая кожа, пересглаживание, бьюти-ретушь, жуткое лицо, лишние зубы, деформированные руки, лишние конечности, AI-свечение, перешарп, водяной знак, текст"},
-    },
-    2: {  # Scene Editing
-        "Mini": {"en": "seams, halos, ghosting, wrong shadow, wrong scale, watermark, text", "ru": "швы, ореолы, двоение, неверные тени, неверный масштаб, водяной знак, текст"},
-        "Plus": {"en": "seams, halos, cutout edges, ghosting, smear, warped lines, floating object, wrong shadow, wrong scale, mismatch grain, watermark, text", "ru": "швы, ореолы, обрезанные края, двоение, размазывание, кривые линии, левитация, неверные тени, неверный масштаб, водяной знак, текст"},
-        "Full": {"en": "seams, halos, cutout edges, ghosting, smearing, warped perspective/lines, floating objects, wrong scale, wrong shadows, inconsistent lighting, mismatch grain/noise, color mismatch, missing reflections, watermark, logo, text", "ru": "швы, ореолы, обрезанные края, двоение, размазывание, искаженная перспектива, левитация, неверный масштаб, неверные тени, несогласованный свет, ошибки отражений, водяной знак, логотип"},
-    },
-    3: {  # Commercial Design
-        "Mini": {"en": "misspelling, broken glyphs, lorem ipsum, tiny text, random logo, watermark", "ru": "опечатки, битые символы, lorem ipsum, мелкий текст, случайный логотип, водяной знак"},
-        "Plus": {"en": "misspelling, broken glyphs, lorem ipsum, tiny unreadable text, clutter, misaligned layout, low-contrast text, pixelation, random logo, watermark", "ru": "опечатки, битые символы, lorem ipsum, нечитаемый текст, мусор, кривая верстка, пикселизация, случайный логотип, водяной знак"},
-        "Full": {"en": "misspelling, broken glyphs, lorem ipsum, tiny unreadable text, clutter, misaligned layout, low contrast, pixelation, jagged edges, wrong aspect ratio, random brand/logo, extra QR codes, illegible icons, watermark", "ru": "опечатки, битые символы, lorem ipsum, мелкий текст, мусор, кривая верстка, пикселизация, рваные края, неверные пропорции, случайный бренд, лишние QR-коды, водяной знак"},
-    },
-    4: {  # Art & Illustration
-        "Mini": {"en": "extra objects, anatomy warp, style drift, seams, vignette, watermark, text", "ru": "лишние объекты, искажение анатомии, плавающий стиль, швы, виньетка, водяной знак, текст"},
-        "Plus": {"en": "extra objects, anatomy warp, proportion change, perspective distortion, messy linework, style drift, pattern seams, vignette, unreadable text, watermark", "ru": "лишние объекты, искажение анатомии, нарушение пропорций, кривые линии, плавающий стиль, швы, виньетка, нечитаемый текст, водяной знак"},
-        "Full": {"en": "extra objects, anatomy warp, proportion changes, perspective distortion, messy linework, inconsistent style, seams in pattern, vignette, unwanted shading, unreadable text/gibberish, watermark, logo", "ru": "лишние объекты, искажение анатомии, нарушение пропорций, искажение перспективы, неряшливые линии, непоследовательный стиль, швы, виньетка, лишние тени, нечитаемый текст, водяной знак, логотип"},
-    },
-    5: {  # Architecture
-        "Mini": {"en": "keystone distortion, warped verticals, messy geometry, unrealistic scale, watermark, text", "ru": "трапеция, кривые вертикали, грязная геометрия, нереальный масштаб, водяной знак, текст"},
-        "Plus": {"en": "keystone distortion, warped verticals, bent walls, unrealistic scale, messy geometry, low-res textures, blown highlights, muddy shadows, clutter, watermark", "ru": "трапеция, кривые стены, нереальный масштаб, грязная геометрия, низкое разрешение текстур, пересветы, грязные тени, мусор, водяной знак"},
-        "Full": {"en": "keystone distortion, bent walls, warped verticals, unrealistic scale, messy geometry, low-res textures, oversharpen halos, blown highlights, muddy shadows, clutter, people (if not requested), watermark, logo, text", "ru": "трапеция, кривые стены, нереальный масштаб, грязная геометрия, низкое разрешение, ореолы, пересветы, грязные тени, мусор, лишние люди, водяной знак, текст"},
-    },
-    6: {  # VFX / Cinema
-        "Mini": {"en": "overdone flares, heavy aberration, excessive bloom, noisy artifacts, watermark, text", "ru": "перебор бликов, аберрация, bloom, шум, водяной знак, текст"},
-        "Plus": {"en": "excessive bloom, heavy chromatic aberration, overdone flares, crushed blacks, blown highlights, noisy artifacts, oversharpen halos, watermark, text", "ru": "избыточный bloom, аберрация, блики, проваленные черные, пересветы, шум, ореолы, водяной знак, текст"},
-        "Full": {"en": "overdone bloom, heavy aberration, excessive flares, crushed blacks, blown highlights, noisy artifacts, oversharpen halos, unreadable text, tiny clutter text, watermark, logo", "ru": "перебор bloom, аберрация, блики, проваленные черные, пересветы, шум, ореолы, нечитаемый текст, мусор, водяной знак, логотип"},
-    },
-}
-
-NEG_ADDONS = {
-    "logo_creative": {"en": "photorealistic, 3d render, mockup, gradients, textures, shadows, realistic lighting", "ru": "фотореализм, 3d-рендер, мокап, градиенты, текстуры, тени, реалистичный свет"},
-    "technical_blueprint": {"en": "shading, gradients, perspective view, sketchy lines, hand-drawn look", "ru": "шейдинг, градиенты, перспектива, скетчевые линии, рисунок от руки"},
-    "macro_extreme": {"en": "cartoon, illustration, painterly style, fake CG look", "ru": "мультяшность, иллюстрация, живописная стилизация, фейковый CG-вид"},
-}
-
-ID_TO_GROUP = {
-    "upscale_restore": 1, "old_photo_restore": 1, "studio_portrait": 1, "background_change": 1, "face_swap": 1, "expression_change": 1, "pose_change": 1, "camera_angle_change": 1, "cloth_swap": 1, "team_composite": 1, "macro_extreme": 1,
-    "object_removal": 2, "object_addition": 2, "semantic_replacement": 2, "scene_relighting": 2, "scene_composite": 2, "total_look_builder": 2,
-    "product_card": 3, "mockup_generation": 3, "environmental_text": 3, "knolling_photography": 3, "logo_creative": 3, "logo_stylization": 3, "ui_design": 3, "text_design": 3,
-    "image_restyling": 4, "sketch_to_photo": 4, "character_sheet": 4, "sticker_pack": 4, "comic_page": 4, "storyboard_sequence": 4, "seamless_pattern": 4, "anatomical_infographic": 4,
-    "interior_design": 5, "architecture_exterior": 5, "isometric_room": 5,
-    "youtube_thumbnail": 6, "cinematic_atmosphere": 6, "technical_blueprint": 6, "exploded_view": 6
-}
-
-NEG_CATEGORY_LABELS = ["Авто (по задаче)", "Люди / портрет / лицо", "Редактирование / коллаж", "Дизайн / логотип", "Иллюстрация / арт", "Интерьер / архитектура", "Кино / VFX"]
-NEG_CATEGORY_PRESETS = {"Авто (по задаче)": None, "Люди / портрет / лицо": 1, "Редактирование / коллаж": 2, "Дизайн / логотип": 3, "Иллюстрация / арт": 4, "Интерьер / архитектура": 5, "Кино / VFX": 6}
-
-# --- B. LABELS & EXAMPLES (HUMANIZED RUSSIAN UI) ---
-
-VAR_MAP = {
-    # Common
-    "image_1": "Исходное изображение / Ссылка",
-    "image_2": "Референс / Второе изображение",
-    "aspect_ratio": "Формат (Пропорции)",
-    "background": "Фон / Стиль фона",
-    "background_type": "Тип фона (для мокапа)",
-    "environment": "Окружение",
-    "lighting": "Схема освещения",
-    "style": "Художественный стиль",
-    "colors": "Цветовая гамма",
-    
-    # People
-    "person": "Персонаж (описание)",
-    "person_image": "Фото человека",
-    "people_links": "Фото персонажей",
-    "emotion": "Желаемая эмоция",
-    "intensity": "Сила эмоции",
-    "camera_angle": "Ракурс камеры",
-    "action_description": "Поза / Действие",
-    
-    # Clothing / Products
-    "fabric_material": "Материал ткани",
-    "clothing_image": "Фото одежды (на вешалке/модели)",
-    "footwear_image": "Фото обуви",
-    "accessory_image": "Аксессуар (сумка/очки)",
-    "model_image": "Фото модели (База)",
-    
-    # Objects
-    "object": "Объект",
-    "placement_details": "Где разместить?",
-    "object_to_replace": "Что заменяем?",
-    "new_object": "На что заменяем?",
-    "element_1": "Фоновый объект / Сцена",
-    "element_2": "Вставляемый объект",
-    
-    # Tech / Design
-    "product": "Название товара",
-    "text": "Текст (Точно)",
-    "text_content": "Текст надписи",
-    "features_list": "Список преимуществ",
-    "object_type": "На какой предмет наносим?",
-    "print_finish": "Фактура нанесения",
-    "brand": "Бренд / Компания",
-    "imagery": "Символ / Графика",
-    "materials": "Материалы",
-    "screen_type": "Тип экрана",
-    
-    # Other
-    "scene_description": "Описание итоговой сцены",
-    "description": "Описание персонажа",
-    "platform": "Платформа",
-    "theme": "Тема",
-    "character": "Персонаж (референс)",
-    "lens_match_mode": "Режим сведения (Линзы)",
-    "target_object": "Поверхность нанесения",
-    "material_type": "Материал поверхности",
-    "application_style": "Способ нанесения (краска/вышивка)",
-    "character_description": "Внешность персонажа",
-    "activity": "Действие",
-    "lighting_condition": "Новое освещение",
-    "environment_description": "Описание окружения/фона",
-    
-    # Updated Items
-    "industry": "Индустрия / Ниша",
-    "font_style": "Стиль шрифта",
-    "medium": "Техника (Материал)",
-    "level": "Сила стилизации",
-    "labels_visibility": "Подписи (спереди/сбоку)",
-    "count": "Количество",
-    "list": "Список эмоций/поз",
-    "scene": "Описание сцены (Сюжет)",
-    "language": "Язык",
-    "layout": "Компоновка (Сетка)",
-    "action_sequence": "Последовательность действий",
-    "show_preview": "Режим превью (2x2)",
-    "room_type": "Тип комнаты",
-    "room": "Комната (фото/ссылка/описание)",
-    "building_type": "Тип здания",
-    "time": "Время суток / Погода",
-    "lens": "Объектив",
-    "background_color": "Цвет фона",
-    "type": "Тип (Фото/Иллюстрация)",
-    "expression": "Выражение лица (превью)",
-    "subject": "Главный объект",
-    "focus_stacking": "Глубина резкости (фокус-стекинг)",
-    "additional_details": "Дополнительные детали",
-}
-
-# -------------------------------------------------------------
-# GENERIC HINTS (Fallback)
-# -------------------------------------------------------------
-EXAMPLES_DB = {
-    # Common
-    "image_1": {"ph": "Ссылка или файл...", "help": "Основное изображение."},
-    "image_2": {"ph": "Ссылка или файл...", "help": "Референс стиля или объект."},
-    "aspect_ratio": {"ph": "9:16 (Сторис)...", "help": "Выберите формат."},
-    "background": {"ph": "современный офис, размытый фон", "help": "Примеры: белая циклорама, ночной город, стиль киберпанк."},
-    "style": {"ph": "фотореализм, 8k", "help": "Примеры: фотореализм, 3D-рендер, акварель, нуар."},
-    "lighting": {"ph": "мягкий свет, неон", "help": "Примеры: мягкий студийный свет, неоновый синий, золотой час."},
-    "object": {"ph": "красная машина, лампа", "help": "Какой именно объект удалить или добавить? Пиши конкретно."},
-    "text": {"ph": "SALE 50%", "help": "Текст должен быть написан ТОЧНО так, как нужно (без перевода)."},
-    "text_content": {"ph": "SALE, Love, 2025", "help": "Сам текст надписи. Соблюдай регистр."},
-    "materials": {"ph": "дерево, стекло", "help": "Материалы объекта."},
-}
-
-# -------------------------------------------------------------
-# SPECIFIC OVERRIDES (МАТРИЦА УМНЫХ ПОДСКАЗОК)
-# -------------------------------------------------------------
-SPECIFIC_HINTS = {
-    "studio_portrait": { # 03
-        "background": {"ph": "белая циклорама, цветной фон", "help": "Фон: однотонный, размытый лофт, текстура бумаги."},
-        "lighting": {"ph": "Rembrandt, softbox", "help": "Схемы света: Рембрандт, бабочка (butterfly), мягкий софтбокс."},
-    },
-    "background_change": { # 04
-        "background": {"ph": "париж, пляж, офис", "help": "Новый фон: Эйфелева башня, пляж на закате, современный офис."}
-    },
-    "expression_change": { # 06
-        "emotion": {"ph": "радость, гнев", "help": "Эмоции: страх, радость, удивление, гнев, восторг."}
-    },
-    "pose_change": { # 07
-        "action_description": {"ph": "бежит, сидит на стуле", "help": "Что делает персонаж? (прыгает, танцует, скрестил руки)."}
-    },
-    "camera_angle_change": { # 08
-        "camera_angle": {
-            "ph": "top-down 90° overhead", 
-            "help": "ВАЖНО: Для вида строго сверху пиши 'top-down 90° overhead'. Для вида сбоку: 'side view eye-level'. Снизу: 'low angle'."
-        }
-    },
-    "cloth_swap": { # 09
-        "fabric_material": {"ph": "кожа, шелк", "help": "Материал: оставить как на фото, кожа, бархат, шелк, хлопок."}
-    },
-    "object_addition": { # 11
-        "placement_details": {"ph": "на столе, в руке", "help": "Где разместить? Примеры: на столе справа, в левой руке, на заднем плане."}
-    },
-    "semantic_replacement": { # 12
-        "object_to_replace": {"ph": "старый диван, ваза", "help": "Что заменяем? Примеры: красная ваза, старое кресло, картина на стене."}
-    },
-    "scene_relighting": { # 13
-        "lighting_condition": {"ph": "закат, неон, лунный свет", "help": "Новый свет: золотой час, киберпанк неон, холодная ночь."}
-    },
-    "team_composite": { # 15
-        "activity": {"ph": "танцуют, совещание", "help": "Что делают люди? (идут, работают, празднуют, танцуют)."},
-        "environment": {"ph": "офис, сцена, парк", "help": "Где находятся люди? (Офис, сцена, пляж, улица)."},
-        "people_links": {"ph": "Ссылки или файлы...", "help": "Укажите несколько людей, до 5 человек."}
-    },
-    "scene_composite": { # 16
-        "scene_description": {"ph": "Медведь играет на гитаре в лесу", "help": "Опиши сюжет, который должен получиться."}
-    },
-    "product_card": { # 17
-        "product": {"ph": "Nike Air Max, iPhone 15", "help": "Название бренда и модели (Nike, Adidas, iPhone, Snickers)."},
-        "features_list": {"ph": "Водостойкий, 24ч батарея", "help": "Список преимуществ через запятую."}
-    },
-    "mockup_generation": { # 18
-        "object_type": {"ph": "кофейный стакан, футболка", "help": "Загрузи фото предмета (футболка, кружка) или опиши его словами."},
-        "background_type": {"ph": "деревянный стол, мрамор", "help": "На чем стоит предмет? (стол, бетон, цветной фон)."},
-        "print_finish": {"ph": "золотое тиснение, матовый", "help": "Фактура: вышивка, глянец, матовая бумага."},
-        "image_1": {"ph": "Загрузите файл...", "help": "Загрузите логотип, картинку или обложку, которую наносим."}
-    },
-    "environmental_text": { # 19
-        "environment_description": {"ph": "песчаный пляж, стена", "help": "Где написан текст? (песок, кирпичная стена, снег)."},
-        "target_object": {"ph": "песок, бетон, ткань", "help": "Поверхность: песок, футболка, асфальт."},
-        "material_type": {"ph": "песок, камень, хлопок", "help": "Материал поверхности: песок, бетон, деним."}
-    },
-    "knolling_photography": { # 20
-        "object": {"ph": "фототехника, инструменты", "help": "С каким именно объектом производим действия (предметы для раскладки)."}
-    },
-    "logo_creative": { # 21
-        "imagery": {"ph": "лев, молния, гора", "help": "Образ или символ для логотипа."}
-    },
-    "logo_stylization": { # 22
-        "materials": {"ph": "овощи, бумага, стекло", "help": "Из чего собран логотип? (фрукты, механизмы, сладости, бумага)."}
-    },
-    "ui_design": { # 23
-        "industry": {"ph": "Финтех, Бьюти, Еда", "help": "Ниша: Банкинг, Салон красоты, Доставка еды."},
-        "screen_type": {"ph": "Главный экран, Дашборд", "help": "Тип экрана: главный, лендинг, профиль."}
-    },
-    "text_design": { # 24
-        "font_style": {"ph": "Жирный, Рукописный", "help": "Шрифт. Примеры: Жирный Sans, Рукописный, Граффити."},
-        "colors": {"ph": "Черно-желтый, Пастель", "help": "Цвета: Черно-желтый, Пастель, Неон, Монохром."}
-    },
-    "image_restyling": { # 25 (art_style)
-        "medium": {"ph": "Масло, Карандаш, Вектор", "help": "Техника: Акварель, Гуашь, Маркеры, Пиксель-арт."}
-    },
-    "sketch_to_photo": { # 26
-        "materials": {"ph": "стекло, кожа, металл", "help": "Материалы для реализма: дерево, пластик, ткань."},
-        "lighting": {"ph": "студийный свет, закат", "help": "Примеры: мягкий свет, неон, закат, студийное освещение."}
-    },
-    "character_sheet": { # 27
-        "description": {"ph": "девушка киборг, рыжие волосы", "help": "Описание внешности персонажа."}
-    },
-    "sticker_pack": { # 28
-        "count": {"ph": "6, 9, 12", "help": "Сколько стикеров?"},
-        "list": {"ph": "смех, гнев, лайк", "help": "Список эмоций."}
-    },
-    "comic_page": { # 29
-        "scene": {"ph": "Детектив входит в комнату", "help": "Описание сцены (сюжет страницы)."},
-        "language": {"ph": "Английский, Русский", "help": "Язык текста в бабблах (если есть)."}
-    },
-    "storyboard_sequence": { # 30
-        "action_sequence": {"ph": "1. входит 2. смотрит 3. бежит", "help": "Примеры: 1. Просыпается 2. Пьет кофе 3. Выходит."},
-        "layout": {"ph": "сетка 2x3", "help": "Количество кадров, формат (напр. сетка 2x3, 3 горизонтальные панели)."}
-    },
-    "seamless_pattern": { # 31
-        "theme": {"ph": "тропические листья, геометрия", "help": "Тема узора."},
-        "colors": {"ph": "Пастель, Неон", "help": "Цвета: Пастель, Неон, Черно-белый, Золотой."}
-    },
-    "interior_design": { # 32
-        "materials": {"ph": "дуб, мрамор, бетон", "help": "Материалы отделки: дерево, камень, стекло, велюр."},
-        "room_type": {"ph": "Спальня, Кухня, Лофт", "help": "Тип помещения."}
-    },
-    "architecture_exterior": { # 33
-        "building_type": {"ph": "Вилла, Небоскреб", "help": "Тип здания."},
-        "time": {"ph": "солнечный день, туман", "help": "Погода и время суток."},
-        "environment": {"ph": "лес, центр города", "help": "Где стоит здание? (мегаполис, горы, пляж)."}
-    },
-    "isometric_room": { # 34
-        "background_color": {"ph": "белый, синий градиент", "help": "Цвет фона: белый, синий, градиент."}
-    },
-    "youtube_thumbnail": { # 35
-        "type": {"ph": "Влог, Обзор, Реакция", "help": "Тип видео: Влог, Обзор, Реакция."},
-        "expression": {"ph": "шок, радость", "help": "Эмоция на лице: шок, радость, крик."}
-    },
-    "cinematic_atmosphere": { # 36
-        "style": {"ph": "Нуар, Киберпанк, Уэс Андерсон", "help": "Киностиль: Тарантино, Неон, Винтаж 80х."}
-    },
-    "technical_blueprint": { # 37
-        "object": {"ph": "двигатель, кроссовок", "help": "Чертеж чего делаем? Примеры: двигатель, кроссовок, стул, смартфон."}
-    },
-    "anatomical_infographic": { # 39
-        "background": {"ph": "стиль Да Винчи, чертеж", "help": "Фон: старая бумага, медицинский плакат, грифельная доска."}
-    },
-    "macro_extreme": { # 40
-        "object": {"ph": "глаз, насекомое, капля", "help": "Объект макросъемки."}
-    }
-}
-
-# Списки выбора (РУССИФИЦИРОВАННЫЕ ДЛЯ UI)
-ENUM_OPTIONS = {
-    # ВАЖНО: Добавлен "Свой вариант (Custom)" в конце списка
-    "aspect_ratio": ["9:16 (Stories / Reels)", "16:9 (YouTube / TV)", "1:1 (Post / Square)", "4:5 (Portrait)", "3:2 (Photo)", "2:3 (Photo)", "Свой вариант (Custom)"],
-    "intensity": ["Слабая (Low)", "Средняя (Medium)", "Сильная (High)"],
-    "level": ["Легкая (Light)", "Средняя (Medium)", "Сильная (Strong)"],
-    "labels_visibility": ["Вкл (On)", "Выкл (Off)"],
-    "show_preview": ["Да (Превью 2x2)", "Нет (Один кадр)"],
-    "focus_stacking": ["Включено (Всё резко)", "Выключено (Боке)"],
-    "lens_match_mode": ["Визуально (Feel)", "Строго (Strict)"],
-    "language": ["Русский (ru)", "English (en)"],
-    "platform": ["Web", "iOS", "Android"],
-    "type": ["Photo", "Illustration"],
-    "layout": ["2x3 grid", "3x2 grid", "3 horizontal panels", "2x2 grid"],
-    # Added LENS options for Item 33
-    "lens": ["16mm (Очень широкий)", "24mm (Архитектурный)", "35mm (Глаз человека)", "50mm (Стандарт)", "85mm (Портрет)", "200mm (Телевик)"],
-}
+# Tables and selection live in prompt_engine.py (shared with the batch CLI).
 
-DEFAULT_ENUM_VALUE = {
-    "aspect_ratio": "9:16 (Stories / Reels)",
-    "intensity": "Средняя (Medium)",
-    "level": "Средняя (Medium)",
-    "language": "Русский (ru)",
-    "labels_visibility": "Выкл (Off)",
-    "show_preview": "Нет (Один кадр)",
-    "focus_stacking": "Выключено (Боке)",
-    "lens_match_mode": "Визуально (Feel)",
-    "platform": "Web",
-    "type": "Photo",
-    "layout": "2x3 grid",
-    "lens": "24mm (Архитектурный)",
-}
-
-# --- C. ATTACHMENT CONFIGURATION ---
-IMAGE_FILE_EXTS = ["png", "jpg", "jpeg", "webp"]
-
-ATTACHMENT_VARS = {
-    "image_1", "image_2",
-    "model_image", "clothing_image", "footwear_image", "accessory_image",
-    "element_1", "element_2",
-    "person_image",
-    "people_links"
-}
-
-PROMPT_FIELD_OVERRIDES = {
-    "studio_portrait": {"person": {"attachment": True, "default_src": "Файл"}},
-    "semantic_replacement": {"new_object": {"attachment": True, "default_src": "Ссылка / описание"}},
-    # MOCKUP UPDATE: object_type is now attachable
-    "mockup_generation": {
-        "object_type": {"attachment": True, "default_src": "Файл"},
-        "image_1": {"attachment": True, "default_src": "Файл"} # Forcing logo/design input
-    },
-    "knolling_photography": {"object": {"attachment": True, "default_src": "Файл", "multi": True}},
-    "logo_creative": {"imagery": {"attachment": True, "default_src": "Ссылка / описание", "optional": True}},
-    "character_sheet": {"description": {"attachment": True, "default_src": "Файл"}},
-    "sticker_pack": {"character": {"attachment": True, "default_src": "Файл"}},
-    "comic_page": {"character": {"attachment": True, "default_src": "Файл"}},
-    "storyboard_sequence": {"character_description": {"attachment": True, "default_src": "Файл"}},
-    "seamless_pattern": {"theme": {"attachment": True, "default_src": "Ссылка / описание"}},
-    "isometric_room": {"room": {"attachment": True, "default_src": "Файл"}},
-    "cinematic_atmosphere": {"subject": {"attachment": True, "default_src": "Файл"}},
-    "technical_blueprint": {"object": {"attachment": True, "default_src": "Файл"}},
-    "exploded_view": {"object": {"attachment": True, "default_src": "Файл"}},
-    "anatomical_infographic": {"subject": {"attachment": True, "default_src": "Файл"}},
-    "macro_extreme": {"object": {"attachment": True, "default_src": "Файл"}},
-    "youtube_thumbnail": {"object": {"attachment": True, "default_src": "Файл"}},
-}
-
-OPTIONAL_FIELD_TOGGLES = {
-    ("total_look_builder", "footwear_image"): {"label": "Добавить обувь", "default": True},
-    ("total_look_builder", "accessory_image"): {"label": "Добавить аксессуар", "default": False},
-    ("logo_creative", "imagery"): {"label": "Добавить образ-символ", "default": False},
-    ("macro_extreme", "additional_details"): {"label": "Добавить: Дополнительные детали", "default": False},
-}
+# --- B/C. LABELS, EXAMPLES, ENUMS, ATTACHMENTS ---
+# Tables live in ui_tables.py (importable without Streamlit).
 
 # --- D. HELPERS ---
-def _field_override(prompt_id, var_name):
-    pid = (prompt_id or "").strip()
-    v = (var_name or "").lower().strip()
-    return (PROMPT_FIELD_OVERRIDES.get(pid) or {}).get(v, {})
-
-def is_attachment_var(var_name, prompt_id=None):
-    v = (var_name or "").lower().strip()
-    ov = _field_override(prompt_id, v)
-    if isinstance(ov, dict) and ov.get("attachment") is True:
-        return True
-    return (v in ATTACHMENT_VARS) or v.startswith("image_") or v.endswith("_image")
-
-def field_default_src(var_name, prompt_id=None):
-    ov = _field_override(prompt_id, var_name)
-    return ov.get("default_src") if isinstance(ov, dict) else None
-
-def attachment_multi_required(var_name, prompt_id=None):
-    ov = _field_override(prompt_id, var_name)
-    if isinstance(ov, dict) and "multi" in ov:
-        return bool(ov["multi"])
-    return var_name == "people_links"
-
-def enum_default_index(var: str) -> int:
-    opts = ENUM_OPTIONS.get(var, [])
-    desired = DEFAULT_ENUM_VALUE.get(var)
-    if desired in opts: return opts.index(desired)
-    return 0
-
-def get_placeholder(var: str, prompt_id: str) -> str:
-    specific = SPECIFIC_HINTS.get(prompt_id, {}).get(var, {})
-    if "ph" in specific:
-        return specific["ph"]
-    return EXAMPLES_DB.get(var, {}).get("ph", "Введите значение...")
-
-def get_help(var: str, prompt_id: str) -> str:
-    specific = SPECIFIC_HINTS.get(prompt_id, {}).get(var, {})
-    if "help" in specific:
-        return specific["help"]
-    return EXAMPLES_DB.get(var, {}).get(
-        "help", 
-        "Заполните это поле. Можно использовать русский язык."
-    )
-
-def has_cyrillic(s: str) -> bool:
-    return bool(re.search(r"[А-Яа-яЁё]", s))
-
-
-_SPACE_RUN_RE = re.compile(r"[ \t\r\f\v]+")
-
-
-def normalize_translate_cache_key(text: str) -> str:
-    """Нормализует текст для ключа кэша перевода (консервативно).
-
-    - strip()
-    - нормализует переносы строк в \n
-    - схлопывает пробелы/табы внутри строк (не трогая границы строк)
-    """
-    raw = "" if text is None else str(text)
-    raw = unicodedata.normalize("NFKC", raw)
-    raw = raw.replace("\r\n", "\n").replace("\r", "\n").strip()
-    if not raw:
-        return ""
-    lines = raw.split("\n")
-    lines = [_SPACE_RUN_RE.sub(" ", line.strip()) for line in lines]
-    return "\n".join(lines)
+# Field helpers (labels/placeholders/help/widget kind) live in form_schema.py.
 
 def _push_run_notice(msg: str) -> None:
     """Collect non-fatal runtime notices for the current generation run."""
@@ -851,59 +489,17 @@ def _add_run_notice(msg: str, level: str = "info") -> None:
     _push_run_notice(msg)
 
 
-def _approx_utf8_size(s: str) -> int:
-    try:
-        return len((s or "").encode("utf-8", errors="ignore"))
-    except Exception:
-        return len(s or "")
-
-
-def _translate_cache_get(cache: dict, key: str) -> str | None:
-    if not isinstance(cache, dict):
+def _translate_cache_get(cache: TranslationCache, key: str) -> str | None:
+    if not isinstance(cache, TranslationCache):
         return None
-    v = cache.get(key)
-    if not isinstance(v, str):
-        return None
-    # Refresh LRU order (dict preserves insertion order).
-    try:
-        cache.pop(key, None)
-        cache[key] = v
-    except Exception:
-        pass
-    return v
+    return cache.get(key)
 
 
-def _translate_cache_put(cache: dict, key: str, value: str) -> None:
-    """Insert into the per-session translate cache with entry and byte caps."""
-    if not isinstance(cache, dict) or not isinstance(key, str) or not isinstance(value, str):
+def _translate_cache_put(cache: TranslationCache, key: str, value: str) -> None:
+    """Insert into the shared translate cache (caps/TTL are enforced by the cache)."""
+    if not isinstance(cache, TranslationCache):
         return
-
-    # Track approximate UTF-8 size in session state.
-    cur_bytes = st.session_state.get("_nb_translate_cache_bytes")
-    cur_bytes = int(cur_bytes) if isinstance(cur_bytes, int) else 0
-
-    old = cache.get(key)
-    if isinstance(old, str):
-        cur_bytes -= _approx_utf8_size(key) + _approx_utf8_size(old)
-        try:
-            cache.pop(key, None)
-        except Exception:
-            pass
-
-    cache[key] = value
-    cur_bytes += _approx_utf8_size(key) + _approx_utf8_size(value)
-
-    # Evict oldest entries until within caps.
-    while len(cache) > max(1, int(TRANSLATE_CACHE_MAX_ENTRIES)) or cur_bytes > max(0, int(TRANSLATE_CACHE_MAX_BYTES)):
-        try:
-            oldest_key = next(iter(cache))
-        except StopIteration:
-            break
-        oldest_val = cache.pop(oldest_key, None)
-        if isinstance(oldest_val, str):
-            cur_bytes -= _approx_utf8_size(oldest_key) + _approx_utf8_size(oldest_val)
-
-    st.session_state["_nb_translate_cache_bytes"] = max(0, int(cur_bytes))
+    cache.put(key, value)
 
 
 def format_bytes(n: int) -> str:
@@ -963,7 +559,7 @@ def safe_translate_to_en(text: str, var_name: str) -> Tuple[str, bool]:
         _push_run_notice(f"Перевод пропущен: переводчик не доступен (поле '{var_name}').")
         return raw, False
 
-    cache = st.session_state.setdefault("_nb_translate_cache", {})
+    cache = get_translate_cache()
     cache_key = normalize_translate_cache_key(raw)
 
     cached = _translate_cache_get(cache, cache_key)
@@ -1029,191 +625,25 @@ def safe_translate_to_en(text: str, var_name: str) -> Tuple[str, bool]:
             _release()
 
 
-def translate_user_inputs_to_en(user_inputs: dict) -> Tuple[dict, List[str]]:
+def translate_user_inputs_to_en(user_inputs: dict, trace: Trace = NULL_TRACE) -> Tuple[dict, List[str]]:
     """Translate all eligible fields RU->EN with a global time budget to avoid N*timeout stalls."""
-    i_en: dict = {}
-    fallback_keys: List[str] = []
-
-    # Fast path: if translation is disabled, do nothing (but still return original values).
-    translation_enabled = bool(st.session_state.get("nb_translation_enabled", TRANSLATION_ENABLED_DEFAULT))
-
-    cache = st.session_state.setdefault("_nb_translate_cache", {})
-
-    # Collect translation tasks keyed by cache_key (dedupe within the run).
-    key_order: List[str] = []
-    field_to_key: dict = {}
-    key_to_raw: dict = {}
-    key_to_var: dict = {}
-
-    for k, v in (user_inputs or {}).items():
-        sv = "" if v is None else str(v)
-
-        # Don't translate free-text fields (they can be intentionally multilingual).
-        if k in ("text", "text_content"):
-            i_en[k] = v
-            continue
-
-        # Don't translate file placeholders.
-        if sv.startswith("[") and ("FILE" in sv or "ATTACHED" in sv):
-            i_en[k] = v
-            continue
-
-        # Enum-like values: keep the chosen option stable.
-        raw = sv
-        if raw.startswith("Optional:") and "(" in raw and raw.endswith(")"):
-            m = re.match(r"Optional:\s*(.*?)\s*\((.*?)\)\s*$", raw)
-            if m:
-                raw = m.group(1).strip() or raw
-        if raw.startswith("Выберите:") and "(" in raw and raw.endswith(")"):
-            m = re.match(r"Выберите:\s*(.*?)\s*\((.*?)\)\s*$", raw)
-            if m:
-                raw = m.group(1).strip() or raw
-
-        # URL-like values should not be translated.
-        s = raw.strip().lower()
-        if s.startswith(("http://", "https://", "www.")) or not raw:
-            i_en[k] = v
-            continue
-
-        # No translation needed.
-        if not has_cyrillic(raw) or not translation_enabled:
-            i_en[k] = v
-            continue
-
-        if len(raw) > TRANSLATE_MAX_CHARS:
-            _push_run_notice(
-                f"Перевод пропущен: поле '{k}' слишком длинное ({len(raw)} символов, лимит {TRANSLATE_MAX_CHARS})."
-            )
-            i_en[k] = v
-            fallback_keys.append(k)
-            continue
-
-        cache_key = normalize_translate_cache_key(raw)
-        cached = _translate_cache_get(cache, cache_key)
-        if cached is not None:
-            i_en[k] = cached
-            continue
-
-        # Defer translation; we'll submit with a global budget below.
-        field_to_key[k] = cache_key
-        key_to_var.setdefault(cache_key, k)
-        key_to_raw.setdefault(cache_key, raw)
-        if cache_key not in key_order:
-            key_order.append(cache_key)
-
-    if not key_order:
-        return i_en, fallback_keys
-
-    tr = get_translator_en()
-    if tr is None:
-        for k in field_to_key:
-            fallback_keys.append(k)
-        _push_run_notice("Перевод пропущен: переводчик не доступен.")
-        for k, v in (user_inputs or {}).items():
-            i_en.setdefault(k, v)
-        return i_en, fallback_keys
-
-    sem = get_translate_semaphore()
-    ex = get_translate_executor()
-
-    deadline = time.monotonic() + float(TRANSLATE_GLOBAL_BUDGET_SEC)
-    max_inflight = max(1, int(TRANSLATE_MAX_CONCURRENCY))
-
-    results: dict = {}  # cache_key -> (translated, ok)
-
-    inflight: dict = {}  # cache_key -> future
-    idx = 0
-
-    def _make_release_cb() -> callable:
-        released = {"v": False}
-
-        def _cb(_fut=None) -> None:
-            if released["v"]:
-                return
-            released["v"] = True
-            try:
-                sem.release()
-            except Exception:
-                pass
-
-        return _cb
-
-    while time.monotonic() < deadline and (idx < len(key_order) or inflight):
-        # Fill inflight up to concurrency.
-        while idx < len(key_order) and len(inflight) < max_inflight and time.monotonic() < deadline:
-            key = key_order[idx]
-            idx += 1
-
-            # Avoid resubmitting if already resolved.
-            if key in results:
-                continue
-
-            if not sem.acquire(timeout=TRANSLATE_ACQUIRE_TIMEOUT_SEC):
-                # Overloaded: fall back for this key.
-                results[key] = (key_to_raw.get(key, ""), False)
-                _push_run_notice(f"Перевод пропущен: переводчик перегружен (поле '{key_to_var.get(key, '?')}').")
-                continue
-
-            # Usage counters are metadata-only; ignore failures.
-            try:
-                counters = st.session_state.get("_nb_usage_counters")
-                if isinstance(counters, dict):
-                    counters["translate_calls"] = int(counters.get("translate_calls", 0)) + 1
-                    counters["translate_chars"] = int(counters.get("translate_chars", 0)) + len(key_to_raw.get(key, ""))
-            except Exception:
-                pass
-
-            fut = ex.submit(tr.translate, key)
-            fut.add_done_callback(_make_release_cb())
-            inflight[key] = fut
-
-        if not inflight:
-            break
-
-        remaining = max(0.0, deadline - time.monotonic())
-        done, _ = futures_wait(list(inflight.values()), timeout=remaining, return_when=FIRST_COMPLETED)
-        if not done:
-            break
-
-        for key, fut in list(inflight.items()):
-            if fut not in done:
-                continue
-            try:
-                translated = fut.result()
-                if isinstance(translated, str) and translated.strip():
-                    _translate_cache_put(cache, key, translated)
-                    results[key] = (translated, True)
-                else:
-                    results[key] = (key_to_raw.get(key, ""), False)
-                    _push_run_notice(f"Перевод не удался: пустой ответ (поле '{key_to_var.get(key, '?')}').")
-            except Exception as e:
-                results[key] = (key_to_raw.get(key, ""), False)
-                _push_run_notice(
-                    f"Перевод не удался для поля '{key_to_var.get(key, '?')}': {type(e).__name__}. Используется исходный текст."
-                )
-            inflight.pop(key, None)
-
-    # Global budget expired: cancel inflight and fall back.
-    for key, fut in list(inflight.items()):
-        try:
-            fut.cancel()
-        except Exception:
-            pass
-        results.setdefault(key, (key_to_raw.get(key, ""), False))
-        _push_run_notice(f"Перевод превысил таймаут для поля '{key_to_var.get(key, '?')}'. Используется исходный текст.")
-
-    # Fill outputs for fields that were deferred.
-    for field, key in field_to_key.items():
-        translated, ok = results.get(key, (key_to_raw.get(key, ""), False))
-        i_en[field] = translated
-        if not ok and has_cyrillic(key_to_raw.get(key, "")):
-            fallback_keys.append(field)
-
-    # Preserve non-translated fields that might not have been set above.
-    for k, v in (user_inputs or {}).items():
-        i_en.setdefault(k, v)
-
-    return i_en, fallback_keys
+    counters = st.session_state.get("_nb_usage_counters")
+    return translate_fields(
+        user_inputs,
+        get_translator_en(),
+        executor=get_translate_executor(),
+        semaphore=get_translate_semaphore(),
+        cache=get_translate_cache(),
+        enabled=bool(st.session_state.get("nb_translation_enabled", TRANSLATION_ENABLED_DEFAULT)),
+        max_chars=TRANSLATE_MAX_CHARS,
+        max_concurrency=TRANSLATE_MAX_CONCURRENCY,
+        acquire_timeout=TRANSLATE_ACQUIRE_TIMEOUT_SEC,
+        budget_sec=TRANSLATE_GLOBAL_BUDGET_SEC,
+        batch=TRANSLATE_BATCH_ENABLED,
+        notice=_push_run_notice,
+        counters=counters if isinstance(counters, dict) else None,
+        trace=trace,
+    )
 
 
 def _redact_filename(name: str) -> str:
@@ -1369,85 +799,6 @@ def redact_payload_for_ui(payload: dict) -> dict:
     return out
 
 
-def normalize_special_vars(d: dict, lang="en") -> dict:
-    """Нормализует спец-поля так, чтобы они читались человеком.
-
-    Важно: значения зависят от lang, чтобы в EN промпт не попадали русские подписи.
-    """
-    out = dict(d)
-    is_ru = str(lang).lower().startswith("ru")
-
-    # lens_match_mode
-    if "lens_match_mode" in out:
-        mode = str(out.get("lens_match_mode", "")).lower()
-        feel = ("feel" in mode) or ("визуально" in mode) or ("ощущ" in mode)
-        if is_ru:
-            out["lens_match_mode"] = "совпади по ощущению" if feel else "строго по фокусному"
-        else:
-            out["lens_match_mode"] = "match lens look (focal-length feel)" if feel else "match focal length strictly"
-
-    # show_preview
-    if "show_preview" in out:
-        val = str(out.get("show_preview", "")).lower()
-        yes = ("да" in val) or ("yes" in val) or ("on" in val) or ("true" in val)
-        if is_ru:
-            out["show_preview"] = "превью 2×2" if yes else "один кадр"
-        else:
-            out["show_preview"] = "2x2 preview grid" if yes else "single frame"
-
-    # labels_visibility
-    if "labels_visibility" in out:
-        val = str(out.get("labels_visibility", "")).lower()
-        on = ("вкл" in val) or ("on" in val) or ("yes" in val) or ("да" in val) or ("true" in val)
-        if is_ru:
-            out["labels_visibility"] = "подписи включены" if on else "без подписей"
-        else:
-            out["labels_visibility"] = "labels on" if on else "no labels"
-
-    # focus_stacking
-    if "focus_stacking" in out:
-        val = str(out.get("focus_stacking", "")).lower()
-        on = ("включ" in val) or ("on" in val) or ("yes" in val) or ("да" in val) or ("true" in val)
-        if is_ru:
-            out["focus_stacking"] = "включено (всё в резкости)" if on else "выключено (боке)"
-        else:
-            out["focus_stacking"] = "on (everything in focus)" if on else "off (bokeh)"
-
-    return out
-
-def should_add_cyrillic_lock(inputs: dict) -> bool:
-    for k in ["text", "text_content"]:
-        if k in inputs and has_cyrillic(str(inputs.get(k, ""))): return True
-    if str(inputs.get("language", "")).strip().lower() == "ru": return True
-    if "Русский" in str(inputs.get("language", "")): return True
-    return False
-
-def cleanup_optional_prompt(text, prompt_id, disabled_vars, lang):
-    if not text or not disabled_vars:
-        return (text or "").strip()
-
-    t = text
-
-    if prompt_id == "total_look_builder":
-        if "accessory_image" in disabled_vars:
-            t = re.sub(r"\s*(Accessory|Аксессуар):\s*\.(\s*)", " ", t, flags=re.IGNORECASE)
-        if "footwear_image" in disabled_vars:
-            t = re.sub(r"\s*(Footwear|Обувь):\s*\.(\s*)", " ", t, flags=re.IGNORECASE)
-
-    if prompt_id == "logo_creative" and "imagery" in disabled_vars:
-        term = "imagery" if lang.startswith("en") else "образ"
-        t = re.sub(rf"\b{term}\b\s*,\s*", "", t, flags=re.IGNORECASE)
-
-    if prompt_id == "macro_extreme" and "additional_details" in disabled_vars:
-        if lang.startswith("ru"):
-            t = re.sub(r"\s*Дополнительные детали:\s*[^;]*;\s*", " ", t, flags=re.IGNORECASE)
-        else:
-            t = re.sub(r"\s*Additional details:\s*[^;]*;\s*", " ", t, flags=re.IGNORECASE)
-
-    t = re.sub(r"\s{2,}", " ", t)
-    return t.replace(" .", ".").replace(" ,", ",").strip()
-
-
 def _store_last_generate_error(prompt_id: str, exc: BaseException) -> None:
     """Store the last prompt-generation error in session state for UI display."""
     tb = traceback.format_exc()
@@ -1478,31 +829,60 @@ def render_last_generate_error_ui(slot) -> None:
                 st.session_state.pop("_nb_last_generate_error", None)
                 st.rerun()
 
+
+def render_last_timing_ui(slot) -> None:
+    """Stages of this session's last generate click + process-wide p50/p95 (ring sink)."""
+    last = st.session_state.get("_nb_last_timing")
+    if not last:
+        return
+    ring = next((s for s in get_timing_sinks() if isinstance(s, RingBufferSink)), None)
+    summary = ring.summary() if ring is not None else {}
+    rows = [("total", last.get("total_ms", 0.0))] + sorted(last.get("stages", {}).items(), key=lambda kv: -kv[1])
+    lines = ["| Этап | мс | p50 | p95 |", "|---|---:|---:|---:|"]
+    for stage, ms in rows:
+        agg = summary.get(stage)
+        p50 = f"{agg['p50_ms']:.1f}" if agg else "–"
+        p95 = f"{agg['p95_ms']:.1f}" if agg else "–"
+        lines.append(f"| `{stage}` | {ms:.1f} | {p50} | {p95} |")
+    with slot.container():
+        st.markdown("**⏱️ Время последней генерации**")
+        st.markdown("\n".join(lines))
+        if summary:
+            st.caption(f"p50/p95 — последние {summary.get('total', {}).get('count', 0)} генераций процесса.")
+
 # =========================================================
 # 4) ENGINE LOADING
 # =========================================================
 
-def _prompts_mtime_ns(path: Path) -> int:
-    try:
-        return int(path.stat().st_mtime_ns)
-    except Exception:
-        return 0
+@st.cache_resource
+def _get_prompt_manager(prompts_path: str) -> PromptManager:
+    # One manager per process; edits to the catalog are picked up by reload_if_changed().
+    pm = PromptManager(prompts_path)
+    metrics.register_collector("prompt_manager", pm.metric_samples)
+    return pm
 
 
-@st.cache_resource
-def _get_prompt_manager(prompts_path: str, mtime_ns: int) -> PromptManager:
-    # `mtime_ns` is only for cache invalidation.
-    return PromptManager(prompts_path)
+@st.cache_resource(max_entries=1)
+def _get_form_schemas(prompts_path: str, version: int) -> Mapping[str, FormSchema]:
+    # Compiled once per catalog version instead of on every rerun (max_entries=1 frees the previous one).
+    return compile_form_schemas(_get_prompt_manager(prompts_path))
 
 
-manager = (
-    _get_prompt_manager(str(PROMPTS_PATH), _prompts_mtime_ns(PROMPTS_PATH))
-    if PROMPTS_PATH.exists()
-    else None
-)
+@st.cache_resource(max_entries=1)
+def _get_search_index(prompts_path: str, version: int) -> SearchIndex:
+    # Sidebar search: inverted index built once per catalog version.
+    pm = _get_prompt_manager(prompts_path)
+    index = pm.precompiled.get("search_index")  # from the build artifact, version 0 only
+    return index if index is not None else SearchIndex(pm.index)
+
+
+manager = _get_prompt_manager(str(PROMPTS_PATH)) if PROMPTS_PATH.exists() else None
 if not manager:
-    st.error("❌ Файл `prompts.json` не найден!")
+    st.error(f"❌ Каталог промптов `{PROMPTS_PATH.name}` не найден!")
     st.stop()
+# Hot reload: stat-poll at most once per interval; only changed templates are recompiled.
+manager.reload_if_changed(PROMPTS_RELOAD_INTERVAL_SEC)
+start_metrics_exporters()
 all_prompts = manager.prompts
 
 # =========================================================
@@ -1580,19 +960,25 @@ with tab_menu:
         DEFAULT_CAT
     ]
 
-    search_q = st.text_input("🔍 Поиск", key="sidebar_search", placeholder="Название, ID или описание...")
+    # Sidebar works on the lightweight index (titles/categories), never on template bodies.
+    prompt_index = manager.index
+
+    def _prompt_category(pid: str) -> str:
+        # Catalog entries may carry their own category label (shards / SQLite tenant catalogs).
+        return PROMPT_TO_CATEGORY.get(pid) or str(prompt_index[pid].get("category") or DEFAULT_CAT)
+
+    search_q = st.text_input("🔍 Поиск", key="sidebar_search", placeholder="Название, ID, описание, поле...")
     filtered_items = []
 
     if search_q:
         st.caption(f"Результаты: «{search_q}»")
-        for pid, data in all_prompts.items():
-            haystack = (pid + str(data.get("title")) + str(data.get("description"))).lower()
-            if search_q.lower() in haystack:
-                filtered_items.append((data.get("title", pid), pid))
-        filtered_items.sort(key=lambda x: x[0])
+        # Ranked by relevance (title > ID > description > fields > prompt text), not alphabetically.
+        search_index = _get_search_index(str(PROMPTS_PATH), manager.version)
+        for pid in search_index.search(search_q):
+            if pid in prompt_index:
+                filtered_items.append((prompt_index[pid].get("title", pid), pid))
     else:
-        raw_cats = set(PROMPT_TO_CATEGORY.values())
-        if any(p not in PROMPT_TO_CATEGORY for p in all_prompts): raw_cats.add(DEFAULT_CAT)
+        raw_cats = set(PROMPT_TO_CATEGORY.values()) | {_prompt_category(p) for p in prompt_index}
         
         sorted_cats = sorted(list(raw_cats), key=lambda x: CAT_ORDER_PRIORITY.index(x) if x in CAT_ORDER_PRIORITY else 99)
         final_cat_options = [ALL_TASKS_LABEL] + sorted_cats
@@ -1600,19 +986,19 @@ with tab_menu:
         selected_cat = st.selectbox("📂 Категория:", final_cat_options, key="selected_category_ui")
         
         if selected_cat == ALL_TASKS_LABEL:
-            target_ids = list(all_prompts.keys())
+            target_ids = list(prompt_index.keys())
         else:
-            target_ids = [p for p in all_prompts if PROMPT_TO_CATEGORY.get(p, DEFAULT_CAT) == selected_cat]
+            target_ids = [p for p in prompt_index if _prompt_category(p) == selected_cat]
 
         for pid in target_ids:
-            if pid in all_prompts:
-                filtered_items.append((all_prompts[pid].get("title", pid), pid))
+            if pid in prompt_index:
+                filtered_items.append((prompt_index[pid].get("title", pid), pid))
         filtered_items.sort(key=lambda x: x[0])
 
     if not filtered_items:
-        if all_prompts:
-            first_id = list(all_prompts.keys())[0]
-            filtered_items = [(all_prompts[first_id].get("title"), first_id)]
+        if prompt_index:
+            first_id = list(prompt_index.keys())[0]
+            filtered_items = [(prompt_index[first_id].get("title"), first_id)]
     
     current_sel = st.session_state.get("selected_prompt_id")
     def_idx = 0
@@ -1644,6 +1030,10 @@ with tab_menu:
         last_error_details_slot = st.empty()
         render_last_generate_error_ui(last_error_details_slot)
 
+        # Per-stage timing of the last generate click (re-rendered after a new click)
+        last_timing_slot = st.empty()
+        render_last_timing_ui(last_timing_slot)
+
     # ---------------------------------------------------------
     # 🌐 Автоперевод RU→EN (вынесено вниз, чтобы не перекрывать превью)
     # ---------------------------------------------------------
@@ -1654,8 +1044,8 @@ with tab_menu:
         key="nb_translation_enabled",
         value=TRANSLATION_ENABLED_DEFAULT,
         help=(
-            "Если включено, кириллица в полях для EN будет переводиться с помощью внешнего сервиса "
-            "(deep_translator / Google Translator). Не вводите персональные данные, секреты, ключи "
+            "Если включено, кириллица в полях для EN будет переводиться: сначала по локальному словарю, "
+            "затем с помощью внешнего сервиса (deep_translator / Google Translator). Не вводите персональные данные, секреты, ключи "
             "или конфиденциальную информацию. Если отключено, текст будет использоваться как есть."
         ),
     )
@@ -1666,9 +1056,7 @@ with tab_menu:
 # =========================================================
 st.markdown(f"## {current_prompt_data.get('title', selected_id)}")
 
-template_en = current_prompt_data["prompt_en"]
-template_ru = current_prompt_data["prompt_ru"]
-req_vars = sorted(set(re.findall(r"\[([a-zA-Z0-9_]+)\]", template_en) + re.findall(r"\[([a-zA-Z0-9_]+)\]", template_ru)))
+form_schema = _get_form_schemas(str(PROMPTS_PATH), manager.version)[selected_id]
 
 user_inputs = {}
 uploaded_files = {} 
@@ -1676,82 +1064,36 @@ image_urls = {}
 opt_disabled = set()
 uploads_total_files = 0
 uploads_total_bytes = 0
+upload_validation_sec = 0.0
 bad_files: list[str] = []
-MULTILINE_TEXT_VARS = {"scene", "scene_description", "action_sequence", "text", "description", "list"}
 
-if not req_vars:
+if not form_schema.fields:
     st.info("✅ Переменные не требуются.")
 else:
-    # UI metadata can override layout behavior for specific prompts.
-    ui_meta = current_prompt_data.get("ui", {}) if isinstance(current_prompt_data, dict) else {}
-
-    # 1) Force extra vars into the form (e.g., allow uploading logo even if template doesn't reference it).
-    force_vars = ui_meta.get("force_vars", [])
-    if isinstance(force_vars, list):
-        for fv in force_vars:
-            if isinstance(fv, str) and fv and fv not in req_vars:
-                req_vars.append(fv)
-
-    # 2) Reorder vars for a better UX.
-    var_order = ui_meta.get("var_order")
-    if isinstance(var_order, list) and var_order:
-        req_vars = [v for v in var_order if v in req_vars] + [v for v in req_vars if v not in var_order]
-    elif "aspect_ratio" in req_vars:
-        req_vars.remove("aspect_ratio")
-        req_vars.insert(0, "aspect_ratio")
-
-
     cols = st.columns(2)
-    for i, var in enumerate(req_vars):
+    for i, field in enumerate(form_schema.fields):
         col = cols[i % 2]
-        
-        # Получаем красивые лейблы и подсказки (с учетом оверрайдов)
-        label = VAR_MAP.get(var, f"Поле: {var}")
-        
-        # Получаем подсказки через функцию-хелпер, которая смотрит в SPECIFIC_HINTS
-        ph = get_placeholder(var, selected_id)
-        help_text = get_help(var, selected_id)
-
-        # UI overrides from prompts.json metadata (minimal decoupling)
-        if isinstance(ui_meta, dict):
-            label_overrides = ui_meta.get("label_overrides", {})
-            if isinstance(label_overrides, dict) and var in label_overrides:
-                label = str(label_overrides[var])
-
-            help_overrides = ui_meta.get("help_overrides", {})
-            if isinstance(help_overrides, dict) and var in help_overrides:
-                # Replace the base help text entirely for this field
-                help_text = str(help_overrides[var]) if help_overrides[var] is not None else help_text
-
-            help_append = ui_meta.get("help_append", {})
-            if isinstance(help_append, dict) and var in help_append and help_append[var]:
-                extra_hint = str(help_append[var])
-                help_text = (help_text + "\n\n" + extra_hint) if help_text else extra_hint
-
-
-        widget_key = f"{selected_id}__{var}"
+        var = field.var
+        label = field.label
+        ph = field.placeholder
+        help_text = field.help
+        widget_key = field.widget_key
 
         # 1. OPTIONAL TOGGLE (чекбокс "включить/выключить" для некоторых полей)
-        if (selected_id, var) in OPTIONAL_FIELD_TOGGLES:
-            cfg = OPTIONAL_FIELD_TOGGLES[(selected_id, var)]
-            if not col.checkbox(cfg["label"], cfg["default"], key=f"{widget_key}_opt"):
+        if field.optional_label is not None:
+            if not col.checkbox(field.optional_label, field.optional_default, key=f"{widget_key}_opt"):
                 opt_disabled.add(var)
                 user_inputs[var] = ""
                 continue
 
         # 2. ATTACHMENT (File / Link)
-        force_file_vars = []
-        if isinstance(ui_meta, dict):
-            force_file_vars = ui_meta.get("force_file_vars", []) or []
-        is_forced_file_var = isinstance(force_file_vars, list) and var in force_file_vars
-
-        if is_attachment_var(var, selected_id) or is_forced_file_var:
+        if field.kind == ATTACHMENT:
             col.markdown(f"**{label}**")
             # Default tab selection
             
             tab_link, tab_file = col.tabs(["🔗 Ссылка / Текст", "📁 Файл"])
             
-            multi = allow_multi_images or attachment_multi_required(var, selected_id)
+            multi = allow_multi_images or field.multi
             
             with tab_link:
                 if multi:
@@ -1790,14 +1132,21 @@ else:
                             continue
                         size = _uploaded_file_size(f)
                         if size and size > UI_MAX_FILE_BYTES:
+                            UPLOAD_FILES.inc(result="too_big")
                             too_big.append((getattr(f, "name", "file"), int(size)))
                         else:
                             # Validate file signature (do not trust extension alone)
                             safe_name = _redact_filename(getattr(f, "name", "file"))
-                            if not _is_allowed_image_upload(f, IMAGE_FILE_EXTS):
+                            t_validate = time.perf_counter()
+                            allowed = _is_allowed_image_upload(f, IMAGE_FILE_EXTS)
+                            verified = allowed and _verify_image_upload(f)
+                            upload_validation_sec += time.perf_counter() - t_validate
+                            UPLOAD_VALIDATED_BYTES.inc(int(size or 0))
+                            UPLOAD_FILES.inc(result="ok" if verified else "rejected")
+                            if not allowed:
                                 bad_files.append(f"{safe_name} — файл не похож на изображение PNG/JPG/WebP")
                                 continue
-                            if not _verify_image_upload(f):
+                            if not verified:
                                 bad_files.append(f"{safe_name} — изображение повреждено или имеет неверный формат")
                                 continue
                             ok_files.append(f)
@@ -1816,9 +1165,9 @@ else:
             if var not in user_inputs: user_inputs[var] = ""
 
         # 3. ENUM (Dropdown) + Custom Input Logic
-        elif var in ENUM_OPTIONS:
-            opts = ENUM_OPTIONS[var]
-            selected_val = col.selectbox(label, opts, index=enum_default_index(var), key=widget_key, help=help_text)
+        elif field.kind == ENUM:
+            opts = list(field.options)
+            selected_val = col.selectbox(label, opts, index=field.default_index, key=widget_key, help=help_text)
             
             # --- CUSTOM ASPECT RATIO LOGIC ---
             if var == "aspect_ratio" and "Custom" in selected_val:
@@ -1829,7 +1178,7 @@ else:
         
         # 4. TEXT
         else:
-            if var in MULTILINE_TEXT_VARS:
+            if field.kind == TEXTAREA:
                 user_inputs[var] = col.text_area(label, key=widget_key, height=100, help=help_text)
             else:
                 user_inputs[var] = col.text_input(label, key=widget_key, placeholder=ph, help=help_text)
@@ -1854,7 +1203,7 @@ if uploads_total_bytes > UI_MAX_TOTAL_UPLOAD_BYTES:
     )
     uploads_ok = False
 
-neg_mode_ui = st.selectbox("Режим негатива:", ["light (Mini)", "medium (Default)", "hard (Aggressive)"], index=1, key="neg_mode_ui")
+neg_mode_ui = st.selectbox("Режим негатива:", NEG_MODE_OPTIONS, index=1, key="neg_mode_ui")
 
 # =========================================================
 # 8) GENERATION LOGIC
@@ -1865,79 +1214,52 @@ if st.button("🍌 Сгенерировать Промпт", use_container_width
     ctx = get_request_context()
     rec = get_usage_recorder()
     st.session_state["_nb_usage_counters"] = {"translate_calls": 0, "translate_chars": 0}
+    timing_sinks = get_timing_sinks()
+    trace = Trace("generate", meta={"prompt_id": str(selected_id)}) if timing_sinks else NULL_TRACE
+    # Uploads are validated while the form renders (this rerun); attribute that time to the click.
+    trace.add(STAGE_UPLOAD_VALIDATION, upload_validation_sec, count=uploads_total_files)
 
     if not uploads_ok:
+        GENERATE_CLICKS.inc(result="bad_uploads")
         st.error("⚠️ Исправьте ошибки загрузки файлов (лимиты/размеры) и попробуйте снова.")
         st.stop()
-    if not enforce_usage_limits(ctx, UsageAction.GENERATE_PROMPT, units=1):
-        # NOTE: allow-all today. In future SaaS mode, this becomes a quota gate.
-        st.error("⚠️ Слишком много запросов. Попробуйте позже.")
-        st.stop()
+    missing = [VAR_MAP.get(k, k) for k in find_missing_inputs(selected_id, user_inputs, opt_disabled)]
 
-    # Item 35 (YouTube Viral): object reference is optional.
-    yt_object_empty = False
-    if selected_id == "youtube_thumbnail" and not str(user_inputs.get("object", "")).strip():
-        user_inputs["object"] = "."  # marker; will be removed from final prompt
-        yt_object_empty = True
-
-    missing = []
-    for k, v in user_inputs.items():
-        if k not in opt_disabled and not str(v).strip():
-            # For mockup image_1, treat it as optional if text/url is empty? 
-            # Or mandatory? Let's check. If user didn't upload or type url, it's missing.
-            missing.append(VAR_MAP.get(k, k))
-            
     if missing:
+        GENERATE_CLICKS.inc(result="missing_inputs")
         st.error(f"⚠️ **Пожалуйста, заполните:** {', '.join(missing)}")
+    elif not enforce_usage_limits(ctx, UsageAction.GENERATE_PROMPT, units=1, limiter=get_usage_limiter()):
+        # Charged only for valid requests (NANOBANANO_USAGE_UNITS_PER_MINUTE; 0 = allow-all).
+        GENERATE_CLICKS.inc(result="rate_limited")
+        st.error("⚠️ Слишком много запросов. Попробуйте позже.")
     else:
         try:
             st.session_state["_nb_run_notices"] = []
 
             with st.spinner("⏳ Думаем... (Перевод + Сборка)"):
-                # 1. RU prompt generation
-                i_ru = normalize_special_vars(user_inputs, "ru")
-                
-                # 2. EN prompt generation
-                # Translate only where it makes sense; never hang UI; record any fallbacks.
-                i_en, translate_fallback_keys = translate_user_inputs_to_en(user_inputs)
+                # Normalize → translate → templates → cleanup → negative (prompt_engine.build_prompt).
+                result = build_prompt(
+                    selected_id,
+                    user_inputs,
+                    neg_mode_ui,
+                    NEG_CATEGORY_PRESETS.get(neg_category_label),
+                    manager=manager,
+                    translate=lambda inputs: translate_user_inputs_to_en(inputs, trace),
+                    disabled=opt_disabled,
+                    trace=trace,
+                )
 
-                if translate_fallback_keys:
+                if result.translate_fallback:
                     _add_run_notice(
-                        "Translation fallback was used for: " + ", ".join(sorted(set(translate_fallback_keys))) +
+                        "Translation fallback was used for: " + ", ".join(result.translate_fallback) +
                         ". EN prompt may contain non-English values.",
                         level="warning",
                     )
-                
-                i_en = normalize_special_vars(i_en, "en")
 
-                res_en = manager.generate(selected_id, "en", **i_en).strip()
-                res_ru = manager.generate(selected_id, "ru", **i_ru).strip()
-                
-                # Cleanup optional parts
-                res_en = cleanup_optional_prompt(res_en, selected_id, opt_disabled, "en")
-                res_ru = cleanup_optional_prompt(res_ru, selected_id, opt_disabled, "ru")
-
-                # Remove optional object reference sentence for Item 35 if user left it empty
-                if yt_object_empty and selected_id == "youtube_thumbnail":
-                    res_ru = re.sub(r"\s*Объект/референс:\s*\.\s*", " ", res_ru)
-                    res_en = re.sub(r"\s*Object reference:\s*\.\s*", " ", res_en)
-                    res_ru = re.sub(r"\s{2,}", " ", res_ru).strip()
-                    res_en = re.sub(r"\s{2,}", " ", res_en).strip()
-
-                if should_add_cyrillic_lock(user_inputs):
-                    res_en += "\nCRITICAL: Render Cyrillic text EXACTLY as provided."
-                
-                # 3. Negative Prompt Logic
-                gid = NEG_CATEGORY_PRESETS.get(neg_category_label) or ID_TO_GROUP.get(selected_id, 1)
-                m_key = "Mini" if "light" in neg_mode_ui else ("Full" if "hard" in neg_mode_ui else "Plus")
-                neg_en = NEG_GROUPS[gid][m_key]["en"]
-                neg_ru = NEG_GROUPS[gid][m_key]["ru"]
-                
-                if selected_id in NEG_ADDONS:
-                    neg_en += f", {NEG_ADDONS[selected_id]['en']}"
-                    neg_ru += f", {NEG_ADDONS[selected_id]['ru']}"
-                
-                full_text = f"{res_en} --no {neg_en}"
+                res_en, res_ru = result.prompt_en, result.prompt_ru
+                neg_en, neg_ru = result.negative_en, result.negative_ru
+                i_en = result.inputs_en
+                full_text = result.full_text
                 
                 # 4. API Payload
                 payload = None
@@ -1951,9 +1273,11 @@ if st.button("🍌 Сгенерировать Промпт", use_container_width
                         "refs": image_urls
                     }
 
-                save_to_history(current_prompt_data.get("title", selected_id), full_text, f"{res_ru} | NEG: {neg_ru}", payload)
+                with trace.span(STAGE_HISTORY):
+                    save_to_history(current_prompt_data.get("title", selected_id), full_text, result.full_text_ru, payload)
 
                 # FUTURE_SAAS_HOOK: record a single metadata-only usage event.
+                t_usage = time.perf_counter()
                 try:
                     counters = st.session_state.get("_nb_usage_counters")
                     translate_calls = int(counters.get("translate_calls", 0)) if isinstance(counters, dict) else 0
@@ -1975,7 +1299,15 @@ if st.button("🍌 Сгенерировать Промпт", use_container_width
                     )
                 except Exception:
                     pass
+                trace.add(STAGE_USAGE, time.perf_counter() - t_usage)
+
+            if trace.enabled:
+                timing_record = trace.finish()
+                emit_timing(timing_record, timing_sinks)
+                st.session_state["_nb_last_timing"] = timing_record
+                render_last_timing_ui(last_timing_slot)
 
+            GENERATE_CLICKS.inc(result="ok")
             st.success("✅ Готово!")
 
             notices = st.session_state.get("_nb_run_notices", [])
@@ -2021,6 +1353,7 @@ if st.button("🍌 Сгенерировать Промпт", use_container_width
                 st.warning(f"**Negative:**\n{neg_ru}")
 
         except Exception as e:
+            GENERATE_CLICKS.inc(result="error")
             _store_last_generate_error(selected_id, e)
             # Make common validation issues actionable without exposing sensitive data.
             # ValueError messages in this app are crafted to be user-safe (e.g., missing fields,
@@ -0,0 +1,516 @@
+"""Load test: N concurrent Streamlit sessions against a local app server.
+
+    python benchmarks/load_test.py --sessions 20 --iterations 5
+    NANOBANANO_TRANSLATE_MAX_CONCURRENCY=4 python benchmarks/load_test.py -n 50 -o load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8501 -n 10   # already running server
+
+Without --url the tool starts `streamlit run benchmarks/loadtest_app.py`. That
+is app.py plus a stub translator backend with --translate-latency-ms per call.
+Your NANOBANANO_* environment is passed through, so pool and semaphore settings
+can be tried as is. The sessions talk to the server the way a browser does: the
+/_stcore/stream websocket plus the upload endpoint, all in one shared process.
+That makes cache_resource, the translator semaphore and the executors really
+contended. AppTest cannot do this: it swaps process-global runtime state on
+every run, so its runs cannot overlap.
+
+Each session repeats:
+- select a random prompt in the sidebar
+- fill its text fields with Russian text
+- upload synthetic PNGs into some attachment fields (--upload-ratio)
+- click 🍌 Generate
+
+Report:
+- rerun latency p50/p95/p99/max per action
+- server RSS per session
+- translator calls and peak in-flight calls
+- the fallbacks users saw ("перегружен" = semaphore queue full, "таймаут" = budget hit)
+
+app.py makes no API calls, so no stand-in API server is started.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+import zlib
+
+BASE = Path(__file__).resolve().parent.parent
+
+STUB_BACKEND = "loadtest"
+GENERATE_LABEL = "🍌 Сгенерировать Промпт"
+GENERATED_MARK = "Готово"  # st.success after a generate click
+PROMPT_SELECT_KEY = "selected_label_sidebar"
+SAMPLE_TEXT = [
+    "рыжий кот в очках на фоне неонового города",
+    "мягкий студийный свет, тёплые тона",
+    "девушка в красном пальто идёт под дождём",
+    "минималистичный логотип кофейни",
+    "старый деревянный дом у озера на закате",
+    "кинематографичный кадр, плёночное зерно",
+]
+NOTICE_KINDS = {"перегружен": "translator_busy", "таймаут": "translator_timeout", "не удался": "translator_failed"}
+
+
+# ---------------------------------------------------------------- stub translator (server side)
+class StubTranslator:
+    """Translator stand-in: fixed latency per call, counts calls and peak concurrency."""
+
+    def __init__(self, latency_sec: float, stats_path: str):
+        self.latency_sec = latency_sec
+        self.stats_path = stats_path
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.chars = 0
+        self.inflight = 0
+        self.max_inflight = 0
+
+    def _dump(self) -> None:
+        if not self.stats_path:
+            return
+        tmp = self.stats_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"calls": self.calls, "chars": self.chars, "max_inflight": self.max_inflight}, f)
+        os.replace(tmp, self.stats_path)
+
+    def translate(self, text: str) -> str:
+        with self._lock:
+            self.calls += 1
+            self.chars += len(text or "")
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            time.sleep(self.latency_sec)
+            return "EN(" + text + ")"
+        finally:
+            with self._lock:
+                self.inflight -= 1
+                self._dump()
+
+
+_STUB: Optional[StubTranslator] = None
+
+
+def install_stub_translator() -> None:
+    """Registers the "loadtest" translator backend (idempotent: runs on every rerun)."""
+    global _STUB
+    from translation import register_translator_backend
+
+    if _STUB is None:
+        latency = float(os.getenv("NANOBANANO_LOADTEST_TRANSLATE_LATENCY_MS") or 200) / 1000.0
+        _STUB = StubTranslator(latency, os.getenv("NANOBANANO_LOADTEST_STATS_PATH") or "")
+    register_translator_backend(STUB_BACKEND, lambda: _STUB)
+
+
+# ---------------------------------------------------------------- synthetic uploads
+def synthetic_png(kb: int, seed: int = 0) -> bytes:
+    """Valid RGB PNG of roughly `kb` KB (random pixels, so it does not compress)."""
+    side = max(8, int((kb * 1024 / 3) ** 0.5))
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + rng.randbytes(side * 3) for _ in range(side))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+# ---------------------------------------------------------------- websocket session (client side)
+class Session:
+    """One simulated browser tab: widget state, reruns, uploads."""
+
+    def __init__(self, base_url: str, n: int, args, stats: "Stats", png: bytes):
+        self.base_url = base_url.rstrip("/")
+        self.n = n
+        self.args = args
+        self.stats = stats
+        self.png = png
+        self.rng = random.Random(args.seed + n)
+        self.ws = None
+        self.session_id = ""
+        self.page_hash = ""
+        self.widgets: Dict[str, Any] = {}  # widget id -> WidgetState (what the browser would send)
+        self.elements: List[Any] = []  # (kind, element) of the last run
+        self._run_done: Optional[asyncio.Future] = None
+        self._url_requests: Dict[str, asyncio.Future] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        from tornado.websocket import websocket_connect
+
+        ws_url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = await websocket_connect(ws_url, max_message_size=64 * 1024 * 1024)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def close(self) -> None:
+        if self.ws is not None:
+            self.ws.close()
+        if self._reader is not None:
+            self._reader.cancel()
+
+    async def _read_loop(self) -> None:
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            raw = await self.ws.read_message()
+            if raw is None:
+                if self._run_done and not self._run_done.done():
+                    self._run_done.set_exception(ConnectionError("websocket closed"))
+                return
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.session_id = msg.new_session.initialize.session_id
+                self.page_hash = msg.new_session.main_script_hash or msg.new_session.page_script_hash
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                el = msg.delta.new_element
+                ek = el.WhichOneof("type")
+                self.elements.append((ek, getattr(el, ek)))
+            elif kind == "file_urls_response":
+                fut = self._url_requests.pop(msg.file_urls_response.response_id, None)
+                if fut is not None and not fut.done():
+                    fut.set_result(list(msg.file_urls_response.file_urls))
+            elif kind == "script_finished" and self._run_done is not None and not self._run_done.done():
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    self._run_done.set_result(msg.script_finished)
+
+    def widget(self, kind: str, key: Optional[str] = None, label: Optional[str] = None):
+        for ek, el in self.elements:
+            if ek != kind:
+                continue
+            if key is not None and getattr(el, "id", "").endswith("-" + key):
+                return el
+            if label is not None and getattr(el, "label", None) == label:
+                return el
+        return None
+
+    def _state(self, wid: str):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        ws = WidgetState()
+        ws.id = wid
+        self.widgets[wid] = ws
+        return ws
+
+    async def rerun(self, action: str, trigger_id: Optional[str] = None) -> None:
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        live = {getattr(el, "id", "") for _, el in self.elements}
+        msg = BackMsg()
+        cs = msg.rerun_script
+        cs.query_string = ""
+        cs.page_script_hash = self.page_hash
+        for wid, ws in self.widgets.items():
+            if not self.elements or wid in live:
+                cs.widget_states.widgets.append(ws)
+        if trigger_id:
+            trig = cs.widget_states.widgets.add()
+            trig.id = trigger_id
+            trig.trigger_value = True
+
+        self.elements = []
+        self._run_done = asyncio.get_running_loop().create_future()
+        t0 = time.perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        try:
+            await asyncio.wait_for(self._run_done, self.args.timeout)
+        except asyncio.TimeoutError:
+            self.stats.errors.append(f"session {self.n}: {action} timed out")
+            return
+        self.stats.latency.setdefault(action, []).append(time.perf_counter() - t0)
+        for ek, el in self.elements:
+            if ek == "exception":
+                self.stats.errors.append(f"session {self.n}: {action}: {el.type}: {el.message[:200]}")
+            elif ek == "alert":
+                for needle, name in NOTICE_KINDS.items():
+                    if needle in el.body:
+                        self.stats.notices[name] = self.stats.notices.get(name, 0) + 1
+
+    async def upload(self, widget_id: str, name: str) -> None:
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+
+        request_id = uuid.uuid4().hex
+        fut = asyncio.get_running_loop().create_future()
+        self._url_requests[request_id] = fut
+        msg = BackMsg()
+        msg.file_urls_request.request_id = request_id
+        msg.file_urls_request.session_id = self.session_id
+        msg.file_urls_request.file_names.append(name)
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        urls = (await asyncio.wait_for(fut, self.args.timeout))[0]
+
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+            "Content-Type: image/png\r\n\r\n"
+        ).encode() + self.png + f"\r\n--{boundary}--\r\n".encode()
+        upload_url = urls.upload_url if urls.upload_url.startswith("http") else self.base_url + urls.upload_url
+        t0 = time.perf_counter()
+        await AsyncHTTPClient().fetch(
+            HTTPRequest(
+                upload_url, method="PUT", body=body,
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                request_timeout=self.args.timeout,
+            )
+        )
+        self.stats.latency.setdefault("upload_http", []).append(time.perf_counter() - t0)
+        self.stats.upload_bytes += len(self.png)
+
+        state = self._state(widget_id).file_uploader_state_value
+        info = state.uploaded_file_info.add()
+        info.file_id = urls.file_id
+        info.name = name
+        info.size = len(self.png)
+        info.file_urls.CopyFrom(urls)
+
+    async def think(self) -> None:
+        if self.args.think_ms > 0:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.args.think_ms / 1000.0)
+
+    async def run(self) -> None:
+        await self.connect()
+        await self.rerun("first_load")
+        for _ in range(self.args.iterations):
+            select = self.widget("selectbox", key=PROMPT_SELECT_KEY)
+            if select is None:
+                self.stats.errors.append(f"session {self.n}: no prompt selectbox")
+                return
+            title = self.rng.choice(list(select.options))
+            self._state(select.id).string_value = title
+            await self.think()
+            await self.rerun("select_prompt")
+
+            # Form widgets of the selected prompt have keys "<prompt_id>__<var>[_txt|_file]".
+            for ek, el in list(self.elements):
+                wid = getattr(el, "id", "")
+                if "__" not in wid.rsplit("-", 1)[-1] or wid.endswith("_custom"):
+                    continue
+                if ek in ("text_input", "text_area"):
+                    self._state(wid).string_value = self.rng.choice(SAMPLE_TEXT)
+                elif ek == "file_uploader" and self.rng.random() < self.args.upload_ratio:
+                    await self.upload(wid, f"ref_{self.n}_{uuid.uuid4().hex[:6]}.png")
+            await self.think()
+            await self.rerun("fill_fields")
+
+            button = self.widget("button", label=GENERATE_LABEL)
+            if button is None:
+                self.stats.errors.append(f"session {self.n}: no generate button")
+                return
+            await self.think()
+            await self.rerun("generate", trigger_id=button.id)
+            if any(ek == "alert" and GENERATED_MARK in el.body for ek, el in self.elements):
+                self.stats.generated += 1
+            else:
+                self.stats.errors.append(f"session {self.n}: generate produced no prompt ({title})")
+
+
+# ---------------------------------------------------------------- stats / server
+class Stats:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = {}
+        self.errors: List[str] = []
+        self.notices: Dict[str, int] = {}
+        self.generated = 0
+        self.upload_bytes = 0
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, max(0, int(round(q / 100.0 * len(s) + 0.5)) - 1))]
+
+
+def _rss_kb(pid: int, field: str = "VmRSS") -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, stats_path: str) -> "subprocess.Popen":
+    env = dict(os.environ)
+    env.update({
+        "NANOBANANO_TRANSLATOR_BACKEND": STUB_BACKEND,
+        "NANOBANANO_LOADTEST_TRANSLATE_LATENCY_MS": str(args.translate_latency_ms),
+        "NANOBANANO_LOADTEST_STATS_PATH": stats_path,
+    })
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", str(BASE / "benchmarks" / "loadtest_app.py"),
+        "--server.headless", "true",
+        "--server.address", "127.0.0.1",
+        "--server.port", str(args.port),
+        "--server.fileWatcherType", "none",
+        "--server.enableXsrfProtection", "false",  # local load test: upload PUTs come without the XSRF cookie
+        "--browser.gatherUsageStats", "false",
+    ]
+    proc = subprocess.Popen(cmd, cwd=str(BASE), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("streamlit exited: " + proc.stderr.read().decode(errors="replace")[-2000:])
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError("streamlit did not become healthy in 60s")
+
+
+async def run_load(args, base_url: str, server_pid: Optional[int]) -> Dict[str, Any]:
+    stats = Stats()
+    png = synthetic_png(args.upload_kb, args.seed)
+
+    # Warm-up session: imports, cache_resource, first compile — not part of the numbers.
+    warm = Session(base_url, -1, argparse.Namespace(**{**vars(args), "iterations": 1}), Stats(), png)
+    await warm.run()
+    await warm.close()
+    rss_base = _rss_kb(server_pid) if server_pid else None
+
+    sessions = [Session(base_url, i, args, stats, png) for i in range(args.sessions)]
+
+    async def _one(s: Session, delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await s.run()
+        except Exception as e:
+            stats.errors.append(f"session {s.n}: {type(e).__name__}: {e}")
+
+    t0 = time.perf_counter()
+    ramp = args.ramp_sec / max(1, args.sessions)
+    await asyncio.gather(*(_one(s, i * ramp) for i, s in enumerate(sessions)))
+    wall = time.perf_counter() - t0
+    rss_loaded = _rss_kb(server_pid) if server_pid else None  # sessions still connected
+    rss_peak = _rss_kb(server_pid, "VmHWM") if server_pid else None
+    for s in sessions:
+        await s.close()
+
+    report: Dict[str, Any] = {
+        "config": {k: v for k, v in vars(args).items() if k not in {"output"}},
+        "wall_sec": round(wall, 3),
+        "generated": stats.generated,
+        "generate_per_sec": round(stats.generated / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            action: {
+                "count": len(v),
+                "p50": round(percentile(v, 50) * 1000, 1),
+                "p95": round(percentile(v, 95) * 1000, 1),
+                "p99": round(percentile(v, 99) * 1000, 1),
+                "max": round(max(v) * 1000, 1),
+            }
+            for action, v in sorted(stats.latency.items())
+        },
+        "memory_kb": {
+            "rss_after_warmup": rss_base,
+            "rss_with_sessions": rss_loaded,
+            "rss_peak": rss_peak,
+            "per_session": (
+                round((rss_loaded - rss_base) / max(1, args.sessions)) if rss_base and rss_loaded else None
+            ),
+        },
+        "uploads_mb": round(stats.upload_bytes / (1024 * 1024), 2),
+        "notices": stats.notices,
+        "errors": stats.errors[:50],
+        "error_count": len(stats.errors),
+    }
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['generated']} generate clicks in {report['wall_sec']}s ({report['generate_per_sec']}/s)")
+    print(f"{'action':<14} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for action, s in report["latency_ms"].items():
+        print(f"{action:<14} {s['count']:>6} {s['p50']:>9} {s['p95']:>9} {s['p99']:>9} {s['max']:>9}")
+    mem = report["memory_kb"]
+    if mem["rss_after_warmup"]:
+        print(
+            f"server RSS: {mem['rss_after_warmup'] // 1024} MB after warm-up, "
+            f"{(mem['rss_with_sessions'] or 0) // 1024} MB with sessions, peak {(mem['rss_peak'] or 0) // 1024} MB, "
+            f"~{(mem['per_session'] or 0)} KB/session"
+        )
+    tr = report.get("translator")
+    if tr:
+        print(f"translator: {tr.get('calls', 0)} calls, {tr.get('chars', 0)} chars, peak in-flight {tr.get('max_inflight', 0)}")
+    print(f"fallback notices: {report['notices'] or 'none'}; uploads: {report['uploads_mb']} MB")
+    if report["error_count"]:
+        print(f"{report['error_count']} error(s), first: {report['errors'][0]}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--sessions", type=int, default=10, help="concurrent sessions (default: 10)")
+    ap.add_argument("--iterations", type=int, default=3, help="select/fill/generate cycles per session (default: 3)")
+    ap.add_argument("--think-ms", type=float, default=200.0, help="mean pause between user actions (default: 200)")
+    ap.add_argument("--ramp-sec", type=float, default=2.0, help="spread session starts over this many seconds")
+    ap.add_argument("--upload-ratio", type=float, default=0.5, help="share of attachment fields that get a file")
+    ap.add_argument("--upload-kb", type=int, default=512, help="size of each synthetic PNG (default: 512)")
+    ap.add_argument("--translate-latency-ms", type=float, default=200.0, help="stub translator latency per call")
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-rerun timeout, sec")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--port", type=int, default=0, help="port for the spawned server (default: free port)")
+    ap.add_argument("--url", help="use an already running server instead (no translator/memory stats)")
+    ap.add_argument("-o", "--output", help="write the report as JSON")
+    args = ap.parse_args()
+
+    proc = None
+    stats_path = os.path.join(tempfile.gettempdir(), f"nb_loadtest_{os.getpid()}.json")
+    if args.url:
+        base_url = args.url
+    else:
+        args.port = args.port or _free_port()
+        proc = start_server(args, stats_path)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        report = asyncio.run(run_load(args, base_url, proc.pid if proc else None))
+        try:
+            with open(stats_path, "r", encoding="utf-8") as f:
+                report["translator"] = json.load(f)
+        except (OSError, ValueError):
+            report["translator"] = None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        for p in (stats_path, stats_path + ".tmp"):
+            if os.path.exists(p):
+                os.remove(p)
+
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    return 1 if report["error_count"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,20 @@
+"""Streamlit entry point for benchmarks/load_test.py: app.py + a stub translator backend.
+
+    NANOBANANO_TRANSLATOR_BACKEND=loadtest streamlit run benchmarks/loadtest_app.py
+
+The "loadtest" backend sleeps NANOBANANO_LOADTEST_TRANSLATE_LATENCY_MS per call
+and writes its counters to NANOBANANO_LOADTEST_STATS_PATH (see load_test.py).
+"""
+from pathlib import Path
+import runpy
+import sys
+
+HERE = Path(__file__).resolve().parent
+for p in (str(HERE.parent), str(HERE)):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import load_test  # noqa: E402
+
+load_test.install_stub_translator()
+runpy.run_path(str(HERE.parent / "app.py"), run_name="__main__")
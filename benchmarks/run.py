@@ -0,0 +1,272 @@
+"""Benchmarks for the prompt generation hot path (stdlib timeit, JSON results).
+
+    python benchmarks/run.py                          # all cases → stdout table
+    python benchmarks/run.py -o bench.json            # + machine-readable results
+    python benchmarks/run.py -k generate/ --quick     # filter by name substring, short runs
+    python benchmarks/run.py --compare base.json      # exit 1 if a median regressed > --max-regression
+
+Cases (name prefixes):
+  generate/<prompt_id>           PromptManager.generate, EN + RU, every prompt
+  build_prompt/                  prompt_engine.build_prompt end to end (no translation)
+  normalize_translate_cache_key/ short and 4000-char inputs
+  translate_fields/              the Generate-button translation (app.translate_user_inputs_to_en)
+                                 against a fake translator, --translate-latency-ms per call
+  cleanup_optional_prompt/       every OPTIONAL_FIELD_TOGGLES prompt with the field disabled
+  build_api_payload_v2/          3 x --payload-mb uploads inlined, + streaming JSON encode
+  search/                        sidebar SearchIndex queries
+  generate_docs/                 docs_generator.generate_docs into a temp file
+
+Timings are per call: min / median / mean over --repeat runs of an auto-sized loop.
+Compare medians only between runs on the same machine.
+"""
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import atexit
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE))
+
+from api_client import build_api_payload_v2, encode_json_body  # noqa: E402
+from docs_generator import generate_docs  # noqa: E402
+from prompt_engine import build_prompt, cleanup_optional_prompt  # noqa: E402
+from prompt_manager import PromptManager  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from translation import TranslationCache, normalize_translate_cache_key, translate_fields  # noqa: E402
+from ui_tables import OPTIONAL_FIELD_TOGGLES  # noqa: E402
+
+RESULTS_SCHEMA = 1
+Case = Tuple[str, Callable[[], object]]
+
+
+class FakeTranslator:
+    """deep_translator-compatible stand-in: fixed latency per call, uppercases the text."""
+
+    def __init__(self, latency_sec: float):
+        self.latency_sec = latency_sec
+        self.calls = 0
+
+    def translate(self, text: str) -> str:
+        self.calls += 1
+        if self.latency_sec > 0:
+            time.sleep(self.latency_sec)
+        return text.upper()
+
+
+class _NamedBytesIO(io.BytesIO):
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+def _sample_inputs(manager: PromptManager, prompt_id: str) -> Dict[str, str]:
+    variables = set(manager.get_template(prompt_id, "en").variables) | set(manager.get_template(prompt_id, "ru").variables)
+    return {v: f"значение поля {v}" for v in sorted(variables)}
+
+
+def _cases(args) -> List[Case]:
+    manager = PromptManager(str(BASE / "prompts.json"), use_artifact=False)
+    cases: List[Case] = []
+
+    for pid in manager.index:
+        inputs = _sample_inputs(manager, pid)
+
+        def _generate(pid=pid, inputs=inputs):
+            manager.generate(pid, "en", **inputs)
+            manager.generate(pid, "ru", **inputs)
+
+        cases.append((f"generate/{pid}", _generate))
+
+    build_rows = [(pid, _sample_inputs(manager, pid)) for pid in manager.index]
+
+    def _build_all():
+        for pid, inputs in build_rows:
+            build_prompt(pid, inputs, "medium", manager=manager)
+
+    cases.append((f"build_prompt/all_{len(build_rows)}_prompts", _build_all))
+
+    short_key = "  Студийный   портрет\tв мягком свете  "
+    long_key = ("Кинематографичный свет, мягкие тени, плёночное зерно. " * 80)[:4000]
+    cases.append(("normalize_translate_cache_key/short", lambda: normalize_translate_cache_key(short_key)))
+    cases.append(("normalize_translate_cache_key/4000_chars", lambda: normalize_translate_cache_key(long_key)))
+
+    # Same knobs as the UI defaults (app.py), fake network latency per translator call.
+    latency = max(0.0, args.translate_latency_ms) / 1000.0
+    tr = FakeTranslator(latency)
+    executor = ThreadPoolExecutor(max_workers=1)
+    semaphore = threading.Semaphore(1)
+    fields = {
+        "subject": "рыжий кот в очках",
+        "background": "неоновый город ночью",
+        "lighting": "мягкий контровой свет",
+        "style": "Optional: кинематографичный (cinematic)",
+        "text": "НЕ ПЕРЕВОДИТЬ",
+        "aspect_ratio": "16:9",
+    }
+
+    def _translate(cache: TranslationCache):
+        return translate_fields(
+            fields, tr, executor=executor, semaphore=semaphore, cache=cache,
+            max_chars=4000, max_concurrency=1, acquire_timeout=1.0, budget_sec=10.0, batch=True,
+        )
+
+    warm_cache = TranslationCache(ttl_sec=0)
+    _translate(warm_cache)
+    cases.append((f"translate_fields/cold_{args.translate_latency_ms:g}ms", lambda: _translate(TranslationCache(ttl_sec=0))))
+    cases.append(("translate_fields/warm_cache", lambda: _translate(warm_cache)))
+
+    toggles = []
+    for (pid, var) in OPTIONAL_FIELD_TOGGLES:
+        if pid in manager.index:
+            inputs = _sample_inputs(manager, pid)
+            inputs[var] = ""
+            for lang in ("en", "ru"):
+                toggles.append((manager.generate(pid, lang, **inputs), pid, lang, var))
+
+    def _cleanup():
+        for text, pid, lang, var in toggles:
+            cleanup_optional_prompt(text, pid, {var}, lang)
+
+    cases.append((f"cleanup_optional_prompt/{len(toggles)}_variants", _cleanup))
+
+    size = int(args.payload_mb * 1024 * 1024)
+    blob = os.urandom(size)
+    uploads = {f"image_{i}": _NamedBytesIO(blob, f"ref_{i}.png") for i in (1, 2, 3)}
+    payload_kwargs = dict(
+        prompt_id="scene_composite", title="16. Сложный фотомонтаж", category="editing",
+        ru_prompt="ru " * 200, en_prompt="en " * 200, uploaded_files=uploads,
+        image_urls={"people_links": ["https://example.com/a.png", "описание"]},
+        include_file_bytes=True, max_inline_bytes=size,
+    )
+    mb = f"{args.payload_mb:g}MB"
+    cases.append((f"build_api_payload_v2/3x{mb}", lambda: build_api_payload_v2(**payload_kwargs)))
+    cases.append((
+        f"build_api_payload_v2/3x{mb}+encode",
+        lambda: encode_json_body(build_api_payload_v2(**payload_kwargs, stream_file_bytes=True)),
+    ))
+
+    index = SearchIndex(manager.index)
+    cases.append(("search/build_index", lambda: SearchIndex(manager.index)))
+    for q in ("фон", "portret", "замены фона"):
+        cases.append((f"search/query_{q.replace(' ', '_')}", lambda q=q: index.search(q)))
+
+    docs_out = Path(tempfile.gettempdir()) / f"nb_bench_docs_{os.getpid()}.md"
+    atexit.register(lambda: docs_out.unlink(missing_ok=True))
+
+    def _docs():
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_docs(json_path=str(BASE / "prompts.json"), output_path=str(docs_out))
+
+    cases.append(("generate_docs/prompts_json", _docs))
+    return cases
+
+
+def _measure(fn: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:  # auto-size the inner loop (like Timer.autorange, with our own target)
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": min(runs) * 1e6,
+        "median_us": statistics.median(runs) * 1e6,
+        "mean_us": statistics.fmean(runs) * 1e6,
+        "stdev_us": (statistics.stdev(runs) if len(runs) > 1 else 0.0) * 1e6,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _compare(results: List[dict], baseline_path: str, max_regression: float) -> int:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {r["name"]: r for r in json.load(f).get("results", [])}
+    regressed = 0
+    print(f"\n{'case':<52} {'base µs':>12} {'now µs':>12} {'ratio':>7}")
+    for r in results:
+        b = base.get(r["name"])
+        if not b or not b.get("median_us"):
+            continue
+        ratio = r["median_us"] / b["median_us"]
+        flag = ""
+        if ratio > max_regression:
+            regressed += 1
+            flag = "  REGRESSION"
+        print(f"{r['name']:<52} {b['median_us']:>12.1f} {r['median_us']:>12.1f} {ratio:>6.2f}x{flag}")
+    print(f"\n{regressed} case(s) slower than {max_regression:g}x baseline")
+    return 1 if regressed else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    ap.add_argument("-k", "--filter", default="", help="run only cases whose name contains this substring")
+    ap.add_argument("--repeat", type=int, default=5, help="timing runs per case (default: 5)")
+    ap.add_argument("--min-time", type=float, default=0.05, help="seconds per timing run (default: 0.05)")
+    ap.add_argument("--quick", action="store_true", help="CI smoke: --repeat 3 --min-time 0.01, 1MB payloads")
+    ap.add_argument("--translate-latency-ms", type=float, default=20.0, help="fake translator latency per call")
+    ap.add_argument("--payload-mb", type=float, default=8.0, help="size of each synthetic upload")
+    ap.add_argument("--compare", help="baseline results JSON to compare medians against")
+    ap.add_argument("--max-regression", type=float, default=1.3, help="allowed median ratio vs baseline (default: 1.3)")
+    args = ap.parse_args()
+    if args.quick:
+        args.repeat, args.min_time, args.payload_mb = 3, 0.01, min(args.payload_mb, 1.0)
+
+    results: List[dict] = []
+    for name, fn in _cases(args):
+        if args.filter and args.filter not in name:
+            continue
+        fn()  # warm-up (imports, caches, first-call allocations)
+        stats = _measure(fn, max(1, args.repeat), max(0.001, args.min_time))
+        results.append({"name": name, **stats})
+        print(f"{name:<52} median {stats['median_us']:>12.1f} µs   min {stats['min_us']:>12.1f} µs   x{stats['number']}")
+
+    if args.output:
+        doc = {
+            "schema": RESULTS_SCHEMA,
+            "meta": {
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": {k: v for k, v in vars(args).items() if k not in {"output", "compare"}},
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        return _compare(results, args.compare, args.max_regression)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""Form schema compiler: prompts.json + UI tables → immutable per-prompt field lists.
+
+Всё, что форма раньше вычисляла на каждом rerun (переменные шаблонов,
+ui.force_vars / ui.var_order, подписи, плейсхолдеры, подсказки, оверрайды,
+тип виджета), собирается один раз на версию каталога. app.py кеширует
+результат рядом с `_get_prompt_manager` (ключ — `manager.version`: меняется
+и при hot reload каталога).
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from ui_tables import (
+    ATTACHMENT_VARS,
+    DEFAULT_ENUM_VALUE,
+    ENUM_OPTIONS,
+    EXAMPLES_DB,
+    OPTIONAL_FIELD_TOGGLES,
+    PROMPT_FIELD_OVERRIDES,
+    SPECIFIC_HINTS,
+    VAR_MAP,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from prompt_manager import PromptManager
+
+
+MULTILINE_TEXT_VARS = frozenset({"scene", "scene_description", "action_sequence", "text", "description", "list"})
+
+# Widget kinds
+ATTACHMENT = "attachment"
+ENUM = "enum"
+TEXTAREA = "textarea"
+TEXT = "text"
+
+
+# --- field helpers (per var, with PROMPT_FIELD_OVERRIDES / SPECIFIC_HINTS) ---
+def _field_override(prompt_id, var_name):
+    pid = (prompt_id or "").strip()
+    v = (var_name or "").lower().strip()
+    return (PROMPT_FIELD_OVERRIDES.get(pid) or {}).get(v, {})
+
+
+def is_attachment_var(var_name, prompt_id=None):
+    v = (var_name or "").lower().strip()
+    ov = _field_override(prompt_id, v)
+    if isinstance(ov, dict) and ov.get("attachment") is True:
+        return True
+    return (v in ATTACHMENT_VARS) or v.startswith("image_") or v.endswith("_image")
+
+
+def field_default_src(var_name, prompt_id=None):
+    ov = _field_override(prompt_id, var_name)
+    return ov.get("default_src") if isinstance(ov, dict) else None
+
+
+def attachment_multi_required(var_name, prompt_id=None):
+    ov = _field_override(prompt_id, var_name)
+    if isinstance(ov, dict) and "multi" in ov:
+        return bool(ov["multi"])
+    return var_name == "people_links"
+
+
+def enum_default_index(var: str) -> int:
+    opts = ENUM_OPTIONS.get(var, [])
+    desired = DEFAULT_ENUM_VALUE.get(var)
+    if desired in opts:
+        return opts.index(desired)
+    return 0
+
+
+def get_placeholder(var: str, prompt_id: str) -> str:
+    specific = SPECIFIC_HINTS.get(prompt_id, {}).get(var, {})
+    if "ph" in specific:
+        return specific["ph"]
+    return EXAMPLES_DB.get(var, {}).get("ph", "Введите значение...")
+
+
+def get_help(var: str, prompt_id: str) -> str:
+    specific = SPECIFIC_HINTS.get(prompt_id, {}).get(var, {})
+    if "help" in specific:
+        return specific["help"]
+    return EXAMPLES_DB.get(var, {}).get("help", "Заполните это поле. Можно использовать русский язык.")
+
+
+# --- schema ---
+@dataclass(frozen=True)
+class FieldSpec:
+    var: str
+    label: str
+    placeholder: str
+    help: str
+    kind: str  # ATTACHMENT | ENUM | TEXTAREA | TEXT
+    widget_key: str
+    options: Tuple[str, ...] = ()
+    default_index: int = 0
+    multi: bool = False  # attachment needs several files/links regardless of the Multi-files toggle
+    optional_label: Optional[str] = None  # set => field sits behind an on/off checkbox
+    optional_default: bool = False
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    prompt_id: str
+    title: str
+    fields: Tuple[FieldSpec, ...]
+
+
+def _ordered_vars(template_vars, ui_meta: Mapping[str, Any]) -> list:
+    req_vars = sorted(template_vars)
+    if not req_vars:
+        return []
+
+    # 1) Force extra vars into the form (e.g., allow uploading logo even if template doesn't reference it).
+    force_vars = ui_meta.get("force_vars", [])
+    if isinstance(force_vars, list):
+        for fv in force_vars:
+            if isinstance(fv, str) and fv and fv not in req_vars:
+                req_vars.append(fv)
+
+    # 2) Reorder vars for a better UX.
+    var_order = ui_meta.get("var_order")
+    if isinstance(var_order, list) and var_order:
+        req_vars = [v for v in var_order if v in req_vars] + [v for v in req_vars if v not in var_order]
+    elif "aspect_ratio" in req_vars:
+        req_vars.remove("aspect_ratio")
+        req_vars.insert(0, "aspect_ratio")
+    return req_vars
+
+
+def compile_form_schema(prompt_id: str, prompt_data: Mapping[str, Any], template_vars) -> FormSchema:
+    """Поля формы задачи в порядке отображения, со всеми оверрайдами."""
+    # UI metadata can override layout behavior for specific prompts.
+    ui_meta = prompt_data.get("ui", {}) if isinstance(prompt_data, dict) else {}
+    if not isinstance(ui_meta, dict):
+        ui_meta = {}
+    label_overrides = ui_meta.get("label_overrides", {})
+    help_overrides = ui_meta.get("help_overrides", {})
+    help_append = ui_meta.get("help_append", {})
+    force_file_vars = ui_meta.get("force_file_vars", []) or []
+
+    fields = []
+    for var in _ordered_vars(template_vars, ui_meta):
+        label = VAR_MAP.get(var, f"Поле: {var}")
+        ph = get_placeholder(var, prompt_id)
+        help_text = get_help(var, prompt_id)
+
+        # UI overrides from prompts.json metadata (minimal decoupling)
+        if isinstance(label_overrides, dict) and var in label_overrides:
+            label = str(label_overrides[var])
+        if isinstance(help_overrides, dict) and var in help_overrides:
+            # Replace the base help text entirely for this field
+            help_text = str(help_overrides[var]) if help_overrides[var] is not None else help_text
+        if isinstance(help_append, dict) and var in help_append and help_append[var]:
+            extra_hint = str(help_append[var])
+            help_text = (help_text + "\n\n" + extra_hint) if help_text else extra_hint
+
+        is_forced_file_var = isinstance(force_file_vars, list) and var in force_file_vars
+        options: Tuple[str, ...] = ()
+        if is_attachment_var(var, prompt_id) or is_forced_file_var:
+            kind = ATTACHMENT
+        elif var in ENUM_OPTIONS:
+            kind = ENUM
+            options = tuple(ENUM_OPTIONS[var])
+        elif var in MULTILINE_TEXT_VARS:
+            kind = TEXTAREA
+        else:
+            kind = TEXT
+
+        toggle = OPTIONAL_FIELD_TOGGLES.get((prompt_id, var))
+        fields.append(
+            FieldSpec(
+                var=var,
+                label=label,
+                placeholder=ph,
+                help=help_text,
+                kind=kind,
+                widget_key=f"{prompt_id}__{var}",
+                options=options,
+                default_index=enum_default_index(var) if kind == ENUM else 0,
+                multi=attachment_multi_required(var, prompt_id) if kind == ATTACHMENT else False,
+                optional_label=toggle["label"] if toggle else None,
+                optional_default=bool(toggle["default"]) if toggle else False,
+            )
+        )
+
+    title = prompt_data.get("title", prompt_id) if isinstance(prompt_data, dict) else prompt_id
+    return FormSchema(prompt_id=prompt_id, title=str(title), fields=tuple(fields))
+
+
+class _LazyFormSchemas(Mapping):
+    """Schemas of a lazy catalog: compiled on first access, then memoized."""
+
+    def __init__(self, manager: "PromptManager"):
+        self._manager = manager
+        self._compiled: Dict[str, FormSchema] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, prompt_id: str) -> FormSchema:
+        schema = self._compiled.get(prompt_id)
+        if schema is None:
+            if prompt_id not in self._manager.index:
+                raise KeyError(prompt_id)
+            schema = compile_form_schema(
+                prompt_id, self._manager.prompts[prompt_id], self._manager.variables(prompt_id)
+            )
+            with self._lock:
+                schema = self._compiled.setdefault(prompt_id, schema)
+        return schema
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._manager.index)
+
+    def __len__(self) -> int:
+        return len(self._manager.index)
+
+
+def compile_form_schemas(manager: "PromptManager") -> Mapping[str, FormSchema]:
+    """Read-only {prompt_id: FormSchema} for every prompt of the manager.
+
+    Lazy catalogs (shards / SQLite) compile per prompt on first access
+    instead of loading every template body up front; schemas from the
+    build artifact (prompt_artifact) are reused as is.
+    """
+    if manager.store.lazy:
+        return _LazyFormSchemas(manager)
+    precompiled = manager.precompiled.get("form_schemas")
+    if precompiled is not None:
+        return MappingProxyType(precompiled)
+    out: Dict[str, FormSchema] = {}
+    for pid, data in manager.prompts.items():
+        out[pid] = compile_form_schema(pid, data, manager.variables(pid))
+    return MappingProxyType(out)
@@ -4,10 +4,11 @@ import uuid
 
 import streamlit as st
 
-from .auth import NoAuthProvider
-from .config import FutureSaaSConfig, UsageMode, load_future_config
+from .config import FutureSaaSConfig, load_future_config
 from .context import RequestContext
-from .usage import NoopUsageRecorder, UsageRecorder
+from .limits import UsageLimiter
+from .runtime import build_request_context, build_usage_limiter, build_usage_recorder
+from .usage import UsageRecorder
 
 
 @st.cache_resource
@@ -17,11 +18,13 @@ def get_future_config() -> FutureSaaSConfig:
 
 @st.cache_resource
 def get_usage_recorder() -> UsageRecorder:
-    cfg = get_future_config()
-    # Only NOOP is implemented today.
-    if cfg.usage_mode != UsageMode.NOOP:
-        return NoopUsageRecorder()
-    return NoopUsageRecorder()
+    return build_usage_recorder(get_future_config())
+
+
+@st.cache_resource
+def get_usage_limiter() -> UsageLimiter:
+    # Process-wide: buckets must outlive reruns and be shared by all sessions.
+    return build_usage_limiter(get_future_config())
 
 
 def _ensure_session_id() -> str:
@@ -45,9 +48,5 @@ def get_request_context() -> RequestContext:
 
     cfg = get_future_config()
     session_id = _ensure_session_id()
-    request_id = uuid.uuid4().hex
     ip, ua = _get_ip_and_ua(trust_proxy_headers=cfg.trust_proxy_headers)
-
-    # Current state: no auth. Future: swap provider based on cfg.auth_mode.
-    provider = NoAuthProvider()
-    return provider.get_context(request_id=request_id, session_id=session_id, ip=ip, user_agent=ua)
+    return build_request_context(cfg, session_id=session_id, ip=ip, user_agent=ua)
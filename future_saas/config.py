@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import Dict
 
 
 class AuthMode(str, Enum):
@@ -34,14 +35,13 @@ class SecretsMode(str, Enum):
 class UsageMode(str, Enum):
     """Usage accounting backend.
 
-    NOTE: Only NOOP is implemented today.
+    Everything except NOOP goes through BufferedUsageRecorder (background flush).
     """
 
     NOOP = "noop"
-    # Future modes (design placeholders):
-    LOG = "log"
-    REDIS = "redis"
-    HTTP = "http"
+    LOG = "log"  # JSONL file with rotation (usage_log_path) or the "usage" logger
+    REDIS = "redis"  # RPUSH to a Redis-protocol server (usage_redis_url)
+    HTTP = "http"  # batched JSON POST (usage_http_url)
 
 
 def _env_int(name: str, default: int) -> int:
@@ -52,6 +52,27 @@ def _env_int(name: str, default: int) -> int:
         return int(default)
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return float(raw) if raw else float(default)
+    except Exception:
+        return float(default)
+
+
+def _env_tier_map(name: str) -> Dict[str, int]:
+    """"pro=300,enterprise=0" -> {"pro": 300, "enterprise": 0}; malformed items are skipped."""
+    out: Dict[str, int] = {}
+    for item in (os.getenv(name) or "").split(","):
+        tier, sep, raw = item.partition("=")
+        try:
+            if sep and tier.strip():
+                out[tier.strip().lower()] = int(raw.strip())
+        except ValueError:
+            continue
+    return out
+
+
 def _env_bool(name: str, default: bool = False) -> bool:
     raw = (os.getenv(name) or "").strip().lower()
     if not raw:
@@ -78,8 +99,29 @@ class FutureSaaSConfig:
     # X-Forwarded-* headers for IP/user-agent attribution.
     trust_proxy_headers: bool = False
 
-    # Future: request-level soft limits (placeholders)
-    usage_units_per_minute: int = 0  # 0 => unlimited (no enforcement)
+    # Request-level rate limits (future_saas.limits). 0 => unlimited (no enforcement).
+    usage_units_per_minute: int = 0
+    usage_burst: int = 0  # bucket size; 0 => usage_units_per_minute
+    usage_tier_units_per_minute: Dict[str, int] = field(default_factory=dict)  # overrides by tier value
+    usage_limit_backend: str = "memory"  # memory | redis (shared by workers)
+    usage_limit_redis_url: str = ""  # empty => usage_redis_url
+    usage_limit_max_keys: int = 10_000  # in-process buckets kept (LRU)
+
+    # Usage sinks (usage_mode != NOOP). Secrets (HTTP token, Redis password) are
+    # read through SecretProvider, never stored here.
+    usage_log_path: str = ""  # LOG: JSONL file; empty => "usage" logger
+    usage_log_max_bytes: int = 10 * 1024 * 1024
+    usage_log_backups: int = 5
+    usage_http_url: str = ""
+    usage_redis_url: str = "redis://127.0.0.1:6379/0"
+    usage_redis_key: str = "nanobanano:usage"
+
+    # BufferedUsageRecorder: bounded queue + background batch flush.
+    usage_queue_size: int = 10_000
+    usage_batch_size: int = 100
+    usage_flush_interval_sec: float = 1.0
+    usage_overflow: str = "drop_new"  # drop_new | drop_oldest | block
+    usage_block_timeout_sec: float = 0.05
 
     # Header names (future API-key auth)
     api_key_header: str = "X-API-Key"
@@ -104,6 +146,22 @@ def load_future_config() -> FutureSaaSConfig:
         debug_errors=_env_bool("NANOBANANO_DEBUG_ERRORS", False),
         trust_proxy_headers=_env_bool("NANOBANANO_TRUST_PROXY_HEADERS", False),
         usage_units_per_minute=_env_int("NANOBANANO_USAGE_UNITS_PER_MINUTE", 0),
+        usage_burst=_env_int("NANOBANANO_USAGE_BURST", 0),
+        usage_tier_units_per_minute=_env_tier_map("NANOBANANO_USAGE_TIER_UNITS_PER_MINUTE"),
+        usage_limit_backend=(os.getenv("NANOBANANO_USAGE_LIMIT_BACKEND") or "memory").strip().lower(),
+        usage_limit_redis_url=(os.getenv("NANOBANANO_USAGE_LIMIT_REDIS_URL") or "").strip(),
+        usage_limit_max_keys=_env_int("NANOBANANO_USAGE_LIMIT_MAX_KEYS", 10_000),
+        usage_log_path=(os.getenv("NANOBANANO_USAGE_LOG_PATH") or "").strip(),
+        usage_log_max_bytes=_env_int("NANOBANANO_USAGE_LOG_MAX_BYTES", 10 * 1024 * 1024),
+        usage_log_backups=_env_int("NANOBANANO_USAGE_LOG_BACKUPS", 5),
+        usage_http_url=(os.getenv("NANOBANANO_USAGE_HTTP_URL") or "").strip(),
+        usage_redis_url=(os.getenv("NANOBANANO_USAGE_REDIS_URL") or "redis://127.0.0.1:6379/0").strip(),
+        usage_redis_key=(os.getenv("NANOBANANO_USAGE_REDIS_KEY") or "nanobanano:usage").strip(),
+        usage_queue_size=_env_int("NANOBANANO_USAGE_QUEUE_SIZE", 10_000),
+        usage_batch_size=_env_int("NANOBANANO_USAGE_BATCH_SIZE", 100),
+        usage_flush_interval_sec=_env_float("NANOBANANO_USAGE_FLUSH_INTERVAL_SEC", 1.0),
+        usage_overflow=(os.getenv("NANOBANANO_USAGE_OVERFLOW") or "drop_new").strip().lower(),
+        usage_block_timeout_sec=_env_float("NANOBANANO_USAGE_BLOCK_TIMEOUT_SEC", 0.05),
         api_key_header=(os.getenv("NANOBANANO_API_KEY_HEADER") or "X-API-Key").strip(),
         api_key_id_header=(os.getenv("NANOBANANO_API_KEY_ID_HEADER") or "X-API-Key-Id").strip(),
     )
@@ -1,31 +1,236 @@
-from __future__ import annotations
-
 """Usage limit hooks.
 
-This module exists to make adding:
-  - per-user/API key limits
-  - tiered quotas
-  - burst controls
+enforce_usage_limits(ctx, action, units, limiter) asks a UsageLimiter whether
+the actor of `ctx` may spend `units` now. Without a limiter (or with
+usage_units_per_minute=0 for the actor's tier) everything is allowed.
+
+Actor key (most specific first): API client → authenticated user → IP →
+session. Anonymous Streamlit sessions have no IP today, so they are limited
+per session; server.py requests are limited per client IP (X-Session-Id is
+client-chosen and would let a client rotate its way out of the limit).
 
-possible without rewriting the app.
+Backends:
+- TokenBucketLimiter — in-process token buckets, O(1) per check, at most
+  `max_keys` buckets (least recently used are evicted; an idle bucket refills
+  to full anyway, so evicting it changes nothing).
+- RedisWindowLimiter — sliding-window counter shared by all workers
+  (INCRBY + PEXPIRE + GET in one round trip, no Lua). If Redis is unreachable
+  it falls back to a per-process TokenBucketLimiter: limits are never
+  silently switched off. Each thread has its own connection, so concurrent
+  checks do not queue behind one another's round trip.
 
-Current implementation is allow-all.
+Tiers are labels only (see SubscriptionTier); the per-tier numbers come from
+configuration, not from the client.
 """
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional
 
 from .context import RequestContext
+from .resp import RespConnection
 from .usage import UsageAction
 
+logger = logging.getLogger(__name__)
 
-def enforce_usage_limits(ctx: RequestContext, action: UsageAction, units: int = 1) -> bool:
-    """Return True if the action is allowed.
 
-    Future design:
-    - consult a quota backend
-    - implement replay/burst protection
-    - deny-by-default for unknown tiers in SaaS mode
+def actor_key(ctx: RequestContext) -> str:
+    """Stable, non-secret rate-limit key for the caller of `ctx`."""
+    if ctx.api_client and ctx.api_client.client_id:
+        return f"client:{ctx.api_client.client_id}"
+    if ctx.user and ctx.user.is_authenticated and ctx.user.user_id:
+        return f"user:{ctx.user.user_id}"
+    if ctx.ip:
+        return f"ip:{ctx.ip}"
+    return f"session:{ctx.session_id}"
+
+
+class RateLimiter(ABC):
+    """Backend primitive: may `key` spend `units` under `per_minute` with bucket size `burst`?"""
+
+    @abstractmethod
+    def allow(self, key: str, *, per_minute: float, burst: float, units: int = 1) -> bool:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class TokenBucketLimiter(RateLimiter):
+    """Token bucket per key; buckets live in an LRU dict capped at `max_keys`."""
+
+    def __init__(self, *, max_keys: int = 10_000, clock=time.monotonic):
+        self.max_keys = max(1, int(max_keys))
+        self._clock = clock
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "denied": 0, "evicted": 0}
+
+    def allow(self, key: str, *, per_minute: float, burst: float, units: int = 1) -> bool:
+        rate = float(per_minute) / 60.0
+        capacity = float(burst)
+        now = self._clock()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = [capacity, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self._stats["evicted"] += 1
+            else:
+                self._buckets.move_to_end(key)
+                b[0] = min(capacity, b[0] + (now - b[1]) * rate)
+                b[1] = now
+            if b[0] >= units:
+                b[0] -= units
+                self._stats["allowed"] += 1
+                return True
+            self._stats["denied"] += 1
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"buckets": len(self._buckets), **self._stats}
+
+
+class RedisWindowLimiter(RateLimiter):
+    """Sliding-window counter in Redis, shared by every worker that uses the same `prefix`.
+
+    Count = current minute + previous minute weighted by the part of it still
+    inside the last 60 s. `burst` is not used: the window itself allows up to
+    `per_minute` at once. Denied requests are not counted (DECRBY).
+    Window boundaries use the local clock, so keep worker clocks in sync (NTP).
+    """
+
+    WINDOW_SEC = 60
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        password: Optional[str] = None,
+        prefix: str = "nanobanano:ratelimit",
+        timeout: float = 0.5,
+        fallback: Optional[TokenBucketLimiter] = None,
+        retry_after_sec: float = 5.0,
+    ):
+        self.url = url
+        self._password = password
+        self.timeout = float(timeout)
+        self._local = threading.local()  # .conn: this thread's RespConnection
+        self.prefix = prefix
+        self.fallback = fallback or TokenBucketLimiter()
+        self.retry_after_sec = float(retry_after_sec)
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._stats = {"allowed": 0, "denied": 0, "backend_errors": 0}
+
+    def _conn(self) -> RespConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = RespConnection(self.url, password=self._password, timeout=self.timeout)
+        return conn
+
+    def _allow_shared(self, key: str, per_minute: float, units: int) -> bool:
+        now = time.time()
+        window = int(now // self.WINDOW_SEC)
+        elapsed = (now % self.WINDOW_SEC) / self.WINDOW_SEC
+        cur = f"{self.prefix}:{key}:{window}"
+        prev = f"{self.prefix}:{key}:{window - 1}"
+        conn = self._conn()
+        count, _, prev_count = conn.pipeline(
+            ("INCRBY", cur, str(int(units))),
+            ("PEXPIRE", cur, str(2 * self.WINDOW_SEC * 1000)),
+            ("GET", prev),
+        )
+        if int(prev_count or 0) * (1.0 - elapsed) + int(count) <= per_minute:
+            return True
+        conn.command("DECRBY", cur, str(int(units)))
+        return False
+
+    def allow(self, key: str, *, per_minute: float, burst: float, units: int = 1) -> bool:
+        # The lock covers only _down_until and the stats, never the round trip.
+        with self._lock:
+            use_shared = time.monotonic() >= self._down_until
+        if use_shared:
+            try:
+                ok = self._allow_shared(key, per_minute, units)
+            except Exception as e:
+                with self._lock:
+                    self._stats["backend_errors"] += 1
+                    self._down_until = time.monotonic() + self.retry_after_sec
+                logger.warning(
+                    "Rate-limit backend unavailable (%s); per-process limits for %.0fs",
+                    type(e).__name__, self.retry_after_sec,
+                )
+            else:
+                with self._lock:
+                    self._stats["allowed" if ok else "denied"] += 1
+                return ok
+        return self.fallback.allow(key, per_minute=per_minute, burst=burst, units=units)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            own = dict(self._stats)
+        fb = self.fallback.stats()
+        return {
+            "buckets": fb.get("buckets", 0),
+            "allowed": own["allowed"] + fb.get("allowed", 0),
+            "denied": own["denied"] + fb.get("denied", 0),
+            "evicted": fb.get("evicted", 0),
+            "backend_errors": own["backend_errors"],
+        }
+
+
+class UsageLimiter:
+    """Per-tier policy on top of a RateLimiter backend.
+
+    per_minute: units per minute for tiers missing from `tier_per_minute`
+    (0 = unlimited); burst: bucket size, 0 = one minute's worth.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimiter,
+        *,
+        per_minute: float = 0,
+        burst: float = 0,
+        tier_per_minute: Optional[Mapping[str, float]] = None,
+    ):
+        self.backend = backend
+        self.per_minute = max(0.0, float(per_minute))
+        self.burst = max(0.0, float(burst))
+        self.tier_per_minute = {str(k).lower(): max(0.0, float(v)) for k, v in (tier_per_minute or {}).items()}
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0 or any(v > 0 for v in self.tier_per_minute.values())
+
+    def check(self, ctx: RequestContext, action: UsageAction, units: int = 1) -> bool:
+        # One budget per actor across actions; `units` weighs the action.
+        _ = action
+        limit = self.tier_per_minute.get(str(ctx.tier.value), self.per_minute)
+        if limit <= 0:
+            return True
+        return self.backend.allow(actor_key(ctx), per_minute=limit, burst=self.burst or limit, units=max(1, int(units)))
+
+    def stats(self) -> Dict[str, int]:
+        return self.backend.stats()
+
+
+def enforce_usage_limits(
+    ctx: RequestContext, action: UsageAction, units: int = 1, limiter: Optional[UsageLimiter] = None
+) -> bool:
+    """Return True if the action is allowed.
 
-    Today: always allow.
+    `limiter` comes from runtime.build_usage_limiter (bootstrap.get_usage_limiter
+    in the UI). None => allow-all (callers that do not enforce limits).
     """
 
-    _ = (ctx, action, units)
-    return True
+    if limiter is None:
+        return True
+    return limiter.check(ctx, action, units)
@@ -0,0 +1,113 @@
+"""Minimal Redis protocol (RESP2) client, stdlib only.
+
+Used by the Redis usage sink and the shared rate-limit backend. Speaks to
+Redis, Valkey, KeyDB or scripts/usage_standin.py. One persistent socket,
+not thread-safe: callers hold their own lock. Any error closes the socket;
+the next command reconnects.
+"""
+from __future__ import annotations
+
+import socket
+from typing import Any, List, Optional, Sequence
+from urllib.parse import unquote, urlsplit
+
+
+class RedisError(RuntimeError):
+    """Error reply (-ERR ...) or protocol violation."""
+
+
+class RespConnection:
+    def __init__(self, url: str, *, password: Optional[str] = None, timeout: float = 2.0):
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError("Redis URL must be redis://host:port/db")
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.db = int((parts.path or "/0").strip("/") or 0)
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = password or (unquote(parts.password) if parts.password else None)
+        self.timeout = float(timeout)
+        self._sock: Optional[socket.socket] = None
+        self._buf = b""
+
+    @staticmethod
+    def encode(*args: str) -> bytes:
+        out = [f"*{len(args)}\r\n".encode()]
+        for a in args:
+            b = str(a).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        return b"".join(out)
+
+    def _fill(self, n: int) -> None:
+        while len(self._buf) < n:
+            chunk = self._sock.recv(65536)  # type: ignore[union-attr]
+            if not chunk:
+                raise ConnectionError("Redis connection closed")
+            self._buf += chunk
+
+    def _readline(self) -> bytes:
+        while b"\r\n" not in self._buf:
+            self._fill(len(self._buf) + 1)
+        line, self._buf = self._buf.split(b"\r\n", 1)
+        return line
+
+    def _reply(self) -> Any:
+        """+simple → bytes, :int → int, $bulk → bytes | None, *array → list; -ERR → RedisError (returned, not raised)."""
+        line = self._readline()
+        kind, rest = line[:1], line[1:]
+        if kind == b"-":
+            return RedisError(rest.decode("utf-8", "replace"))
+        if kind == b"+":
+            return rest
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            self._fill(n + 2)
+            data, self._buf = self._buf[:n], self._buf[n + 2:]
+            return data
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._reply() for _ in range(n)]
+        raise RedisError(f"unexpected reply type {kind!r}")
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._buf = b""
+        if self.password:
+            auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            self._execute([auth])
+        if self.db:
+            self._execute([("SELECT", str(self.db))])
+
+    def _execute(self, commands: Sequence[Sequence[str]]) -> List[Any]:
+        self._sock.sendall(b"".join(self.encode(*c) for c in commands))  # type: ignore[union-attr]
+        # Read every reply before raising, so the stream stays aligned.
+        replies = [self._reply() for _ in commands]
+        for r in replies:
+            if isinstance(r, RedisError):
+                raise r
+        return replies
+
+    def pipeline(self, *commands: Sequence[str]) -> List[Any]:
+        """Sends all commands in one write and returns their replies (one round trip)."""
+        try:
+            if self._sock is None:
+                self._connect()
+            return self._execute(commands)
+        except Exception:
+            self.close()
+            raise
+
+    def command(self, *args: str) -> Any:
+        return self.pipeline(args)[0]
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
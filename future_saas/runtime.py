@@ -0,0 +1,99 @@
+"""Streamlit-free wiring for non-UI entry points (HTTP service, batch jobs).
+
+`bootstrap.py` wraps these factories in `st.cache_resource` for the UI;
+servers call them directly and keep the results for the process lifetime.
+"""
+from __future__ import annotations
+
+import atexit
+import uuid
+from typing import Optional
+
+from .auth import AuthProvider, NoAuthProvider
+from .config import FutureSaaSConfig, UsageMode
+from .context import RequestContext
+from .limits import RedisWindowLimiter, TokenBucketLimiter, UsageLimiter
+from .secrets import EnvSecretProvider, SecretProvider
+from .usage import BufferedUsageRecorder, NoopUsageRecorder, UsageRecorder, UsageSink
+from .usage_sinks import HttpSink, JsonlFileSink, LoggingSink, RedisSink
+
+
+def build_usage_sink(cfg: FutureSaaSConfig, secrets: Optional[SecretProvider] = None) -> UsageSink:
+    """Sink for cfg.usage_mode. Misconfiguration raises: usage logging fails closed."""
+    secrets = secrets or EnvSecretProvider()
+    if cfg.usage_mode == UsageMode.LOG:
+        if cfg.usage_log_path:
+            return JsonlFileSink(cfg.usage_log_path, max_bytes=cfg.usage_log_max_bytes, backups=cfg.usage_log_backups)
+        return LoggingSink()
+    if cfg.usage_mode == UsageMode.HTTP:
+        if not cfg.usage_http_url:
+            raise ValueError("NANOBANANO_USAGE_MODE=http requires NANOBANANO_USAGE_HTTP_URL")
+        return HttpSink(cfg.usage_http_url, token=secrets.get("NANOBANANO_USAGE_HTTP_TOKEN"))
+    if cfg.usage_mode == UsageMode.REDIS:
+        return RedisSink(
+            cfg.usage_redis_url, key=cfg.usage_redis_key, password=secrets.get("NANOBANANO_USAGE_REDIS_PASSWORD")
+        )
+    raise ValueError(f"No usage sink for mode {cfg.usage_mode.value!r}")
+
+
+def build_usage_recorder(cfg: FutureSaaSConfig) -> UsageRecorder:
+    if cfg.usage_mode == UsageMode.NOOP:
+        return NoopUsageRecorder()
+    rec = BufferedUsageRecorder(
+        build_usage_sink(cfg),
+        max_queue=cfg.usage_queue_size,
+        batch_size=cfg.usage_batch_size,
+        flush_interval=cfg.usage_flush_interval_sec,
+        overflow=cfg.usage_overflow,
+        block_timeout=cfg.usage_block_timeout_sec,
+    )
+    # Ship what is still queued when the process exits (Streamlit / server.py shutdown).
+    atexit.register(rec.close)
+    return rec
+
+
+def build_usage_limiter(cfg: FutureSaaSConfig, secrets: Optional[SecretProvider] = None) -> UsageLimiter:
+    """Limiter for enforce_usage_limits. Unknown backend raises: limits fail closed."""
+    local = TokenBucketLimiter(max_keys=cfg.usage_limit_max_keys)
+    if cfg.usage_limit_backend == "memory":
+        backend = local
+    elif cfg.usage_limit_backend == "redis":
+        secrets = secrets or EnvSecretProvider()
+        backend = RedisWindowLimiter(
+            cfg.usage_limit_redis_url or cfg.usage_redis_url,
+            password=secrets.get("NANOBANANO_USAGE_REDIS_PASSWORD"),
+            fallback=local,
+        )
+    else:
+        raise ValueError(f"Unknown NANOBANANO_USAGE_LIMIT_BACKEND {cfg.usage_limit_backend!r} (memory|redis)")
+    return UsageLimiter(
+        backend,
+        per_minute=cfg.usage_units_per_minute,
+        burst=cfg.usage_burst,
+        tier_per_minute=cfg.usage_tier_units_per_minute,
+    )
+
+
+def build_auth_provider(cfg: FutureSaaSConfig) -> AuthProvider:
+    # Current state: no auth. Future: swap provider based on cfg.auth_mode.
+    _ = cfg
+    return NoAuthProvider()
+
+
+def build_request_context(
+    cfg: FutureSaaSConfig,
+    *,
+    session_id: str = "",
+    ip: str = "",
+    user_agent: str = "",
+    request_id: Optional[str] = None,
+    provider: Optional[AuthProvider] = None,
+) -> RequestContext:
+    """Build a safe RequestContext; ip/user_agent must already respect cfg.trust_proxy_headers."""
+    provider = provider or build_auth_provider(cfg)
+    return provider.get_context(
+        request_id=request_id or uuid.uuid4().hex,
+        session_id=session_id or uuid.uuid4().hex,
+        ip=ip,
+        user_agent=user_agent,
+    )
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import logging
+import threading
 import time
 from abc import ABC, abstractmethod
+from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Optional
+from typing import Any, Deque, Dict, List, Optional, Sequence
 
 from .context import RequestContext
 
+logger = logging.getLogger(__name__)
+
 
 class UsageAction(str, Enum):
     """High-level actions that matter for future billing/limits."""
@@ -54,6 +59,198 @@ class NoopUsageRecorder(UsageRecorder):
         return None
 
 
+def event_to_dict(event: UsageEvent) -> Dict[str, Any]:
+    """JSON-ready form of an event (what sinks ship)."""
+    return {
+        "action": event.action.value if isinstance(event.action, UsageAction) else str(event.action),
+        "ts": event.ts,
+        "units": event.units,
+        "request_id": event.request_id,
+        "session_id": event.session_id,
+        "actor_id": event.actor_id,
+        "tier": event.tier,
+        "meta": dict(event.meta),
+    }
+
+
+class UsageSink(ABC):
+    """Destination of event batches (see usage_sinks.py). Called from the flusher thread only."""
+
+    @abstractmethod
+    def send(self, events: Sequence[UsageEvent]) -> None:
+        """Deliver the whole batch or raise (the batch is retried)."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        return None
+
+
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest", "block")
+
+
+class BufferedUsageRecorder(UsageRecorder):
+    """Non-blocking recorder: `record` appends to a bounded deque, a daemon thread ships batches.
+
+    A batch goes out when `batch_size` events are queued or every `flush_interval`
+    seconds. When the queue is full, `overflow` decides:
+      - drop_new:    the new event is dropped (record never waits; default)
+      - drop_oldest: the oldest queued event is dropped
+      - block:       wait up to `block_timeout` for space, then drop the new event
+    A failed batch is retried on the next tick, `max_retries` times, then dropped
+    (counted in stats()["failed"]). `flush()` waits for the queue to drain;
+    `close()` flushes and stops the thread (runtime.py registers it with atexit).
+
+    No lock on the record path: deque append/len are atomic in CPython, so
+    under contention the queue may overshoot `max_queue` by a few events.
+    """
+
+    def __init__(
+        self,
+        sink: UsageSink,
+        *,
+        max_queue: int = 10_000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        overflow: str = "drop_new",
+        block_timeout: float = 0.05,
+        max_retries: int = 3,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"usage overflow policy must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        self.sink = sink
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.overflow = overflow
+        self.block_timeout = max(0.0, float(block_timeout))
+        self.max_retries = max(0, int(max_retries))
+
+        # drop_oldest: the deque itself evicts from the left.
+        self._q: Deque[UsageEvent] = deque(maxlen=self.max_queue if overflow == "drop_oldest" else None)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._state = threading.Condition()  # space for `block`, "drained" for flush()
+        self._inflight = 0
+        self._retry: Optional[List[UsageEvent]] = None
+        self._attempts = 0
+        self._retry_at = 0.0
+        self._stats = {"sent": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="usage-flusher", daemon=True)
+        self._thread.start()
+
+    # ---- producer side (UI / request threads) ----
+
+    def record(self, ctx: RequestContext, event: UsageEvent) -> None:
+        if self._closed:
+            self._count("dropped")
+            return
+        if len(self._q) >= self.max_queue:
+            if self.overflow == "drop_new":
+                self._count("dropped")
+                return
+            if self.overflow == "block":
+                with self._state:
+                    if not self._state.wait_for(lambda: len(self._q) < self.max_queue, self.block_timeout):
+                        self._count("dropped")
+                        return
+            else:
+                self._count("dropped")  # drop_oldest: append below evicts the leftmost event
+        self._q.append(event)
+        if len(self._q) >= self.batch_size:
+            self._wake.set()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._state:
+            self._stats[key] += n
+
+    def stats(self) -> Dict[str, int]:
+        with self._state:
+            return {"queued": len(self._q) + self._inflight, **self._stats}
+
+    # ---- flusher thread ----
+
+    def _next_batch(self) -> List[UsageEvent]:
+        if self._retry is not None:
+            return self._retry
+        batch: List[UsageEvent] = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._q.popleft())
+            except IndexError:
+                break
+        with self._state:
+            self._inflight = len(batch)
+            self._state.notify_all()  # space freed for `block` producers
+        return batch
+
+    def _drain(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                self.sink.send(batch)
+            except Exception as e:
+                self._attempts += 1
+                if self._attempts <= self.max_retries and not self._stop.is_set():
+                    logger.warning("Usage sink %s failed (%s), retry %s/%s",
+                                   type(self.sink).__name__, type(e).__name__, self._attempts, self.max_retries)
+                    self._retry = batch
+                    self._retry_at = time.monotonic() + self.flush_interval * self._attempts
+                    return
+                logger.warning("Usage sink %s failed (%s): %d event(s) dropped",
+                               type(self.sink).__name__, type(e).__name__, len(batch))
+                outcome = "failed"
+            else:
+                outcome = "sent"
+            self._retry = None
+            self._attempts = 0
+            with self._state:
+                self._stats[outcome] += len(batch)
+                self._stats["batches"] += outcome == "sent"
+                self._inflight = 0
+                self._state.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            stopping = self._stop.is_set()
+            if self._retry is not None and not stopping and time.monotonic() < self._retry_at:
+                continue  # backoff after a failed batch, even if producers wake us
+            try:
+                self._drain()
+            except Exception:  # pragma: no cover - never let the flusher die
+                logger.exception("Usage flusher error")
+            if stopping:
+                return
+
+    # ---- lifecycle ----
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ship everything queued so far. True if the queue drained within `timeout`."""
+        self._wake.set()
+        with self._state:
+            return self._state.wait_for(lambda: not self._q and self._inflight == 0, max(0.0, float(timeout)))
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        try:
+            self.sink.close()
+        except Exception:
+            pass
+        st = self.stats()
+        if st["dropped"] or st["failed"] or st["queued"]:
+            logger.warning("Usage recorder closed: %s", st)
+
+
 def make_event(
     *,
     ctx: RequestContext,
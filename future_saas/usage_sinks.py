@@ -0,0 +1,123 @@
+"""Usage event sinks for BufferedUsageRecorder (stdlib only).
+
+- LoggingSink    — one JSON line per event to the "usage" logger
+- JsonlFileSink  — JSONL file with size-based rotation (path, path.1 … path.N)
+- HttpSink       — POST {"events": [...]} as one JSON request per batch
+- RedisSink      — RPUSH of JSON events over the Redis protocol (RESP);
+                   works with Redis, Valkey, KeyDB or a local stand-in
+
+Sinks run on the flusher thread only; they raise on failure and the recorder
+retries the batch. Events are metadata-only (see UsageEvent). Do not log sink
+URLs or credentials.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import urllib.request
+from typing import List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from .resp import RespConnection
+from .usage import UsageEvent, UsageSink, event_to_dict
+
+
+def _dumps(event: UsageEvent) -> str:
+    return json.dumps(event_to_dict(event), ensure_ascii=False, separators=(",", ":"))
+
+
+class LoggingSink(UsageSink):
+    def __init__(self, log: Optional[logging.Logger] = None):
+        self.log = log or logging.getLogger("usage")
+
+    def send(self, events: Sequence[UsageEvent]) -> None:
+        for e in events:
+            self.log.info("%s", _dumps(e))
+
+
+class JsonlFileSink(UsageSink):
+    """Appends one JSON line per event; rotates like logging.handlers.RotatingFileHandler.
+
+    backups=0 disables rotation. One writer process per file: give every worker
+    its own path (`{pid}` in the path is replaced with the PID).
+    """
+
+    def __init__(self, path: str, *, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.path = str(path).replace("{pid}", str(os.getpid()))
+        self.max_bytes = max(0, int(max_bytes))
+        self.backups = max(0, int(backups))
+        self._f = None
+
+    def _open(self):
+        if self._f is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._f = open(self.path, "a", encoding="utf-8")
+        return self._f
+
+    def _rotate(self) -> None:
+        self.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def send(self, events: Sequence[UsageEvent]) -> None:
+        data = "".join(_dumps(e) + "\n" for e in events)
+        f = self._open()
+        if self.backups and self.max_bytes and f.tell() and f.tell() + len(data.encode("utf-8")) > self.max_bytes:
+            self._rotate()
+            f = self._open()
+        f.write(data)
+        f.flush()
+
+    def close(self) -> None:
+        if self._f is not None:
+            try:
+                self._f.close()
+            finally:
+                self._f = None
+
+
+class HttpSink(UsageSink):
+    """One POST per batch; any non-2xx status or network error fails the batch."""
+
+    def __init__(self, url: str, *, token: Optional[str] = None, timeout: float = 5.0):
+        if urlsplit(url).scheme not in ("http", "https"):
+            raise ValueError("Usage HTTP sink URL must be http(s)://")
+        self.url = url
+        self.token = token
+        self.timeout = float(timeout)
+
+    def send(self, events: Sequence[UsageEvent]) -> None:
+        body = json.dumps({"events": [event_to_dict(e) for e in events]}, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, method="POST")
+        req.add_header("Content-Type", "application/json; charset=utf-8")
+        if self.token:
+            req.add_header("Authorization", f"Bearer {self.token}")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:  # noqa: S310 (scheme checked above)
+            resp.read()
+            if not 200 <= resp.status < 300:
+                raise RuntimeError(f"usage HTTP sink: HTTP {resp.status}")
+
+
+class RedisSink(UsageSink):
+    """RPUSH <key> <event json>... over one persistent RESP connection (reconnects on error)."""
+
+    def __init__(self, url: str, *, key: str = "nanobanano:usage", password: Optional[str] = None, timeout: float = 2.0):
+        self._conn = RespConnection(url, password=password, timeout=timeout)
+        self.key = key
+        self._lock = threading.Lock()
+
+    def send(self, events: Sequence[UsageEvent]) -> None:
+        values: List[str] = [_dumps(e) for e in events]
+        with self._lock:
+            self._conn.command("RPUSH", self.key, *values)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
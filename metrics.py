@@ -0,0 +1,369 @@
+"""Process-level metrics in the Prometheus text exposition format (stdlib only).
+
+Счётчики и гистограммы объявляются на уровне модулей и пишутся прямо
+в горячем пути (lock + сложение):
+
+    API_ERRORS = counter("nanobanano_api_errors_total", "...", ("client", "status"))
+    API_ERRORS.inc(client="sync", status="503")
+
+Состояние, которое дешевле прочитать, чем считать (глубина очереди
+executor'а, размер кеша переводов, версия каталога), отдают collectors:
+register_collector(key, fn) — fn() возвращает Sample'ы в момент экспорта.
+Повторная регистрация с тем же key заменяет старую (Streamlit перезапускает
+app.py на каждом rerun).
+
+Экспорт (процесс-wide, включается один раз):
+- NANOBANANO_METRICS_PORT — HTTP `/metrics` в фоновом потоке
+  (адрес NANOBANANO_METRICS_HOST, по умолчанию 127.0.0.1)
+- NANOBANANO_METRICS_TEXTFILE — файл, переписываемый каждые
+  NANOBANANO_METRICS_INTERVAL_SEC (для node_exporter textfile collector);
+  `{pid}` в пути заменяется на PID — по файлу на воркер.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cache lookups (sub-ms) up to slow API calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return int(raw) if raw else int(default)
+    except Exception:
+        return int(default)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return float(raw) if raw else float(default)
+    except Exception:
+        return float(default)
+
+
+class Sample(NamedTuple):
+    """One exported value of a collector (kind: "gauge" or "counter")."""
+
+    name: str
+    kind: str
+    help: str
+    labels: Dict[str, str]
+    value: float
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + float(amount)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # labels -> [per-bucket counts (non-cumulative)..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        v = float(value)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                h = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, le in enumerate(self.buckets):
+                if v <= le:
+                    h[i] += 1
+                    break
+            h[-2] += 1
+            h[-1] += v
+
+    def count(self, **labels: str) -> float:
+        with self._lock:
+            h = self._values.get(self._key(labels))
+            return h[-2] if h else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(h)) for k, h in self._values.items())
+        lines: List[str] = []
+        for key, h in items:
+            cumulative = 0.0
+            for i, le in enumerate(self.buckets):
+                cumulative += h[i]
+                le_label = 'le="' + _fmt(le) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {_fmt(cumulative)}")
+            inf_label = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf_label)} {_fmt(h[-2])}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(h[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_fmt(h[-2])}")
+        return lines
+
+
+Collector = Callable[[], Iterable[Sample]]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Collector] = {}
+
+    def _get_or_add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+            raise ValueError(f"Metric '{metric.name}' already registered with another type/labels")
+        return existing
+
+    def register_collector(self, key: str, fn: Collector) -> None:
+        with self._lock:
+            self._collectors[key] = fn
+
+    def unregister_collector(self, key: str) -> None:
+        with self._lock:
+            self._collectors.pop(key, None)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            collectors = list(self._collectors.items())
+        lines: List[str] = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+
+        grouped: Dict[str, List[Sample]] = {}
+        for key, fn in collectors:
+            try:
+                for s in fn():
+                    grouped.setdefault(s.name, []).append(s)
+            except Exception as e:
+                logger.warning("Metrics collector '%s' failed (%s)", key, type(e).__name__)
+        for name in sorted(grouped):
+            samples = grouped[name]
+            lines.append(f"# HELP {name} {samples[0].help}")
+            lines.append(f"# TYPE {name} {samples[0].kind}")
+            for s in samples:
+                keys = sorted(s.labels)
+                lines.append(f"{name}{_labels(keys, [s.labels[k] for k in keys])} {_fmt(s.value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY) -> Counter:
+    """Module-level counter; the same name returns the already registered one."""
+    return registry._get_or_add(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS,
+    registry: Registry = REGISTRY,
+) -> Histogram:
+    return registry._get_or_add(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+
+def register_collector(key: str, fn: Collector, registry: Registry = REGISTRY) -> None:
+    registry.register_collector(key, fn)
+
+
+def render(registry: Registry = REGISTRY) -> str:
+    return registry.render()
+
+
+def executor_samples(executor: object, **labels: str) -> List[Sample]:
+    """Queue depth / worker threads of a concurrent.futures.ThreadPoolExecutor (0 if not exposed)."""
+    queue = getattr(executor, "_work_queue", None)
+    threads = getattr(executor, "_threads", ()) or ()
+    return [
+        Sample("nanobanano_executor_queue_depth", "gauge", "Tasks waiting for a worker thread.", labels,
+               queue.qsize() if queue is not None else 0),
+        Sample("nanobanano_executor_threads", "gauge", "Started worker threads.", labels, len(threads)),
+    ]
+
+
+def usage_recorder_samples(recorder: object) -> List[Sample]:
+    """Queue depth and delivered/dropped/failed events of a future_saas BufferedUsageRecorder ([] for no-op)."""
+    stats = getattr(recorder, "stats", None)
+    if stats is None:
+        return []
+    s = stats()
+    out = [Sample("nanobanano_usage_queue_depth", "gauge", "Usage events waiting for the flusher.", {},
+                  s.get("queued", 0))]
+    for state in ("sent", "dropped", "failed"):
+        out.append(Sample("nanobanano_usage_events_total", "counter", "Usage events by delivery outcome.",
+                          {"state": state}, s.get(state, 0)))
+    out.append(Sample("nanobanano_usage_batches_total", "counter", "Usage batches delivered to the sink.", {},
+                      s.get("batches", 0)))
+    return out
+
+
+def usage_limiter_samples(limiter: object) -> List[Sample]:
+    """Decisions, live buckets and backend errors of a future_saas UsageLimiter."""
+    s = limiter.stats()  # type: ignore[attr-defined]
+    out = [
+        Sample("nanobanano_rate_limit_decisions_total", "counter", "enforce_usage_limits decisions by result.",
+               {"result": result}, s.get(result, 0))
+        for result in ("allowed", "denied")
+    ]
+    out.append(Sample("nanobanano_rate_limit_buckets", "gauge", "In-process rate-limit buckets.", {},
+                      s.get("buckets", 0)))
+    out.append(Sample("nanobanano_rate_limit_evictions_total", "counter", "Buckets evicted by the LRU cap.", {},
+                      s.get("evicted", 0)))
+    if "backend_errors" in s:
+        out.append(Sample("nanobanano_rate_limit_backend_errors_total", "counter",
+                          "Shared rate-limit backend failures (fell back to per-process limits).", {},
+                          s["backend_errors"]))
+    return out
+
+
+# ---- exporters ----
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:  # noqa: N802 (http.server API)
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        return None  # scrapes every few seconds would flood the app log
+
+
+def start_http_exporter(host: str, port: int, registry: Registry = REGISTRY) -> Optional[ThreadingHTTPServer]:
+    """Serves GET /metrics from a daemon thread. Port busy (another worker) → logged, None."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    try:
+        srv = ThreadingHTTPServer((host, int(port)), handler)
+    except OSError as e:
+        logger.warning("Metrics endpoint %s:%s not started (%s)", host, port, e)
+        return None
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Metrics endpoint on http://%s:%s/metrics", host, srv.server_address[1])
+    return srv
+
+
+def write_textfile(path: str, registry: Registry = REGISTRY) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+def start_textfile_exporter(path: str, interval: float, registry: Registry = REGISTRY) -> threading.Thread:
+    """Rewrites `path` every `interval` seconds from a daemon thread."""
+    path = path.replace("{pid}", str(os.getpid()))
+
+    def _loop() -> None:
+        while True:
+            try:
+                write_textfile(path, registry)
+            except OSError as e:
+                logger.warning("Metrics textfile '%s' not written (%s)", path, type(e).__name__)
+            time.sleep(max(1.0, float(interval)))
+
+    t = threading.Thread(target=_loop, name="metrics-textfile", daemon=True)
+    t.start()
+    return t
+
+
+_started_lock = threading.Lock()
+_started = False
+
+
+def start_exporters_from_env() -> bool:
+    """Starts the exporters configured by NANOBANANO_METRICS_* once per process. True if any runs."""
+    global _started
+    with _started_lock:
+        if _started:
+            return True
+        port = _env_int("NANOBANANO_METRICS_PORT", 0)
+        textfile = (os.getenv("NANOBANANO_METRICS_TEXTFILE") or "").strip()
+        running = False
+        if port > 0:
+            host = (os.getenv("NANOBANANO_METRICS_HOST") or "127.0.0.1").strip()
+            running = start_http_exporter(host, port) is not None
+        if textfile:
+            start_textfile_exporter(textfile, _env_float("NANOBANANO_METRICS_INTERVAL_SEC", 15.0))
+            running = True
+        _started = running
+        return running
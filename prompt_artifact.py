@@ -0,0 +1,113 @@
+"""Precompiled catalog artifact: prompts.json + UI tables → one pickle.
+
+`scripts/build_catalog_artifact.py` сохраняет рядом с prompts.json файл
+`prompts.compiled.pickle`: провалидированные промпты, CompiledTemplate,
+схемы форм (form_schema) и поисковый индекс (search_index). PromptManager
+берёт его вместо разбора JSON, если артефакт собран из того же содержимого
+(sha256 + размер) и тем же кодом (хеш модулей из FINGERPRINT_MODULES).
+Иначе — молча обычная загрузка JSON.
+
+Pickle исполняет код при загрузке: артефакт — часть сборки (образ/деплой),
+доверие к нему такое же, как к *.py рядом. Не кладите в это место файлы
+из непроверенных источников. Отключить: NANOBANANO_PROMPTS_ARTIFACT=off.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+ARTIFACT_SUFFIX = ".compiled.pickle"
+# Modules whose code shapes the pickled objects; any edit invalidates the artifact.
+FINGERPRINT_MODULES = ("prompt_manager.py", "prompt_store.py", "form_schema.py", "search_index.py", "ui_tables.py")
+_BASE_DIR = Path(__file__).resolve().parent
+_DISABLED = {"0", "off", "false", "no", "none"}
+
+
+def default_artifact_path(catalog_path: str) -> Optional[Path]:
+    """NANOBANANO_PROMPTS_ARTIFACT, else `<catalog>.compiled.pickle` next to the JSON (None = disabled)."""
+    raw = (os.getenv("NANOBANANO_PROMPTS_ARTIFACT") or "").strip()
+    if raw.lower() in _DISABLED and raw:
+        return None
+    if raw:
+        return Path(raw)
+    p = Path(catalog_path)
+    return p.with_name(p.stem + ARTIFACT_SUFFIX)
+
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def code_fingerprint() -> str:
+    h = hashlib.sha256(f"{ARTIFACT_FORMAT}:{sys.version_info[0]}.{sys.version_info[1]}".encode())
+    for name in FINGERPRINT_MODULES:
+        try:
+            h.update((_BASE_DIR / name).read_bytes())
+        except OSError:
+            h.update(b"-")
+    return h.hexdigest()
+
+
+def build_artifact(catalog_path: str) -> Dict[str, Any]:
+    """Compile everything a worker derives from prompts.json at startup."""
+    # Imported here: prompt_manager imports this module for `load_artifact`.
+    from form_schema import compile_form_schemas
+    from prompt_manager import PromptManager
+    from search_index import SearchIndex
+
+    manager = PromptManager(catalog_path, use_artifact=False)
+    if manager.store.lazy:
+        raise ValueError("Артефакт собирается только из prompts.json (шарды/SQLite и так грузятся лениво).")
+    source = Path(catalog_path)
+    return {
+        "format": ARTIFACT_FORMAT,
+        "fingerprint": code_fingerprint(),
+        "source_size": source.stat().st_size,
+        "source_sha256": _file_digest(source),
+        "prompts": dict(manager.prompts),
+        "templates": dict(manager.templates),
+        "form_schemas": dict(compile_form_schemas(manager)),
+        "search_index": SearchIndex(manager.index),
+    }
+
+
+def write_artifact(payload: Dict[str, Any], path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_artifact(catalog_path: str, artifact_path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """The artifact for `catalog_path` if it is present and current, else None (never raises)."""
+    path = artifact_path if artifact_path is not None else default_artifact_path(catalog_path)
+    if path is None or not path.exists():
+        return None
+    try:
+        source = Path(catalog_path)
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if not isinstance(payload, dict) or payload.get("format") != ARTIFACT_FORMAT:
+            reason = "format"
+        elif payload.get("fingerprint") != code_fingerprint():
+            reason = "code changed"
+        elif payload.get("source_size") != source.stat().st_size or payload.get("source_sha256") != _file_digest(source):
+            reason = f"{source.name} changed"
+        else:
+            return payload
+        logger.info("Ignoring stale catalog artifact %s (%s); rebuild: scripts/build_catalog_artifact.py", path, reason)
+    except Exception as e:
+        logger.warning("Catalog artifact %s unreadable, loading JSON: %s", path, e)
+    return None
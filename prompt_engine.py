@@ -0,0 +1,369 @@
+"""Prompt pipeline helpers shared by the Streamlit UI and headless entry points.
+
+Streamlit-free: нормализация спец-полей, чистка опциональных фрагментов,
+таблицы негативов и их выбор, и build_prompt() — весь путь кнопки 🍌.
+app.py и scripts/batch_generate.py вызывают одно и то же, поэтому результат
+кнопки и CLI совпадает.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from timing import (
+    NULL_TRACE, STAGE_CLEANUP, STAGE_GENERATE, STAGE_NEGATIVE, STAGE_NORMALIZE, STAGE_TRANSLATE, Trace,
+)
+from translation import has_cyrillic
+
+if TYPE_CHECKING:  # pragma: no cover
+    from prompt_manager import PromptManager
+
+
+# --- NEGATIVE PROMPTS ---
+NEG_GROUPS = {
+    1: {  # Photorealism & People
+        "Mini": {"en": "waxy/plastic skin, beauty retouch, identity drift, extra fingers, watermark, text", "ru": "восковая кожа, бьюти-ретушь, потеря сходства, водяной знак, текст"},
+        "Plus": {"en": "waxy/plastic skin, over-smoothing, beauty retouch, face reshaping, identity drift, extra teeth, deformed hands, extra fingers, watermark, text", "ru": "восковая кожа, пересглаживание, бьюти-ретушь, изменение лица, лишние зубы, деформированные руки, водяной знак, текст"},
+        "Full": {"en": "waxy/plastic skin, over-smoothing, beauty retouch, face reshaping, identity drift, uncanny face, extra teeth, deformed hands, extra limbs/fingers, AI glow, oversharpen halos, banding, watermark, logo, text", "ru": "восковая кожа, пересглаживание, бьюти-ретушь, жуткое лицо, лишние зубы, деформированные руки, лишние конечности, AI-свечение, перешарп, водяной знак, текст"},
+    },
+    2: {  # Scene Editing
+        "Mini": {"en": "seams, halos, ghosting, wrong shadow, wrong scale, watermark, text", "ru": "швы, ореолы, двоение, неверные тени, неверный масштаб, водяной знак, текст"},
+        "Plus": {"en": "seams, halos, cutout edges, ghosting, smear, warped lines, floating object, wrong shadow, wrong scale, mismatch grain, watermark, text", "ru": "швы, ореолы, обрезанные края, двоение, размазывание, кривые линии, левитация, неверные тени, неверный масштаб, водяной знак, текст"},
+        "Full": {"en": "seams, halos, cutout edges, ghosting, smearing, warped perspective/lines, floating objects, wrong scale, wrong shadows, inconsistent lighting, mismatch grain/noise, color mismatch, missing reflections, watermark, logo, text", "ru": "швы, ореолы, обрезанные края, двоение, размазывание, искаженная перспектива, левитация, неверный масштаб, неверные тени, несогласованный свет, ошибки отражений, водяной знак, логотип"},
+    },
+    3: {  # Commercial Design
+        "Mini": {"en": "misspelling, broken glyphs, lorem ipsum, tiny text, random logo, watermark", "ru": "опечатки, битые символы, lorem ipsum, мелкий текст, случайный логотип, водяной знак"},
+        "Plus": {"en": "misspelling, broken glyphs, lorem ipsum, tiny unreadable text, clutter, misaligned layout, low-contrast text, pixelation, random logo, watermark", "ru": "опечатки, битые символы, lorem ipsum, нечитаемый текст, мусор, кривая верстка, пикселизация, случайный логотип, водяной знак"},
+        "Full": {"en": "misspelling, broken glyphs, lorem ipsum, tiny unreadable text, clutter, misaligned layout, low contrast, pixelation, jagged edges, wrong aspect ratio, random brand/logo, extra QR codes, illegible icons, watermark", "ru": "опечатки, битые символы, lorem ipsum, мелкий текст, мусор, кривая верстка, пикселизация, рваные края, неверные пропорции, случайный бренд, лишние QR-коды, водяной знак"},
+    },
+    4: {  # Art & Illustration
+        "Mini": {"en": "extra objects, anatomy warp, style drift, seams, vignette, watermark, text", "ru": "лишние объекты, искажение анатомии, плавающий стиль, швы, виньетка, водяной знак, текст"},
+        "Plus": {"en": "extra objects, anatomy warp, proportion change, perspective distortion, messy linework, style drift, pattern seams, vignette, unreadable text, watermark", "ru": "лишние объекты, искажение анатомии, нарушение пропорций, кривые линии, плавающий стиль, швы, виньетка, нечитаемый текст, водяной знак"},
+        "Full": {"en": "extra objects, anatomy warp, proportion changes, perspective distortion, messy linework, inconsistent style, seams in pattern, vignette, unwanted shading, unreadable text/gibberish, watermark, logo", "ru": "лишние объекты, искажение анатомии, нарушение пропорций, искажение перспективы, неряшливые линии, непоследовательный стиль, швы, виньетка, лишние тени, нечитаемый текст, водяной знак, логотип"},
+    },
+    5: {  # Architecture
+        "Mini": {"en": "keystone distortion, warped verticals, messy geometry, unrealistic scale, watermark, text", "ru": "трапеция, кривые вертикали, грязная геометрия, нереальный масштаб, водяной знак, текст"},
+        "Plus": {"en": "keystone distortion, warped verticals, bent walls, unrealistic scale, messy geometry, low-res textures, blown highlights, muddy shadows, clutter, watermark", "ru": "трапеция, кривые стены, нереальный масштаб, грязная геометрия, низкое разрешение текстур, пересветы, грязные тени, мусор, водяной знак"},
+        "Full": {"en": "keystone distortion, bent walls, warped verticals, unrealistic scale, messy geometry, low-res textures, oversharpen halos, blown highlights, muddy shadows, clutter, people (if not requested), watermark, logo, text", "ru": "трапеция, кривые стены, нереальный масштаб, грязная геометрия, низкое разрешение, ореолы, пересветы, грязные тени, мусор, лишние люди, водяной знак, текст"},
+    },
+    6: {  # VFX / Cinema
+        "Mini": {"en": "overdone flares, heavy aberration, excessive bloom, noisy artifacts, watermark, text", "ru": "перебор бликов, аберрация, bloom, шум, водяной знак, текст"},
+        "Plus": {"en": "excessive bloom, heavy chromatic aberration, overdone flares, crushed blacks, blown highlights, noisy artifacts, oversharpen halos, watermark, text", "ru": "избыточный bloom, аберрация, блики, проваленные черные, пересветы, шум, ореолы, водяной знак, текст"},
+        "Full": {"en": "overdone bloom, heavy aberration, excessive flares, crushed blacks, blown highlights, noisy artifacts, oversharpen halos, unreadable text, tiny clutter text, watermark, logo", "ru": "перебор bloom, аберрация, блики, проваленные черные, пересветы, шум, ореолы, нечитаемый текст, мусор, водяной знак, логотип"},
+    },
+}
+
+NEG_ADDONS = {
+    "logo_creative": {"en": "photorealistic, 3d render, mockup, gradients, textures, shadows, realistic lighting", "ru": "фотореализм, 3d-рендер, мокап, градиенты, текстуры, тени, реалистичный свет"},
+    "technical_blueprint": {"en": "shading, gradients, perspective view, sketchy lines, hand-drawn look", "ru": "шейдинг, градиенты, перспектива, скетчевые линии, рисунок от руки"},
+    "macro_extreme": {"en": "cartoon, illustration, painterly style, fake CG look", "ru": "мультяшность, иллюстрация, живописная стилизация, фейковый CG-вид"},
+}
+
+ID_TO_GROUP = {
+    "upscale_restore": 1, "old_photo_restore": 1, "studio_portrait": 1, "background_change": 1, "face_swap": 1, "expression_change": 1, "pose_change": 1, "camera_angle_change": 1, "cloth_swap": 1, "team_composite": 1, "macro_extreme": 1,
+    "object_removal": 2, "object_addition": 2, "semantic_replacement": 2, "scene_relighting": 2, "scene_composite": 2, "total_look_builder": 2,
+    "product_card": 3, "mockup_generation": 3, "environmental_text": 3, "knolling_photography": 3, "logo_creative": 3, "logo_stylization": 3, "ui_design": 3, "text_design": 3,
+    "image_restyling": 4, "sketch_to_photo": 4, "character_sheet": 4, "sticker_pack": 4, "comic_page": 4, "storyboard_sequence": 4, "seamless_pattern": 4, "anatomical_infographic": 4,
+    "interior_design": 5, "architecture_exterior": 5, "isometric_room": 5,
+    "youtube_thumbnail": 6, "cinematic_atmosphere": 6, "technical_blueprint": 6, "exploded_view": 6
+}
+
+NEG_CATEGORY_LABELS = ["Авто (по задаче)", "Люди / портрет / лицо", "Редактирование / коллаж", "Дизайн / логотип", "Иллюстрация / арт", "Интерьер / архитектура", "Кино / VFX"]
+NEG_CATEGORY_PRESETS = {"Авто (по задаче)": None, "Люди / портрет / лицо": 1, "Редактирование / коллаж": 2, "Дизайн / логотип": 3, "Иллюстрация / арт": 4, "Интерьер / архитектура": 5, "Кино / VFX": 6}
+
+# UI labels of the "Режим негатива" selectbox.
+NEG_MODE_OPTIONS = ["light (Mini)", "medium (Default)", "hard (Aggressive)"]
+
+
+def neg_mode_key(neg_mode: str) -> str:
+    """'light (Mini)' / 'light' / 'Mini' → 'Mini'; hard → 'Full'; иначе 'Plus'."""
+    m = (neg_mode or "").strip().lower()
+    if "light" in m or m == "mini":
+        return "Mini"
+    if "hard" in m or m == "full":
+        return "Full"
+    return "Plus"
+
+
+def select_negative(prompt_id: str, neg_mode: str, group_id: Optional[int] = None) -> Tuple[str, str]:
+    """Негатив (en, ru) для задачи: группа из group_id (пресет) или ID_TO_GROUP, плюс NEG_ADDONS."""
+    gid = group_id or ID_TO_GROUP.get(prompt_id, 1)
+    m_key = neg_mode_key(neg_mode)
+    neg_en = NEG_GROUPS[gid][m_key]["en"]
+    neg_ru = NEG_GROUPS[gid][m_key]["ru"]
+
+    if prompt_id in NEG_ADDONS:
+        neg_en += f", {NEG_ADDONS[prompt_id]['en']}"
+        neg_ru += f", {NEG_ADDONS[prompt_id]['ru']}"
+    return neg_en, neg_ru
+
+
+# --- SPECIAL VARS / CLEANUP ---
+def normalize_special_vars(d: dict, lang="en") -> dict:
+    """Нормализует спец-поля так, чтобы они читались человеком.
+
+    Важно: значения зависят от lang, чтобы в EN промпт не попадали русские подписи.
+    """
+    out = dict(d)
+    is_ru = str(lang).lower().startswith("ru")
+
+    # lens_match_mode
+    if "lens_match_mode" in out:
+        mode = str(out.get("lens_match_mode", "")).lower()
+        feel = ("feel" in mode) or ("визуально" in mode) or ("ощущ" in mode)
+        if is_ru:
+            out["lens_match_mode"] = "совпади по ощущению" if feel else "строго по фокусному"
+        else:
+            out["lens_match_mode"] = "match lens look (focal-length feel)" if feel else "match focal length strictly"
+
+    # show_preview
+    if "show_preview" in out:
+        val = str(out.get("show_preview", "")).lower()
+        yes = ("да" in val) or ("yes" in val) or ("on" in val) or ("true" in val)
+        if is_ru:
+            out["show_preview"] = "превью 2×2" if yes else "один кадр"
+        else:
+            out["show_preview"] = "2x2 preview grid" if yes else "single frame"
+
+    # labels_visibility
+    if "labels_visibility" in out:
+        val = str(out.get("labels_visibility", "")).lower()
+        on = ("вкл" in val) or ("on" in val) or ("yes" in val) or ("да" in val) or ("true" in val)
+        if is_ru:
+            out["labels_visibility"] = "подписи включены" if on else "без подписей"
+        else:
+            out["labels_visibility"] = "labels on" if on else "no labels"
+
+    # focus_stacking
+    if "focus_stacking" in out:
+        val = str(out.get("focus_stacking", "")).lower()
+        on = ("включ" in val) or ("on" in val) or ("yes" in val) or ("да" in val) or ("true" in val)
+        if is_ru:
+            out["focus_stacking"] = "включено (всё в резкости)" if on else "выключено (боке)"
+        else:
+            out["focus_stacking"] = "on (everything in focus)" if on else "off (bokeh)"
+
+    return out
+
+def should_add_cyrillic_lock(inputs: dict) -> bool:
+    for k in ["text", "text_content"]:
+        if k in inputs and has_cyrillic(str(inputs.get(k, ""))):
+            return True
+    if str(inputs.get("language", "")).strip().lower() == "ru":
+        return True
+    if "Русский" in str(inputs.get("language", "")):
+        return True
+    return False
+
+def cleanup_optional_prompt(text, prompt_id, disabled_vars, lang):
+    if not text or not disabled_vars:
+        return (text or "").strip()
+
+    t = text
+
+    if prompt_id == "total_look_builder":
+        if "accessory_image" in disabled_vars:
+            t = re.sub(r"\s*(Accessory|Аксессуар):\s*\.(\s*)", " ", t, flags=re.IGNORECASE)
+        if "footwear_image" in disabled_vars:
+            t = re.sub(r"\s*(Footwear|Обувь):\s*\.(\s*)", " ", t, flags=re.IGNORECASE)
+
+    if prompt_id == "logo_creative" and "imagery" in disabled_vars:
+        term = "imagery" if lang.startswith("en") else "образ"
+        t = re.sub(rf"\b{term}\b\s*,\s*", "", t, flags=re.IGNORECASE)
+
+    if prompt_id == "macro_extreme" and "additional_details" in disabled_vars:
+        if lang.startswith("ru"):
+            t = re.sub(r"\s*Дополнительные детали:\s*[^;]*;\s*", " ", t, flags=re.IGNORECASE)
+        else:
+            t = re.sub(r"\s*Additional details:\s*[^;]*;\s*", " ", t, flags=re.IGNORECASE)
+
+    t = re.sub(r"\s{2,}", " ", t)
+    return t.replace(" .", ".").replace(" ,", ",").strip()
+
+
+# --- BUILD ---
+# Optional fields that may be left empty although the template references them:
+# the template gets a "." marker and the sentence around it is removed afterwards.
+OPTIONAL_EMPTY_VARS = {
+    ("youtube_thumbnail", "object"): (
+        r"\s*Object reference:\s*\.+\s*",
+        r"\s*Объект/референс:\s*\.+\s*",
+    ),
+}
+
+CYRILLIC_LOCK_LINE = "\nCRITICAL: Render Cyrillic text EXACTLY as provided."
+
+TranslateFn = Callable[[Dict[str, Any]], Tuple[Dict[str, Any], List[str]]]
+
+
+class MissingInputsError(ValueError):
+    """Не заполнены обязательные поля (имена переменных в `missing`)."""
+
+    def __init__(self, missing: List[str]):
+        super().__init__("Missing inputs: " + ", ".join(missing))
+        self.missing = list(missing)
+
+
+@dataclass(frozen=True)
+class PromptResult:
+    prompt_id: str
+    prompt_en: str
+    prompt_ru: str
+    negative_en: str
+    negative_ru: str
+    inputs_en: Dict[str, Any] = field(default_factory=dict)
+    translate_fallback: Tuple[str, ...] = ()
+
+    @property
+    def full_text(self) -> str:
+        return f"{self.prompt_en} --no {self.negative_en}"
+
+    @property
+    def full_text_ru(self) -> str:
+        return f"{self.prompt_ru} | NEG: {self.negative_ru}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "prompt_id": self.prompt_id,
+            "prompt_en": self.prompt_en,
+            "prompt_ru": self.prompt_ru,
+            "negative_en": self.negative_en,
+            "negative_ru": self.negative_ru,
+            "full_text": self.full_text,
+        }
+        if self.translate_fallback:
+            out["translate_fallback"] = list(self.translate_fallback)
+        return out
+
+
+def find_missing_inputs(prompt_id: str, inputs: Mapping[str, Any], disabled: Iterable[str] = ()) -> List[str]:
+    """Пустые поля, кроме выключенных опциональных и OPTIONAL_EMPTY_VARS."""
+    skip = set(disabled)
+    return [
+        k
+        for k, v in inputs.items()
+        if k not in skip and (prompt_id, k) not in OPTIONAL_EMPTY_VARS and not str(v).strip()
+    ]
+
+
+def resolve_neg_group(neg_category: Any) -> Optional[int]:
+    """neg_category: id группы NEG_GROUPS, подпись из NEG_CATEGORY_LABELS или None (авто)."""
+    if neg_category is None or neg_category == "":
+        return None
+    if isinstance(neg_category, str) and neg_category in NEG_CATEGORY_PRESETS:
+        return NEG_CATEGORY_PRESETS[neg_category]
+    try:
+        gid = int(neg_category)
+    except (TypeError, ValueError):
+        return None
+    return gid if gid in NEG_GROUPS else None
+
+
+def build_prompt(
+    prompt_id: str,
+    inputs: Mapping[str, Any],
+    neg_mode: str = "medium",
+    neg_category: Any = None,
+    lang: str = "both",
+    *,
+    manager: "PromptManager",
+    translate: Optional[TranslateFn] = None,
+    disabled: Iterable[str] = (),
+    trace: Trace = NULL_TRACE,
+) -> PromptResult:
+    """Собирает позитив/негатив для задачи — то, что делает кнопка 🍌 в app.py.
+
+    - inputs: значения полей формы (RU/EN); не изменяются
+    - neg_mode: light|medium|hard (или подпись NEG_MODE_OPTIONS)
+    - neg_category: пресет негатива (см. resolve_neg_group), None — по задаче
+    - lang: "both" | "en" | "ru" — какие версии промпта собирать
+    - translate: inputs -> (inputs_en, fallback_fields); None — без перевода
+    - disabled: выключенные опциональные поля (их фрагменты вычищаются)
+    - trace: timing.Trace — время этапов (normalize/translate/generate/cleanup/negative)
+
+    Raises MissingInputsError, если обязательные поля пустые.
+    """
+    disabled = set(disabled)
+    user_inputs = dict(inputs)
+    missing = find_missing_inputs(prompt_id, user_inputs, disabled)
+    if missing:
+        raise MissingInputsError(missing)
+
+    empty_markers = []
+    for (pid, var), patterns in OPTIONAL_EMPTY_VARS.items():
+        if pid == prompt_id and var in user_inputs and not str(user_inputs.get(var, "")).strip():
+            user_inputs[var] = "."  # marker; will be removed from final prompt
+            empty_markers.append(patterns)
+
+    def _strip_markers(text: str, ru: bool) -> str:
+        for patterns in empty_markers:
+            text = re.sub(patterns[1 if ru else 0], " ", text)
+            text = re.sub(r"\s{2,}", " ", text).strip()
+        return text
+
+    want_en = lang in ("both", "en")
+    want_ru = lang in ("both", "ru")
+
+    res_ru = ""
+    if want_ru:
+        with trace.span(STAGE_NORMALIZE):
+            i_ru = normalize_special_vars(user_inputs, "ru")
+        with trace.span(STAGE_GENERATE):
+            res_ru = manager.generate(prompt_id, "ru", **i_ru).strip()
+        with trace.span(STAGE_CLEANUP):
+            res_ru = _strip_markers(cleanup_optional_prompt(res_ru, prompt_id, disabled, "ru"), ru=True)
+
+    res_en = ""
+    i_en: Dict[str, Any] = {}
+    fallback: List[str] = []
+    if want_en:
+        # Translate only where it makes sense; never hang; record any fallbacks.
+        if translate is not None:
+            with trace.span(STAGE_TRANSLATE):
+                i_en, fallback = translate(user_inputs)
+        else:
+            i_en = dict(user_inputs)
+        with trace.span(STAGE_NORMALIZE):
+            i_en = normalize_special_vars(i_en, "en")
+        with trace.span(STAGE_GENERATE):
+            res_en = manager.generate(prompt_id, "en", **i_en).strip()
+        with trace.span(STAGE_CLEANUP):
+            res_en = _strip_markers(cleanup_optional_prompt(res_en, prompt_id, disabled, "en"), ru=False)
+            if should_add_cyrillic_lock(user_inputs):
+                res_en += CYRILLIC_LOCK_LINE
+
+    with trace.span(STAGE_NEGATIVE):
+        neg_en, neg_ru = select_negative(prompt_id, neg_mode, resolve_neg_group(neg_category))
+    return PromptResult(
+        prompt_id=prompt_id,
+        prompt_en=res_en,
+        prompt_ru=res_ru,
+        negative_en=neg_en,
+        negative_ru=neg_ru,
+        inputs_en=i_en,
+        translate_fallback=tuple(sorted(set(fallback))),
+    )
+
+
+def prepare_inputs(
+    manager: "PromptManager", prompt_id: str, inputs: Mapping[str, Any], disabled: Iterable[str] = ()
+) -> Tuple[Dict[str, Any], set]:
+    """Входы для build_prompt вне формы (CLI, HTTP): только переменные шаблонов задачи.
+
+    Незаполненные опциональные поля (OPTIONAL_FIELD_TOGGLES) считаются выключенными,
+    как снятый чекбокс в UI. Returns (user_inputs, disabled).
+    """
+    from ui_tables import OPTIONAL_FIELD_TOGGLES
+
+    disabled = {str(v).strip() for v in disabled if str(v).strip()}
+    for (pid, var) in OPTIONAL_FIELD_TOGGLES:
+        if pid == prompt_id and not str(inputs.get(var, "") or "").strip():
+            disabled.add(var)
+
+    # From the catalog index when it has them: no template body load (server.py calls this on the event loop).
+    user_inputs = {}
+    for var in sorted(manager.variables(prompt_id)):
+        v = inputs.get(var, "")
+        user_inputs[var] = "" if v is None or var in disabled else v
+    return user_inputs, disabled
@@ -1,72 +1,345 @@
-import json
-import os
 import re
 import logging
-from typing import Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, FrozenSet, Iterable, Iterator, Mapping, Optional, Set, Tuple
+
+from metrics import Sample, counter
+from prompt_artifact import load_artifact
+from prompt_store import PROMPT_CACHE_SIZE, PromptStore, catalog_mtime_ns, open_prompt_store
 
 
 logger = logging.getLogger(__name__)
 
+CATALOG_RELOADS = counter("nanobanano_catalog_reloads_total", "Prompt catalog hot reloads by result.", ("result",))
+
+
+class CompiledTemplate:
+    """Шаблон, заранее разбитый на литералы и слоты переменных.
+
+    `parts` — результат `VAR_PATTERN.split`: чётные индексы — литералы,
+    нечётные — имена переменных. Рендер — одна подстановка по индексам и join,
+    без regex на каждый вызов.
+    """
+
+    __slots__ = ("source", "parts", "slots", "variables", "required")
+
+    def __init__(self, source: str, pattern: "re.Pattern[str]"):
+        self.source = source
+        self.parts: Tuple[str, ...] = tuple(pattern.split(source))
+        # (index in parts, var name) for every variable occurrence.
+        self.slots: Tuple[Tuple[int, str], ...] = tuple(
+            (i, self.parts[i]) for i in range(1, len(self.parts), 2)
+        )
+        self.variables = frozenset(var for _, var in self.slots)
+        self.required: Tuple[str, ...] = tuple(sorted(self.variables))
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        out = list(self.parts)
+        for i, var in self.slots:
+            # Missing vars are substituted with empty strings.
+            val = values.get(var)
+            out[i] = "" if val is None else str(val)
+        return "".join(out)
+
+
+class _LazyPrompts(Mapping):
+    """{prompt_id: prompt} view over a lazy catalog: keys from the index, bodies via the LRU."""
+
+    def __init__(self, manager: "PromptManager"):
+        self._manager = manager
+
+    def __getitem__(self, prompt_id: str) -> Dict[str, Any]:
+        if prompt_id not in self._manager.index:
+            raise KeyError(prompt_id)
+        return self._manager._entry(prompt_id)[0]
+
+    def __contains__(self, prompt_id: object) -> bool:
+        return prompt_id in self._manager.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._manager.index)
+
+    def __len__(self) -> int:
+        return len(self._manager.index)
+
+
+class _CatalogSnapshot:
+    """One catalog version; PromptManager swaps the whole object on reload."""
+
+    __slots__ = ("version", "stamp", "index", "prompts", "templates", "precompiled")
+
+    def __init__(self, version, stamp, index, prompts, templates, precompiled=None):
+        self.version: int = version
+        self.stamp: int = stamp
+        self.index: Mapping[str, Dict[str, Any]] = index
+        self.prompts: Mapping[str, Dict[str, Any]] = prompts
+        self.templates: Dict[Tuple[str, str], CompiledTemplate] = templates
+        # Objects from the build artifact (form_schemas, search_index); only for the version they were built from.
+        self.precompiled: Mapping[str, Any] = precompiled or {}
+
 
 class PromptManager:
+    """Каталог промптов + скомпилированные шаблоны.
+
+    `filepath` — prompts.json, каталог шардов или SQLite-файл (см. prompt_store).
+    `index` — лёгкие метаданные всех промптов (title/description/...), для
+    сайдбара, поиска и списков. `prompts` — полный {id: prompt}: для
+    prompts.json это обычный dict, для ленивых каталогов — Mapping, который
+    подгружает тела по запросу (LRU на `cache_size` промптов).
+
+    Горячая перезагрузка: `reload_if_changed()` опрашивает mtime каталога и при
+    изменении перекомпилирует только изменённые шаблоны; новая версия
+    подменяется одним присваиванием (`version` растёт), старая освобождается.
+    """
+
     VAR_PATTERN = re.compile(r"\[([a-zA-Z0-9_]+)\]")
 
-    def __init__(self, filepath: str = "prompts.json"):
+    def __init__(
+        self,
+        filepath: str = "prompts.json",
+        cache_size: Optional[int] = None,
+        use_artifact: bool = True,
+    ):
         self.filepath = filepath
-        self.prompts = self._load_prompts()
+        self.store: PromptStore = open_prompt_store(filepath)
+        self.cache_size = max(1, int(PROMPT_CACHE_SIZE if cache_size is None else cache_size))
+        self._lru: "OrderedDict[str, Tuple[Dict[str, Any], Dict[str, CompiledTemplate]]]" = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._lazy_prompts = _LazyPrompts(self)
+        # Names changed by the last reload (added / edited / removed prompt ids).
+        self.last_changed: FrozenSet[str] = frozenset()
+
+        stamp = catalog_mtime_ns(Path(filepath))
+        if self.store.lazy:
+            self._snapshot = _CatalogSnapshot(0, stamp, self.store.load_index(), self._lazy_prompts, {})
+        else:
+            # Precompiled artifact (scripts/build_catalog_artifact.py): no JSON parse/validation/compile.
+            artifact = load_artifact(filepath) if use_artifact else None
+            if artifact is not None:
+                prompts = artifact["prompts"]
+                precompiled = {k: artifact[k] for k in ("form_schemas", "search_index") if k in artifact}
+                self._snapshot = _CatalogSnapshot(0, stamp, prompts, prompts, artifact["templates"], precompiled)
+            else:
+                prompts = self._load_prompts()
+                self._snapshot = _CatalogSnapshot(0, stamp, prompts, prompts, self._compile_templates(prompts))
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def index(self) -> Mapping[str, Dict[str, Any]]:
+        return self._snapshot.index
+
+    @property
+    def prompts(self) -> Mapping[str, Dict[str, Any]]:
+        return self._snapshot.prompts
+
+    @property
+    def precompiled(self) -> Mapping[str, Any]:
+        return self._snapshot.precompiled
+
+    @property
+    def templates(self) -> Dict[Tuple[str, str], CompiledTemplate]:
+        return self._snapshot.templates
 
     def _load_prompts(self) -> Dict[str, Dict[str, Any]]:
-        if not os.path.exists(self.filepath):
-            raise FileNotFoundError(f"Файл базы данных '{self.filepath}' не найден!")
+        return self.store.load_index()
 
-        with open(self.filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def _compile_item(self, item: Mapping[str, Any]) -> Dict[str, CompiledTemplate]:
+        return {
+            key: CompiledTemplate(value, self.VAR_PATTERN)
+            for key, value in item.items()
+            if key.startswith("prompt_") and isinstance(value, str)
+        }
 
-        if not isinstance(data, dict):
-            raise ValueError("prompts.json должен быть словарём вида {id: {title, description, prompt_ru, prompt_en}}")
+    def _compile_templates(
+        self,
+        prompts: Mapping[str, Dict[str, Any]],
+        previous: Optional[Mapping[Tuple[str, str], CompiledTemplate]] = None,
+    ) -> Dict[Tuple[str, str], CompiledTemplate]:
+        # Компилируем один раз при загрузке: {(prompt_id, "prompt_en"): CompiledTemplate}.
+        # При перезагрузке шаблоны с тем же текстом берутся из `previous` без перекомпиляции.
+        compiled: Dict[Tuple[str, str], CompiledTemplate] = {}
+        previous = previous or {}
+        for pid, item in prompts.items():
+            for key, value in item.items():
+                if key.startswith("prompt_") and isinstance(value, str):
+                    old = previous.get((pid, key))
+                    compiled[(pid, key)] = old if old is not None and old.source == value else (
+                        CompiledTemplate(value, self.VAR_PATTERN)
+                    )
+        return compiled
 
-        for pid, item in data.items():
-            if not isinstance(item, dict):
-                raise ValueError(f"Промпт '{pid}' должен быть объектом.")
-            for k in ("title", "description", "prompt_ru", "prompt_en"):
-                if k not in item:
-                    raise ValueError(f"Промпт '{pid}' не содержит ключ '{k}'.")
+    def reload_if_changed(self, min_interval: float = 0.0) -> bool:
+        """Stat-polls the catalog; on change loads the new version and swaps it in.
 
-        return data
+        At most one check per `min_interval` seconds; concurrent callers never wait
+        (the one holding the lock reloads, others keep the current version).
+        A broken file (bad JSON, missing keys) is logged and the current version
+        stays live until the next change. Returns True if a new version was swapped in.
+        """
+        now = time.monotonic()
+        if now < self._next_check or not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = now + max(0.0, float(min_interval))
+            old = self._snapshot
+            stamp = catalog_mtime_ns(Path(self.filepath))
+            if stamp == old.stamp:
+                return False
+            try:
+                index = self.store.load_index()
+                if self.store.lazy:
+                    snapshot = _CatalogSnapshot(old.version + 1, stamp, index, self._lazy_prompts, {})
+                else:
+                    templates = self._compile_templates(index, old.templates)
+                    snapshot = _CatalogSnapshot(old.version + 1, stamp, index, index, templates)
+            except Exception as e:
+                logger.warning("Prompt catalog reload failed, keeping version %s: %s", old.version, e)
+                CATALOG_RELOADS.inc(result="failed")
+                old.stamp = stamp  # retry only after the next edit
+                return False
 
-    def generate(self, prompt_id: str, template_lang: str = "en", **user_inputs: Any) -> str:
-        if prompt_id not in self.prompts:
+            changed = set(old.index.keys() ^ index.keys())
+            changed.update(pid for pid in index.keys() & old.index.keys() if index[pid] != old.index[pid])
+            with self._lru_lock:
+                # Lazy bodies may have changed even where the index did not: drop them all.
+                self._lru.clear()
+                self._snapshot = snapshot
+            self.last_changed = frozenset(changed)
+            CATALOG_RELOADS.inc(result="ok")
+            logger.info(
+                "Prompt catalog reloaded: version %s, %d prompt(s) changed", snapshot.version, len(changed)
+            )
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def metric_samples(self) -> Iterable[Sample]:
+        """Collector for metrics.register_collector: catalog version, size and LRU fill."""
+        snap = self._snapshot
+        yield Sample("nanobanano_catalog_version", "gauge", "Prompt catalog version (+1 per hot reload).", {}, snap.version)
+        yield Sample("nanobanano_catalog_prompts", "gauge", "Prompts in the catalog index.", {}, len(snap.index))
+        if self.store.lazy:
+            yield Sample("nanobanano_catalog_cached_prompts", "gauge", "Lazy catalog prompt bodies in the LRU.", {}, len(self._lru))
+
+    def _entry(self, prompt_id: str) -> Tuple[Dict[str, Any], Dict[str, CompiledTemplate]]:
+        """(prompt, compiled templates) of a lazy catalog, through the LRU."""
+        with self._lru_lock:
+            entry = self._lru.get(prompt_id)
+            if entry is not None:
+                self._lru.move_to_end(prompt_id)
+                return entry
+            version = self._snapshot.version
+        # Load outside the lock: a slow shard/SQLite read must not block cached lookups.
+        item = self.store.load_prompt(prompt_id)
+        entry = (item, self._compile_item(item))
+        with self._lru_lock:
+            if self._snapshot.version != version:
+                return entry  # reloaded meanwhile: serve it, but do not cache a stale body
+            self._lru[prompt_id] = entry
+            self._lru.move_to_end(prompt_id)
+            while len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+        return entry
+
+    def get_template(self, prompt_id: str, template_lang: str = "en") -> CompiledTemplate:
+        snapshot = self._snapshot
+        if prompt_id not in snapshot.index:
             raise ValueError(f"Промпт с ID '{prompt_id}' не найден.")
 
-        prompt_data = self.prompts[prompt_id]
         key = f"prompt_{template_lang}"
-
-        if key not in prompt_data:
+        if self.store.lazy:
+            compiled = self._entry(prompt_id)[1].get(key)
+        else:
+            compiled = snapshot.templates.get((prompt_id, key))
+        if compiled is None:
             raise ValueError(f"Язык '{template_lang}' не поддерживается для '{prompt_id}'.")
+        return compiled
 
-        template = prompt_data[key]
-        required_vars = set(self.VAR_PATTERN.findall(template))
+    def variables(self, prompt_id: str) -> FrozenSet[str]:
+        """Variables of the EN + RU templates (from the index when it has them, no body load)."""
+        meta = self.index.get(prompt_id)
+        if meta is None:
+            raise ValueError(f"Промпт с ID '{prompt_id}' не найден.")
+        indexed = meta.get("variables")
+        if self.store.lazy and isinstance(indexed, list):
+            return frozenset(indexed)
+        out: Set[str] = set()
+        for lang in ("en", "ru"):
+            try:
+                out |= self.get_template(prompt_id, lang).variables
+            except ValueError:
+                pass
+        return frozenset(out)
+
+    def generate(self, prompt_id: str, template_lang: str = "en", **user_inputs: Any) -> str:
+        compiled = self.get_template(prompt_id, template_lang)
 
         # Валидация (мягкая).
         #
         # UI и шаблоны могут эволюционировать независимо. Если шаблон содержит переменные,
         # которые UI по какой-то причине не передал (скрытое поле, разные версии JSON, и т.д.),
         # падать нельзя: лучше безопасно подставить пустую строку и продолжить.
-        missing = [v for v in sorted(required_vars) if v not in user_inputs]
+        missing = [v for v in compiled.required if v not in user_inputs]
         if missing:
             logger.warning("Prompt '%s' missing vars: %s", prompt_id, ", ".join(missing))
-            for v in missing:
-                user_inputs[v] = ""
 
-        def repl(match: re.Match) -> str:
-            var = match.group(1)
-            # Missing vars are substituted with empty strings.
-            val = user_inputs.get(var, "")
-            if val is None:
-                return ""
-            return str(val)
+        return compiled.render(user_inputs)
+
+    def generate_many(
+        self,
+        prompt_id: str,
+        template_lang: str,
+        rows: Iterable[Mapping[str, Any]],
+    ) -> Iterator[str]:
+        """Рендерит поток input-словарей одним шаблоном (ленивый генератор).
+
+        Шаблон ищется и валидируется один раз; строки не копируются.
+        Предупреждение о недостающих переменных пишется один раз на каждый
+        уникальный набор пропусков, а не на каждую строку.
+        """
+        compiled = self.get_template(prompt_id, template_lang)
+        required = compiled.required
+        warned: Set[FrozenSet[str]] = set()
+
+        for row in rows:
+            row = row or {}
+            missing = [v for v in required if v not in row]
+            if missing:
+                sig = frozenset(missing)
+                if sig not in warned:
+                    warned.add(sig)
+                    logger.warning("Prompt '%s' missing vars: %s", prompt_id, ", ".join(missing))
+            yield compiled.render(row)
+
+    def generate_batch(
+        self,
+        items: Iterable[Tuple[str, str, Mapping[str, Any]]],
+    ) -> Iterator[str]:
+        """Кросс-промптовый вариант `generate_many`: элементы — (prompt_id, lang, inputs).
+
+        Ошибки (неизвестный ID/язык) поднимаются как в `generate`, на первом
+        проблемном элементе.
+        """
+        warned: Set[Tuple[str, str, FrozenSet[str]]] = set()
 
-        return self.VAR_PATTERN.sub(repl, template)
+        for prompt_id, template_lang, row in items:
+            compiled = self.get_template(prompt_id, template_lang)
+            row = row or {}
+            missing = [v for v in compiled.required if v not in row]
+            if missing:
+                sig = (prompt_id, template_lang, frozenset(missing))
+                if sig not in warned:
+                    warned.add(sig)
+                    logger.warning("Prompt '%s' missing vars: %s", prompt_id, ", ".join(missing))
+            yield compiled.render(row)
 
     def list_available_prompts(self):
-        return list(self.prompts.keys())
\ No newline at end of file
+        return list(self.index.keys())
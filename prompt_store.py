@@ -0,0 +1,241 @@
+"""Prompt catalog backends for PromptManager.
+
+- `JsonFileStore`   — один prompts.json, читается целиком (как раньше).
+- `ShardedDirStore` — каталог с шардами `*.json` ({id: prompt} в каждом) и
+  необязательным `index.json` ({id: {title, description, category, variables, shard}}).
+- `SqliteStore`     — файл `.sqlite`/`.db` с таблицей `prompts`
+  (id, title, description, category, variables, data).
+
+Ленивые бэкенды (шарды, SQLite) при старте читают только индекс
+(id/title/description/category/variables); полные тексты шаблонов
+подгружаются по запросу и держатся в LRU внутри PromptManager.
+Собрать шарды/SQLite из prompts.json: `scripts/export_catalog.py`.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+INDEX_FILE = "index.json"
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+REQUIRED_KEYS = ("title", "description", "prompt_ru", "prompt_en")
+# Index fields kept in memory for every prompt (everything else loads lazily).
+META_KEYS = ("title", "description", "category")
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    category TEXT,
+    variables TEXT NOT NULL DEFAULT '[]',
+    data TEXT NOT NULL
+)
+"""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return int(raw) if raw else int(default)
+    except Exception:
+        return int(default)
+
+
+# Prompt bodies (with compiled templates) kept in memory for lazy catalogs.
+PROMPT_CACHE_SIZE = _env_int("NANOBANANO_PROMPT_CACHE_SIZE", 256)
+
+
+def validate_prompt(pid: str, item: Any) -> Dict[str, Any]:
+    if not isinstance(item, dict):
+        raise ValueError(f"Промпт '{pid}' должен быть объектом.")
+    for k in REQUIRED_KEYS:
+        if k not in item:
+            raise ValueError(f"Промпт '{pid}' не содержит ключ '{k}'.")
+    return item
+
+
+def prompt_meta(item: Dict[str, Any], variables: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Index entry for a prompt: META_KEYS present in the item (+ sorted variable names)."""
+    meta = {k: item[k] for k in META_KEYS if k in item}
+    if variables is not None:
+        meta["variables"] = sorted(set(variables))
+    return meta
+
+
+class PromptStore:
+    """Base backend. Eager stores return full prompts from `load_index`."""
+
+    lazy = False
+
+    def __init__(self, path: str):
+        self.path = str(path)
+
+    def load_index(self) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def load_prompt(self, prompt_id: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class JsonFileStore(PromptStore):
+    def load_index(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Файл базы данных '{self.path}' не найден!")
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if not isinstance(data, dict):
+            raise ValueError("prompts.json должен быть словарём вида {id: {title, description, prompt_ru, prompt_en}}")
+        for pid, item in data.items():
+            validate_prompt(pid, item)
+        return data
+
+    def load_prompt(self, prompt_id: str) -> Dict[str, Any]:
+        raise KeyError(prompt_id)  # eager: PromptManager already holds every prompt
+
+
+class ShardedDirStore(PromptStore):
+    """Directory of `*.json` shards; `index.json` (if present) avoids parsing shards at startup."""
+
+    lazy = True
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._shard_of: Dict[str, str] = {}
+
+    def _shards(self) -> List[Path]:
+        return sorted(p for p in Path(self.path).glob("*.json") if p.name != INDEX_FILE)
+
+    def load_index(self) -> Dict[str, Dict[str, Any]]:
+        root = Path(self.path)
+        index_path = root / INDEX_FILE
+        index: Dict[str, Dict[str, Any]] = {}
+        # Built aside and swapped at the end: a failed reload keeps the current mapping.
+        shard_of: Dict[str, str] = {}
+        if index_path.exists():
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError(f"{index_path} должен быть словарём вида {{id: {{title, description, shard}}}}")
+            for pid, meta in data.items():
+                if not isinstance(meta, dict) or not meta.get("shard"):
+                    raise ValueError(f"Индекс '{pid}': нужен объект с ключом 'shard'.")
+                shard_of[pid] = str(meta["shard"])
+                index[pid] = {k: v for k, v in meta.items() if k != "shard"}
+            self._shard_of = shard_of
+            return index
+
+        # No index.json: one pass over the shards, bodies are dropped right away.
+        for shard in self._shards():
+            for pid, item in self._read_shard(shard).items():
+                validate_prompt(pid, item)
+                shard_of[pid] = shard.name
+                index[pid] = prompt_meta(item)
+        self._shard_of = shard_of
+        return index
+
+    @staticmethod
+    def _read_shard(shard: Path) -> Dict[str, Any]:
+        with open(shard, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"Шард '{shard.name}' должен быть словарём вида {{id: prompt}}")
+        return data
+
+    def load_prompt(self, prompt_id: str) -> Dict[str, Any]:
+        shard = self._shard_of.get(prompt_id)
+        if shard is None:
+            raise KeyError(prompt_id)
+        data = self._read_shard(Path(self.path) / Path(shard).name)
+        if prompt_id not in data:
+            raise ValueError(f"Промпт '{prompt_id}' не найден в шарде '{shard}'.")
+        return validate_prompt(prompt_id, data[prompt_id])
+
+
+class SqliteStore(PromptStore):
+    """Read-only SQLite catalog (one row per prompt, full prompt JSON in `data`)."""
+
+    lazy = True
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"Файл базы данных '{self.path}' не найден!")
+            uri = Path(self.path).resolve().as_uri() + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._conn
+
+    def load_index(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            # (Re)load = fresh connection: the file may have been replaced (export writes tmp + rename).
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            rows = self._connection().execute(
+                "SELECT id, title, description, category, variables FROM prompts ORDER BY rowid"
+            ).fetchall()
+        index: Dict[str, Dict[str, Any]] = {}
+        for pid, title, description, category, variables in rows:
+            meta: Dict[str, Any] = {"title": title, "description": description}
+            if category:
+                meta["category"] = category
+            try:
+                meta["variables"] = list(json.loads(variables or "[]"))
+            except ValueError:
+                pass
+            index[pid] = meta
+        return index
+
+    def load_prompt(self, prompt_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._connection().execute("SELECT data FROM prompts WHERE id = ?", (prompt_id,)).fetchone()
+        if row is None:
+            raise KeyError(prompt_id)
+        return validate_prompt(prompt_id, json.loads(row[0]))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def open_prompt_store(path: str) -> PromptStore:
+    """Backend by path: directory → shards, .sqlite/.sqlite3/.db → SQLite, otherwise prompts.json."""
+    p = Path(path)
+    if p.is_dir():
+        return ShardedDirStore(str(p))
+    if p.suffix.lower() in SQLITE_SUFFIXES:
+        return SqliteStore(str(p))
+    return JsonFileStore(str(p))
+
+
+def catalog_mtime_ns(path: Path) -> int:
+    """Cache-invalidation stamp: newest mtime of the catalog file / shards (0 if missing)."""
+    try:
+        p = Path(path)
+        stamp = int(p.stat().st_mtime_ns)
+        if p.is_dir():
+            for shard in p.glob("*.json"):
+                stamp = max(stamp, int(shard.stat().st_mtime_ns))
+        elif p.suffix.lower() in SQLITE_SUFFIXES:
+            wal = p.with_name(p.name + "-wal")
+            if wal.exists():
+                stamp = max(stamp, int(wal.stat().st_mtime_ns))
+        return stamp
+    except Exception:
+        return 0
@@ -0,0 +1,241 @@
+"""Headless batch prompt generation over JSONL/CSV (same pipeline as the 🍌 button).
+
+Each input row names a prompt and its inputs:
+
+    {"prompt_id": "background_change", "inputs": {"subject": "...", "new_background": "..."}}
+    {"id": "row-7", "prompt_id": "studio_portrait", "neg_mode": "hard", "subject": "..."}
+
+JSONL rows may carry inputs under "inputs" or flat next to "prompt_id"; CSV rows are
+always flat (one column per variable). Optional keys: "id" (copied to the output),
+"neg_mode" (light|medium|hard), "neg_category" (1..6, NEG_GROUPS id), "disabled"
+(optional fields turned off, list or comma-separated). Input values must be
+scalars (string/number/bool); a malformed row gets an "error" and the run goes on.
+
+One JSON line per input row is written in input order:
+prompt_en / prompt_ru / negative_en / negative_ru / full_text, or "error".
+Rows are streamed through a bounded window, so memory stays flat on any input size.
+
+Usage:
+    python scripts/batch_generate.py rows.jsonl -o out.jsonl --workers 8
+    cat rows.csv | python scripts/batch_generate.py - --format csv > out.jsonl
+"""
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE))
+
+from prompt_engine import MissingInputsError, build_prompt, prepare_inputs  # noqa: E402
+from prompt_manager import PromptManager  # noqa: E402
+from translation import TranslationCache, create_translator, translate_fields  # noqa: E402
+
+RESERVED_KEYS = {"id", "prompt_id", "inputs", "neg_mode", "neg_category", "disabled"}
+
+
+def _iter_rows(stream, fmt: str):
+    """Yields (line_no, row_dict | None, error | None)."""
+    if fmt == "csv":
+        for n, row in enumerate(csv.DictReader(stream), start=2):
+            yield n, {k: v for k, v in row.items() if k is not None}, None
+        return
+    for n, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield n, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield n, None, "row must be a JSON object"
+            continue
+        yield n, row, None
+
+
+class RowError(ValueError):
+    """Invalid row: reported as that row's "error", the run goes on."""
+
+
+def _row_inputs(row: dict) -> dict:
+    """Input values as strings; nested objects/lists are rejected (same rule as server.py)."""
+    inputs = row.get("inputs")
+    if inputs is not None and not isinstance(inputs, dict):
+        raise RowError("inputs must be an object")
+    items = inputs.items() if isinstance(inputs, dict) else ((k, v) for k, v in row.items() if k not in RESERVED_KEYS)
+    out = {}
+    for k, v in items:
+        if v is not None and not isinstance(v, (str, int, float, bool)):
+            raise RowError(f"inputs.{k} must be a string")
+        out[str(k)] = "" if v is None else str(v)
+    return out
+
+
+def _row_disabled(row: dict) -> list:
+    disabled = row.get("disabled") or []
+    if isinstance(disabled, str):
+        return disabled.split(",")
+    if not isinstance(disabled, list) or not all(isinstance(v, str) for v in disabled):
+        raise RowError("disabled must be a list of strings or a comma-separated string")
+    return disabled
+
+
+class BatchRunner:
+    """Runs one row through prompt_engine.build_prompt (translation via translate_fields)."""
+
+    def __init__(self, manager: PromptManager, translator, cache, translate_ex, translate_sem, args):
+        self.manager = manager
+        self.translator = translator
+        self.cache = cache
+        self.translate_ex = translate_ex
+        self.translate_sem = translate_sem
+        self.args = args
+
+    def run(self, line_no: int, row: dict) -> dict:
+        out: dict = {"line": line_no}
+        if "id" in row:
+            out["id"] = row["id"]
+        prompt_id = str(row.get("prompt_id") or "").strip()
+        out["prompt_id"] = prompt_id
+        if prompt_id not in self.manager.prompts:
+            out["error"] = f"unknown prompt_id: {prompt_id!r}"
+            return out
+
+        notices: list = []
+
+        def _translate(values: dict):
+            return translate_fields(
+                values,
+                self.translator,
+                executor=self.translate_ex,
+                semaphore=self.translate_sem,
+                cache=self.cache,
+                enabled=self.translator is not None,
+                max_chars=self.args.translate_max_chars,
+                max_concurrency=self.args.translate_concurrency,
+                acquire_timeout=self.args.translate_timeout,
+                budget_sec=self.args.translate_timeout,
+                batch=True,
+                notice=notices.append,
+            )
+
+        try:
+            neg_category = row.get("neg_category")
+            if neg_category is not None and not isinstance(neg_category, (str, int)):
+                raise RowError("neg_category must be a string or an integer")
+            user_inputs, disabled = prepare_inputs(self.manager, prompt_id, _row_inputs(row), _row_disabled(row))
+            result = build_prompt(
+                prompt_id,
+                user_inputs,
+                str(row.get("neg_mode") or self.args.neg_mode),
+                neg_category,
+                self.args.lang,
+                manager=self.manager,
+                translate=_translate,
+                disabled=disabled,
+            )
+        except RowError as e:
+            out["error"] = str(e)
+            return out
+        except MissingInputsError as e:
+            out["error"] = "missing inputs: " + ", ".join(e.missing)
+            return out
+        except Exception as e:
+            out["error"] = f"{type(e).__name__}: {e}"
+            return out
+
+        out.update(result.to_dict())
+        if notices:
+            out["notices"] = notices
+        return out
+
+
+def _run_rows(rows, runner: BatchRunner, workers: int):
+    """Ordered results with at most `workers * 4` rows in flight."""
+    if workers <= 1:
+        for n, row, err in rows:
+            yield {"line": n, "error": err} if err else runner.run(n, row)
+        return
+    window = max(1, workers * 4)
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for n, row, err in rows:
+            pending.append(({"line": n, "error": err}, None) if err else (None, ex.submit(runner.run, n, row)))
+            if len(pending) >= window:
+                done, fut = pending.popleft()
+                yield done if fut is None else fut.result()
+        while pending:
+            done, fut = pending.popleft()
+            yield done if fut is None else fut.result()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("input", help="JSONL/CSV file, or - for stdin")
+    ap.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    ap.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: by file extension, else jsonl)")
+    ap.add_argument(
+        "--prompts",
+        default=os.getenv("NANOBANANO_PROMPTS_PATH") or str(BASE / "prompts.json"),
+        help="prompt catalog: prompts.json, shard dir or SQLite (default: NANOBANANO_PROMPTS_PATH)",
+    )
+    ap.add_argument("--workers", type=int, default=1, help="rows processed in parallel (default: 1)")
+    ap.add_argument("--neg-mode", default="medium", help="light|medium|hard (rows may override via neg_mode)")
+    ap.add_argument("--lang", choices=["both", "en", "ru"], default="both", help="prompt versions to build")
+    ap.add_argument("--no-translate", action="store_true", help="keep RU values in the EN prompt")
+    ap.add_argument(
+        "--backend",
+        default=(os.getenv("NANOBANANO_TRANSLATOR_BACKEND") or "glossary,google").strip(),
+        help="translator backend spec (default: NANOBANANO_TRANSLATOR_BACKEND or glossary,google)",
+    )
+    ap.add_argument(
+        "--cache-path",
+        default=(os.getenv("NANOBANANO_TRANSLATE_CACHE_PATH") or "").strip(),
+        help="SQLite translation cache shared with the app (default: NANOBANANO_TRANSLATE_CACHE_PATH)",
+    )
+    ap.add_argument("--translate-concurrency", type=int, default=2, help="parallel translator requests (default: 2)")
+    ap.add_argument("--translate-timeout", type=float, default=10.0, help="per-row translation budget, sec")
+    ap.add_argument("--translate-max-chars", type=int, default=4000, help="longer values are not translated")
+    args = ap.parse_args()
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    manager = PromptManager(args.prompts)
+    translator = None if args.no_translate else create_translator(args.backend)
+    if translator is None and not args.no_translate:
+        print(f"warning: no translator backend available ({args.backend}); EN prompts keep RU values", file=sys.stderr)
+    cache = TranslationCache(ttl_sec=0, max_entries=4096, max_bytes=8_000_000, path=args.cache_path)
+
+    translate_concurrency = max(1, args.translate_concurrency)
+    translate_ex = ThreadPoolExecutor(max_workers=translate_concurrency)
+    runner = BatchRunner(
+        manager, translator, cache, translate_ex, threading.Semaphore(translate_concurrency), args
+    )
+
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8-sig", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    total = failed = 0
+    try:
+        for result in _run_rows(_iter_rows(src, fmt), runner, max(1, args.workers)):
+            total += 1
+            failed += "error" in result
+            dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        translate_ex.shutdown(wait=False, cancel_futures=True)
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+    print(f"{total} row(s), {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,31 @@
+"""Build prompts.compiled.pickle: the precompiled catalog workers load at startup.
+
+    python scripts/build_catalog_artifact.py            # prompts.json → prompts.compiled.pickle
+    python scripts/build_catalog_artifact.py --prompts other.json -o /tmp/other.pickle
+
+Run it after editing prompts.json / ui_tables.py (the Dockerfile does it at image build).
+A stale artifact is never used: PromptManager checks the JSON hash and the code fingerprint.
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE))
+
+from prompt_artifact import build_artifact, default_artifact_path, write_artifact  # noqa: E402
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--prompts", default=str(BASE / "prompts.json"), help="source prompts.json")
+    ap.add_argument("-o", "--output", type=Path, help="artifact path (default: NANOBANANO_PROMPTS_ARTIFACT or <prompts>.compiled.pickle)")
+    args = ap.parse_args()
+
+    out = args.output or default_artifact_path(args.prompts)
+    if out is None:
+        sys.exit("NANOBANANO_PROMPTS_ARTIFACT is off; pass -o")
+    t0 = time.perf_counter()
+    payload = build_artifact(args.prompts)
+    write_artifact(payload, out)
+    print(f"✅ {out.name}: {len(payload['prompts'])} prompt(s), {out.stat().st_size // 1024} KB, {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,109 @@
+"""Export prompts.json into a lazily loaded catalog (shard directory or SQLite).
+
+    python scripts/export_catalog.py --shards catalog/ --shard-size 200
+    python scripts/export_catalog.py --sqlite catalog.sqlite
+
+Point the app/server at the result with NANOBANANO_PROMPTS_PATH (or --prompts).
+Both layouts carry an index (id/title/description/category/variables), so a
+worker reads only the index at startup and loads template bodies on demand.
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE))
+
+from prompt_manager import PromptManager  # noqa: E402
+from prompt_store import INDEX_FILE, SQLITE_SCHEMA, prompt_meta  # noqa: E402
+
+
+def _source(path: str):
+    manager = PromptManager(path)
+    for pid in manager.index:
+        yield pid, manager.prompts[pid], sorted(manager.variables(pid))
+
+
+def export_shards(src: str, out_dir: Path, shard_size: int) -> int:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("*.json"):
+        old.unlink()
+    index: dict = {}
+    shard: dict = {}
+    n_shards = 0
+
+    def _flush():
+        nonlocal shard, n_shards
+        if shard:
+            name = f"shard-{n_shards:05d}.json"
+            (out_dir / name).write_text(json.dumps(shard, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            for pid in shard:
+                index[pid]["shard"] = name
+            n_shards += 1
+            shard = {}
+
+    for pid, item, variables in _source(src):
+        shard[pid] = item
+        index[pid] = prompt_meta(item, variables)
+        if len(shard) >= shard_size:
+            _flush()
+    _flush()
+    # index.json last: a reader never sees an index pointing at missing shards.
+    tmp = out_dir / (INDEX_FILE + ".tmp")
+    tmp.write_text(json.dumps(index, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, out_dir / INDEX_FILE)
+    return len(index)
+
+
+def export_sqlite(src: str, out_path: Path) -> int:
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+    conn = sqlite3.connect(str(tmp))
+    try:
+        conn.execute(SQLITE_SCHEMA)
+        rows = [
+            (
+                pid,
+                str(item.get("title", pid)),
+                str(item.get("description", "")),
+                item.get("category"),
+                json.dumps(variables),
+                json.dumps(item, ensure_ascii=False),
+            )
+            for pid, item, variables in _source(src)
+        ]
+        conn.executemany(
+            "INSERT INTO prompts (id, title, description, category, variables, data) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, out_path)
+    return len(rows)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--prompts", default=str(BASE / "prompts.json"), help="source catalog (default: prompts.json)")
+    out = ap.add_mutually_exclusive_group(required=True)
+    out.add_argument("--shards", type=Path, help="output directory for JSON shards + index.json")
+    out.add_argument("--sqlite", type=Path, help="output SQLite file")
+    ap.add_argument("--shard-size", type=int, default=200, help="prompts per shard (default: 200)")
+    args = ap.parse_args()
+
+    if args.shards:
+        n = export_shards(args.prompts, args.shards, max(1, args.shard_size))
+        print(f"✅ {n} prompt(s) → {args.shards}/")
+    else:
+        n = export_sqlite(args.prompts, args.sqlite)
+        print(f"✅ {n} prompt(s) → {args.sqlite}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
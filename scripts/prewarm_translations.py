@@ -0,0 +1,140 @@
+"""Precompute EN translations for known UI strings (offline job).
+
+Collects the Cyrillic values users most often submit verbatim — enum options,
+placeholders and examples from SPECIFIC_HINTS / EXAMPLES_DB — translates them
+once and writes a {ru: en} phrase table. The `glossary` translator backend
+loads that file at startup, so these values skip the network translator.
+
+translations_en.json is committed (generated file shipped with the app); rerun
+this script after editing ui_tables.py. Only missing phrases are fetched, so
+the network is needed just for the new ones. `--check` (CI, no network) fails
+if the committed table misses a known phrase.
+
+VAR_MAP is not scanned: it holds field labels ("Фон / Стиль фона") shown
+next to the inputs, not values users submit, and has no examples.
+
+Usage:
+    python scripts/prewarm_translations.py [--backend google] [--output translations_en.json] [--check]
+"""
+from pathlib import Path
+import argparse
+import json
+import re
+import sys
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE))
+
+from translation import (  # noqa: E402
+    DEFAULT_PHRASE_FILE,
+    GlossaryTranslator,
+    glossary_from_ui_tables,
+    create_translator,
+    load_phrase_file,
+    normalize_translate_cache_key,
+    plan_batches,
+    translate_many,
+)
+from ui_tables import ENUM_OPTIONS, EXAMPLES_DB, SPECIFIC_HINTS  # noqa: E402
+
+CYRILLIC_RE = re.compile(r"[А-Яа-яЁё]")
+MAX_PHRASE_CHARS = 60
+
+
+def _split_examples(text: str) -> list[str]:
+    """'Примеры: мягкий свет, неон, закат.' -> ['мягкий свет', 'неон', 'закат']"""
+    if ":" not in text:
+        return []
+    tail = text.rsplit(":", 1)[-1]
+    tail = re.sub(r"\(.*?\)", "", tail)
+    return [p.strip(" .!?()'\"") for p in tail.split(",")]
+
+
+def known_ru_phrases() -> list[str]:
+    found: list[str] = []
+
+    def _add(value: str) -> None:
+        key = normalize_translate_cache_key(value)
+        if key and CYRILLIC_RE.search(key) and len(key) <= MAX_PHRASE_CHARS and key not in seen:
+            seen.add(key)
+            found.append(key)
+
+    seen: set[str] = set()
+    for options in ENUM_OPTIONS.values():
+        for opt in options:
+            _add(opt)
+
+    hint_tables = [EXAMPLES_DB] + list(SPECIFIC_HINTS.values())
+    for table in hint_tables:
+        for hint in table.values():
+            ph = str(hint.get("ph", ""))
+            _add(ph)
+            for part in ph.split(","):
+                _add(part.strip(" ."))
+            for part in _split_examples(str(hint.get("help", ""))):
+                _add(part)
+    return found
+
+
+def untranslated(table: dict[str, str]) -> list[str]:
+    """Known phrases neither in `table` nor covered by the enum glossary."""
+    # Enum options in "RU (EN)" form already carry their EN label; the glossary covers them.
+    enum_glossary = GlossaryTranslator(glossary_from_ui_tables(ENUM_OPTIONS))
+    return [p for p in known_ru_phrases() if p not in table and enum_glossary.lookup(p) is None]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--backend", default="google", help="translator backend spec (default: google)")
+    ap.add_argument("--output", default=str(DEFAULT_PHRASE_FILE), help="phrase table to write")
+    ap.add_argument("--batch-chars", type=int, default=1500, help="max chars per translator request")
+    ap.add_argument("--refresh", action="store_true", help="re-translate phrases already in the output file")
+    ap.add_argument("--check", action="store_true", help="only verify the table covers every known phrase (no network)")
+    args = ap.parse_args()
+
+    if args.check:
+        table = load_phrase_file(args.output)
+        missing = untranslated(table)
+        if missing:
+            print(f"{args.output} is out of date: {len(missing)} phrase(s) missing, e.g. {missing[:5]}", file=sys.stderr)
+            print("Run: python scripts/prewarm_translations.py", file=sys.stderr)
+            return 1
+        print(f"✅ {args.output}: all known phrases covered ({len(table)})")
+        return 0
+
+    tr = create_translator(args.backend)
+    if tr is None:
+        print(f"Translator backend '{args.backend}' is not available.", file=sys.stderr)
+        return 1
+
+    table = {} if args.refresh else load_phrase_file(args.output)
+    todo = untranslated(table)
+    print(f"Known phrases to translate: {len(todo)} (already in table: {len(table)})")
+
+    failed = 0
+    for batch in plan_batches(todo, args.batch_chars):
+        texts = [todo[i] for i in batch]
+        try:
+            translated = translate_many(tr, texts)
+        except Exception as e:
+            print(f"  batch of {len(texts)} failed: {type(e).__name__}", file=sys.stderr)
+            failed += len(texts)
+            continue
+        for ru, en in zip(texts, translated):
+            if isinstance(en, str) and en.strip() and not CYRILLIC_RE.search(en):
+                table[ru] = en.strip()
+            else:
+                failed += 1
+
+    if todo and failed == len(todo):
+        print("Nothing was translated; output left unchanged.", file=sys.stderr)
+        return 1
+
+    out = dict(sorted(table.items()))
+    Path(args.output).write_text(json.dumps(out, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    print(f"✅ {args.output}: {len(out)} phrases ({failed} not translated)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
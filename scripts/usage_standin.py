@@ -0,0 +1,177 @@
+"""Local stand-in for the usage sinks and the shared rate limiter: an HTTP collector and a minimal Redis-protocol server.
+
+    python scripts/usage_standin.py --http-port 8091 --redis-port 6390 -o usage_events.jsonl
+    NANOBANANO_USAGE_MODE=http  NANOBANANO_USAGE_HTTP_URL=http://127.0.0.1:8091/usage  streamlit run app.py
+    NANOBANANO_USAGE_MODE=redis NANOBANANO_USAGE_REDIS_URL=redis://127.0.0.1:6390/0    streamlit run app.py
+    NANOBANANO_USAGE_UNITS_PER_MINUTE=10 NANOBANANO_USAGE_LIMIT_BACKEND=redis \
+        NANOBANANO_USAGE_LIMIT_REDIS_URL=redis://127.0.0.1:6390/0 python server.py
+
+Every received event is appended to the output JSONL (one line per event) and counted.
+With --fail-every N, every Nth request is answered with an error (HTTP 503 /
+RESP -ERR), so the recorder's retry and drop paths can be exercised.
+Redis subset: PING, AUTH, SELECT, RPUSH, LLEN, INCRBY, DECRBY, GET, PEXPIRE, QUIT.
+--fail-every applies to RPUSH only. Dev/test only: binds 127.0.0.1.
+"""
+from typing import List, Optional
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+
+class Store:
+    def __init__(self, path: Optional[str], fail_every: int):
+        self.path = path
+        self.fail_every = max(0, fail_every)
+        self.requests = 0
+        self.events = 0
+        self.lists: dict = {}
+        self.counters: dict = {}  # key -> [value, expires_at (monotonic) or None]
+
+    def counter(self, key: str) -> list:
+        c = self.counters.get(key)
+        if c is not None and c[1] is not None and c[1] <= time.monotonic():
+            c = None
+        if c is None:
+            c = self.counters[key] = [0, None]
+        return c
+
+    def should_fail(self) -> bool:
+        self.requests += 1
+        return bool(self.fail_every) and self.requests % self.fail_every == 0
+
+    def append(self, source: str, events: List[str]) -> None:
+        self.events += len(events)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for e in events:
+                    f.write(e.rstrip("\n") + "\n")
+        print(f"[{source}] +{len(events)} event(s), total {self.events}", flush=True)
+
+
+async def _http(store: Store, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            method = line.split(b" ", 1)[0]
+            length = 0
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = h.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value.strip() or 0)
+            body = await reader.readexactly(length) if length else b""
+            status, reply = "200 OK", b'{"ok":true}'
+            if method != b"POST":
+                status, reply = "405 Method Not Allowed", b'{"error":"POST only"}'
+            elif store.should_fail():
+                status, reply = "503 Service Unavailable", b'{"error":"injected failure"}'
+            else:
+                try:
+                    events = json.loads(body.decode("utf-8")).get("events", [])
+                    store.append("http", [json.dumps(e, ensure_ascii=False) for e in events])
+                except (ValueError, AttributeError):
+                    status, reply = "400 Bad Request", b'{"error":"invalid JSON"}'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(reply)}\r\n\r\n".encode()
+                + reply
+            )
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[str]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.decode("utf-8", "replace").split()  # inline command (e.g. `PING` from nc)
+    args = []
+    for _ in range(int(line[1:])):
+        n = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(n + 2))[:-2].decode("utf-8"))
+    return args
+
+
+async def _redis(store: Store, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            args = await _read_command(reader)
+            if args is None or not args:
+                return
+            cmd = args[0].upper()
+            if cmd == "PING":
+                writer.write(b"+PONG\r\n")
+            elif cmd in ("AUTH", "SELECT"):
+                writer.write(b"+OK\r\n")
+            elif cmd == "RPUSH" and len(args) >= 3:
+                if store.should_fail():
+                    writer.write(b"-ERR injected failure\r\n")
+                else:
+                    lst = store.lists.setdefault(args[1], [])
+                    lst.extend(args[2:])
+                    store.append(f"redis {args[1]}", args[2:])
+                    writer.write(b":%d\r\n" % len(lst))
+            elif cmd == "LLEN" and len(args) == 2:
+                writer.write(b":%d\r\n" % len(store.lists.get(args[1], [])))
+            elif cmd in ("INCRBY", "DECRBY") and len(args) == 3:
+                c = store.counter(args[1])
+                c[0] += int(args[2]) if cmd == "INCRBY" else -int(args[2])
+                writer.write(b":%d\r\n" % c[0])
+            elif cmd == "GET" and len(args) == 2:
+                c = store.counters.get(args[1])
+                if c is None or (c[1] is not None and c[1] <= time.monotonic()):
+                    writer.write(b"$-1\r\n")
+                else:
+                    v = str(c[0]).encode()
+                    writer.write(b"$%d\r\n%s\r\n" % (len(v), v))
+            elif cmd == "PEXPIRE" and len(args) == 3:
+                c = store.counters.get(args[1])
+                if c is not None:
+                    c[1] = time.monotonic() + int(args[2]) / 1000.0
+                writer.write(b":%d\r\n" % (1 if c is not None else 0))
+            elif cmd == "QUIT":
+                writer.write(b"+OK\r\n")
+                await writer.drain()
+                return
+            else:
+                writer.write(f"-ERR unknown command '{args[0]}'\r\n".encode())
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main_async(args) -> None:
+    store = Store(args.output, args.fail_every)
+    servers = []
+    if args.http_port:
+        servers.append(await asyncio.start_server(lambda r, w: _http(store, r, w), "127.0.0.1", args.http_port))
+        print(f"HTTP  usage sink: http://127.0.0.1:{args.http_port}/usage", flush=True)
+    if args.redis_port:
+        servers.append(await asyncio.start_server(lambda r, w: _redis(store, r, w), "127.0.0.1", args.redis_port))
+        print(f"Redis usage sink: redis://127.0.0.1:{args.redis_port}/0", flush=True)
+    if not servers:
+        sys.exit("nothing to serve: set --http-port and/or --redis-port")
+    await asyncio.gather(*(s.serve_forever() for s in servers))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--http-port", type=int, default=8091, help="HTTP collector port (0 = off)")
+    ap.add_argument("--redis-port", type=int, default=6390, help="Redis-protocol port (0 = off)")
+    ap.add_argument("-o", "--output", help="append received events to this JSONL file")
+    ap.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with an error")
+    try:
+        asyncio.run(main_async(ap.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,151 @@
+"""Inverted index for prompt search (sidebar, API clients).
+
+Строится один раз на версию каталога, запрос — несколько bisect по
+отсортированному словарю вместо линейного прохода по всем задачам.
+
+- токены: NFKC + casefold, буквы/цифры (snake_case id режется на слова)
+- транслитерация: кириллические токены индексируются ещё и латиницей,
+  поэтому "fon" находит "фон", а "портрет" — "portret"
+- префиксы: "порт" находит "портрет"; точное совпадение весит больше;
+  окончания: "эмоция" находит "эмоции" (основа без 1-2 последних букв, с меньшим весом)
+- все слова запроса должны найтись (AND); ранжирование по весу поля:
+  title > id > description > переменные > тексты prompt_en / prompt_ru
+"""
+from __future__ import annotations
+
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-яё]+")
+_VAR_RE = re.compile(r"\[([a-zA-Z0-9_]+)\]")
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+
+_TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+}
+
+# Field weights (per occurrence, capped per field).
+FIELD_WEIGHTS = {
+    "title": 8.0,
+    "id": 6.0,
+    "description": 3.0,
+    "variables": 2.0,
+    "body": 1.0,
+}
+_EXACT_BONUS = 2.0
+# Cyrillic query words also match their stems without the last 1..2 letters.
+_MAX_SUFFIX_TRIM = 2
+_MIN_STEM_LEN = 4
+_STEM_FACTOR = 0.5
+
+
+def transliterate(token: str) -> str:
+    return "".join(_TRANSLIT.get(ch, ch) for ch in token)
+
+
+def tokenize(text: Any) -> List[str]:
+    raw = unicodedata.normalize("NFKC", "" if text is None else str(text)).casefold()
+    return _TOKEN_RE.findall(raw)
+
+
+def _token_forms(token: str) -> Set[str]:
+    forms = {token}
+    if _CYRILLIC_RE.search(token):
+        forms.add(transliterate(token))
+    if token.isdigit():
+        forms.add(token.lstrip("0") or "0")
+    return forms
+
+
+class SearchIndex:
+    """Immutable index over {prompt_id: prompt_data} (prompts.json layout).
+
+    Also accepts PromptManager.index of lazy catalogs: entries without
+    prompt_en/prompt_ru are indexed by title/id/description/"variables".
+    """
+
+    def __init__(self, prompts: Mapping[str, Mapping[str, Any]]):
+        self._ids: List[str] = list(prompts)
+        self._titles: List[str] = [str((prompts[pid] or {}).get("title", pid)) for pid in self._ids]
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+
+        for doc, pid in enumerate(self._ids):
+            data = prompts[pid] or {}
+            body = f"{data.get('prompt_en', '')} {data.get('prompt_ru', '')}"
+            fields = {
+                "title": data.get("title", ""),
+                "id": pid,
+                "description": data.get("description", ""),
+                "variables": " ".join(sorted(set(_VAR_RE.findall(body)) | set(data.get("variables") or ()))),
+                "body": _VAR_RE.sub(" ", body),
+            }
+            for name, text in fields.items():
+                weight = FIELD_WEIGHTS[name]
+                for token in set(tokenize(text)):
+                    for form in _token_forms(token):
+                        # Best field wins, fields do not stack (a word in title + body is still a title hit).
+                        if postings[form].get(doc, 0.0) < weight:
+                            postings[form][doc] = weight
+
+        self._vocab: List[str] = sorted(postings)
+        self._postings: Dict[str, Tuple[Tuple[int, float], ...]] = {
+            t: tuple(docs.items()) for t, docs in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _prefix_range(self, prefix: str) -> Iterable[str]:
+        lo = bisect.bisect_left(self._vocab, prefix)
+        hi = bisect.bisect_left(self._vocab, prefix + "￿")
+        return self._vocab[lo:hi]
+
+    def _match_token(self, token: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for form in _token_forms(token):
+            for term in self._prefix_range(form):
+                bonus = _EXACT_BONUS if term == form else 1.0
+                for doc, weight in self._postings[term]:
+                    score = weight * bonus
+                    if scores.get(doc, 0.0) < score:
+                        scores[doc] = score
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Prompt ids ranked by relevance ([] for an empty query or no match)."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        total: Optional[Dict[int, float]] = None
+        for token in tokens:
+            scores = self._match_token(token)
+            # Russian inflection: shorter stems also match ("эмоция" → "эмоции"), at a lower weight.
+            if _CYRILLIC_RE.search(token):
+                for trim in range(1, _MAX_SUFFIX_TRIM + 1):
+                    if len(token) - trim < _MIN_STEM_LEN:
+                        break
+                    factor = _STEM_FACTOR ** trim
+                    for doc, score in self._match_token(token[:-trim]).items():
+                        if scores.get(doc, 0.0) < score * factor:
+                            scores[doc] = score * factor
+            if not scores:
+                return []
+            if total is None:
+                total = scores
+            else:
+                total = {doc: s + scores[doc] for doc, s in total.items() if doc in scores}
+                if not total:
+                    return []
+
+        ranked = sorted((total or {}).items(), key=lambda x: (-x[1], self._titles[x[0]]))
+        if limit is not None:
+            ranked = ranked[: max(0, int(limit))]
+        return [self._ids[doc] for doc, _ in ranked]
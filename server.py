@@ -0,0 +1,484 @@
+"""HTTP/JSON service mode (stdlib asyncio, no Streamlit).
+
+Endpoints:
+  GET  /v1/prompts                       список задач: id, title, variables
+  POST /v1/prompts/{prompt_id}:render    prompt_engine.build_prompt → JSON
+  GET  /healthz
+
+Тело render-запроса:
+    {"inputs": {...}, "neg_mode": "medium", "neg_category": null,
+     "lang": "both", "disabled": [], "translate": true}
+
+Одинаковые одновременные render-запросы схлопываются в одну сборку (request
+coalescing); usage-событие future_saas пишется на каждый запрос.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8080]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from future_saas.config import FutureSaaSConfig, load_future_config
+from future_saas.context import RequestContext
+from future_saas.limits import TokenBucketLimiter, UsageLimiter, enforce_usage_limits
+from future_saas.runtime import build_request_context, build_usage_limiter, build_usage_recorder
+from future_saas.usage import UsageAction, UsageRecorder, make_event
+import metrics
+from prompt_engine import MissingInputsError, build_prompt, find_missing_inputs, prepare_inputs
+from prompt_manager import PromptManager
+from translation import TranslationCache, create_translator, translate_fields
+
+
+logger = logging.getLogger(__name__)
+
+HTTP_RESPONSES = metrics.counter("nanobanano_http_responses_total", "server.py responses by HTTP status.", ("status",))
+
+BASE_DIR = Path(__file__).resolve().parent
+PROMPTS_PATH = Path(os.getenv("NANOBANANO_PROMPTS_PATH") or (BASE_DIR / "prompts.json"))
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return int(raw) if raw else int(default)
+    except Exception:
+        return int(default)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return float(raw) if raw else float(default)
+    except Exception:
+        return float(default)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = (os.getenv(name) or "").strip().lower()
+    if not raw:
+        return bool(default)
+    return raw in {"1", "true", "yes", "y", "on"}
+
+
+SERVER_HOST = (os.getenv("NANOBANANO_SERVER_HOST") or "127.0.0.1").strip()
+SERVER_PORT = _env_int("NANOBANANO_SERVER_PORT", 8080)
+SERVER_WORKERS = _env_int("NANOBANANO_SERVER_WORKERS", 8)
+SERVER_MAX_BODY_BYTES = _env_int("NANOBANANO_SERVER_MAX_BODY_BYTES", 256 * 1024)
+SERVER_IDLE_TIMEOUT_SEC = _env_float("NANOBANANO_SERVER_IDLE_TIMEOUT_SEC", 30.0)
+# Catalog hot reload: background mtime poll, seconds (0 = off).
+PROMPTS_RELOAD_INTERVAL_SEC = _env_float("NANOBANANO_PROMPTS_RELOAD_SEC", 2.0)
+
+# Same knobs (and defaults) as the UI, see app.py.
+TRANSLATION_ENABLED_DEFAULT = _env_bool("NANOBANANO_TRANSLATION_ENABLED", True)
+TRANSLATE_TIMEOUT_SEC = _env_float("NANOBANANO_TRANSLATE_TIMEOUT_SEC", 2.0)
+TRANSLATE_MAX_CHARS = _env_int("NANOBANANO_TRANSLATE_MAX_CHARS", 4000)
+TRANSLATE_MAX_CONCURRENCY = _env_int("NANOBANANO_TRANSLATE_MAX_CONCURRENCY", 1)
+TRANSLATE_ACQUIRE_TIMEOUT_SEC = _env_float("NANOBANANO_TRANSLATE_ACQUIRE_TIMEOUT_SEC", 0.1)
+TRANSLATE_BATCH_ENABLED = _env_bool("NANOBANANO_TRANSLATE_BATCH", True)
+TRANSLATE_GLOBAL_BUDGET_SEC = _env_float(
+    "NANOBANANO_TRANSLATE_GLOBAL_BUDGET_SEC",
+    max(0.2, float(TRANSLATE_TIMEOUT_SEC) * max(1, int(TRANSLATE_MAX_CONCURRENCY))),
+)
+
+_MAX_HEADER_LINES = 100
+_MAX_INPUTS = 200
+_RENDER_PATH_RE = re.compile(r"^/v1/prompts/([A-Za-z0-9_\-]+):render$")
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    414: "URI Too Long",
+    422: "Unprocessable Entity",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, extra: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra or {}
+
+
+def _parse_render_request(body: Any) -> Dict[str, Any]:
+    """Validates the render body; returns a normalized dict (also the coalescing key)."""
+    if not isinstance(body, dict):
+        raise HTTPError(400, "body must be a JSON object")
+    inputs = body.get("inputs") or {}
+    if not isinstance(inputs, dict) or len(inputs) > _MAX_INPUTS:
+        raise HTTPError(400, "inputs must be an object")
+    for k, v in inputs.items():
+        if v is not None and not isinstance(v, (str, int, float, bool)):
+            raise HTTPError(400, f"inputs.{k} must be a string")
+    disabled = body.get("disabled") or []
+    if not isinstance(disabled, list) or not all(isinstance(v, str) for v in disabled):
+        raise HTTPError(400, "disabled must be a list of strings")
+    lang = body.get("lang") or "both"
+    if lang not in ("both", "en", "ru"):
+        raise HTTPError(400, "lang must be one of: both, en, ru")
+    neg_category = body.get("neg_category")
+    if neg_category is not None and not isinstance(neg_category, (str, int)):
+        raise HTTPError(400, "neg_category must be a string or an integer")
+    translate = body.get("translate", True)
+    if not isinstance(translate, bool):
+        raise HTTPError(400, "translate must be a boolean")
+    return {
+        "inputs": {str(k): "" if v is None else str(v) for k, v in inputs.items()},
+        "neg_mode": str(body.get("neg_mode") or "medium"),
+        "neg_category": neg_category,
+        "lang": lang,
+        "disabled": sorted(set(disabled)),
+        "translate": translate,
+    }
+
+
+class PromptService:
+    """Render/list logic without the HTTP layer (also usable in-process)."""
+
+    def __init__(
+        self,
+        manager: PromptManager,
+        *,
+        cfg: Optional[FutureSaaSConfig] = None,
+        recorder: Optional[UsageRecorder] = None,
+        limiter: Optional[UsageLimiter] = None,
+        translator: Any = None,
+        workers: int = SERVER_WORKERS,
+    ):
+        self.manager = manager
+        self.cfg = cfg or load_future_config()
+        self.recorder = recorder or build_usage_recorder(self.cfg)
+        self.limiter = limiter or build_usage_limiter(self.cfg)
+        self.translator = translator
+        self.translate_cache = TranslationCache(
+            ttl_sec=_env_int("NANOBANANO_TRANSLATE_CACHE_TTL_SEC", 3600),
+            max_entries=_env_int("NANOBANANO_TRANSLATE_CACHE_MAX_ENTRIES", 256),
+            max_bytes=_env_int("NANOBANANO_TRANSLATE_CACHE_MAX_BYTES", 2_000_000),
+            path=(os.getenv("NANOBANANO_TRANSLATE_CACHE_PATH") or "").strip(),
+            disk_max_entries=_env_int("NANOBANANO_TRANSLATE_CACHE_DISK_MAX_ENTRIES", 50_000),
+        )
+        self.translate_executor = ThreadPoolExecutor(max_workers=max(1, TRANSLATE_MAX_CONCURRENCY))
+        self.translate_semaphore = threading.Semaphore(max(1, TRANSLATE_MAX_CONCURRENCY))
+        self.render_executor = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+        self._inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._prompts_body: Optional[Tuple[int, bytes]] = None
+        metrics.register_collector("prompt_manager", self.manager.metric_samples)
+        metrics.register_collector("translate_cache", self.translate_cache.metric_samples)
+        metrics.register_collector(
+            "executors",
+            lambda: metrics.executor_samples(self.translate_executor, pool="translate")
+            + metrics.executor_samples(self.render_executor, pool="render"),
+        )
+        metrics.register_collector("usage_recorder", lambda: metrics.usage_recorder_samples(self.recorder))
+        metrics.register_collector("usage_limiter", lambda: metrics.usage_limiter_samples(self.limiter))
+
+    def close(self) -> None:
+        self.render_executor.shutdown(wait=False, cancel_futures=True)
+        self.translate_executor.shutdown(wait=False, cancel_futures=True)
+
+    def prompts_body(self) -> bytes:
+        """GET /v1/prompts, serialized once per catalog version."""
+        version = self.manager.version
+        if self._prompts_body is None or self._prompts_body[0] != version:
+            items = []
+            for pid, meta in self.manager.index.items():
+                variables = self.manager.variables(pid)
+                items.append({"id": pid, "title": meta.get("title", pid), "variables": sorted(variables)})
+            self._prompts_body = (version, json.dumps({"prompts": items}, ensure_ascii=False).encode("utf-8"))
+        return self._prompts_body[1]
+
+    async def watch_catalog(self, interval: float) -> None:
+        """Polls the catalog mtime and hot-swaps edited templates (reload runs off the event loop)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.manager.reload_if_changed)
+            except Exception:
+                logger.exception("Prompt catalog watcher failed")
+
+    def _render_sync(
+        self, prompt_id: str, req: Dict[str, Any], prepared: Tuple[Dict[str, Any], set]
+    ) -> Dict[str, Any]:
+        notices: List[str] = []
+        counters: Dict[str, int] = {"translate_calls": 0, "translate_chars": 0}
+        translate = None
+        if req["translate"] and self.translator is not None:
+
+            def translate(values: Dict[str, Any]) -> Tuple[dict, List[str]]:
+                return translate_fields(
+                    values,
+                    self.translator,
+                    executor=self.translate_executor,
+                    semaphore=self.translate_semaphore,
+                    cache=self.translate_cache,
+                    enabled=TRANSLATION_ENABLED_DEFAULT,
+                    max_chars=TRANSLATE_MAX_CHARS,
+                    max_concurrency=TRANSLATE_MAX_CONCURRENCY,
+                    acquire_timeout=TRANSLATE_ACQUIRE_TIMEOUT_SEC,
+                    budget_sec=TRANSLATE_GLOBAL_BUDGET_SEC,
+                    batch=TRANSLATE_BATCH_ENABLED,
+                    notice=notices.append,
+                    counters=counters,
+                )
+
+        user_inputs, disabled = prepared
+        result = build_prompt(
+            prompt_id,
+            user_inputs,
+            req["neg_mode"],
+            req["neg_category"],
+            req["lang"],
+            manager=self.manager,
+            translate=translate,
+            disabled=disabled,
+        )
+        out = result.to_dict()
+        if notices:
+            out["notices"] = notices
+        return {"result": out, "counters": counters}
+
+    async def render(self, prompt_id: str, req: Dict[str, Any], ctx: RequestContext) -> Dict[str, Any]:
+        if prompt_id not in self.manager.prompts:
+            raise HTTPError(404, f"unknown prompt_id: {prompt_id}")
+        # Validate before charging the rate limit: a 422 must not spend the caller's budget.
+        # Cheap and I/O-free (variables come from the catalog index), so it stays on the loop.
+        prepared = prepare_inputs(self.manager, prompt_id, req["inputs"], req["disabled"])
+        missing = find_missing_inputs(prompt_id, *prepared)
+        if missing:
+            raise HTTPError(422, "missing inputs", {"missing": missing})
+        if isinstance(self.limiter.backend, TokenBucketLimiter):
+            allowed = enforce_usage_limits(ctx, UsageAction.GENERATE_PROMPT, units=1, limiter=self.limiter)
+        else:  # shared backend: a network round trip, keep it off the event loop
+            allowed = await asyncio.get_running_loop().run_in_executor(
+                None, enforce_usage_limits, ctx, UsageAction.GENERATE_PROMPT, 1, self.limiter
+            )
+        if not allowed:
+            raise HTTPError(429, "too many requests")
+
+        # Request coalescing: identical concurrent requests share one build.
+        key = prompt_id + "\0" + json.dumps(req, sort_keys=True, ensure_ascii=False)
+        fut = self._inflight.get(key)
+        coalesced = fut is not None
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self.render_executor, self._render_sync, prompt_id, req, prepared)
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _f, k=key: self._inflight.pop(k, None))
+        try:
+            rendered = await asyncio.shield(fut)
+        except MissingInputsError as e:
+            raise HTTPError(422, "missing inputs", {"missing": e.missing})
+
+        result = rendered["result"]
+        counters = rendered["counters"] if not coalesced else {}
+        # FUTURE_SAAS_HOOK: one metadata-only usage event per request.
+        try:
+            self.recorder.record(
+                ctx,
+                make_event(
+                    ctx=ctx,
+                    action=UsageAction.GENERATE_PROMPT,
+                    units=1,
+                    meta={
+                        "prompt_id": prompt_id,
+                        "api_mode": "service",
+                        "coalesced": "1" if coalesced else "0",
+                        "output_chars": str(len(result.get("full_text") or "")),
+                        "translate_calls": str(int(counters.get("translate_calls", 0))),
+                        "translate_chars": str(int(counters.get("translate_chars", 0))),
+                    },
+                ),
+            )
+        except Exception:
+            pass
+        return result
+
+
+class PromptServer:
+    """Minimal HTTP/1.1 (keep-alive, Content-Length bodies) over asyncio streams."""
+
+    def __init__(self, service: PromptService, *, max_body_bytes: int = SERVER_MAX_BODY_BYTES):
+        self.service = service
+        self.max_body_bytes = max(0, int(max_body_bytes))
+
+    def _context(self, headers: Dict[str, str], peer: Any) -> RequestContext:
+        cfg = self.service.cfg
+        ip = peer[0] if isinstance(peer, tuple) and peer else ""
+        if cfg.trust_proxy_headers and headers.get("x-forwarded-for"):
+            ip = headers["x-forwarded-for"].split(",")[0].strip()
+        sid = headers.get("x-session-id", "")
+        return build_request_context(
+            cfg,
+            session_id=sid if _SESSION_ID_RE.match(sid) else "",
+            ip=ip,
+            user_agent=headers.get("user-agent", "")[:256],
+        )
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        # One deadline for the whole request (request line, headers, body): a client
+        # that stalls after one header line must not hold the connection open.
+        return await asyncio.wait_for(self._read_request_unbounded(reader), timeout=SERVER_IDLE_TIMEOUT_SEC)
+
+    @staticmethod
+    async def _readline(reader: asyncio.StreamReader, status: int, message: str) -> bytes:
+        try:
+            return await reader.readline()
+        except ValueError:  # line longer than the StreamReader limit
+            raise HTTPError(status, message)
+
+    async def _read_request_unbounded(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await self._readline(reader, 414, "request line too long")
+        if not line:
+            return None
+        parts = line.decode("latin-1").rstrip("\r\n").split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+            raise HTTPError(400, "bad request line")
+        method, target, version = parts
+        headers: Dict[str, str] = {"_version": version}
+        for _ in range(_MAX_HEADER_LINES + 1):
+            hline = await self._readline(reader, 431, "header line too long")
+            if hline in (b"\r\n", b"\n", b""):
+                break
+            name, sep, value = hline.decode("latin-1").partition(":")
+            if not sep:
+                raise HTTPError(400, "bad header line")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(431, "too many headers")
+
+        if headers.get("transfer-encoding"):
+            raise HTTPError(411, "chunked bodies are not supported")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length")
+        if length < 0:
+            raise HTTPError(400, "bad Content-Length")
+        if length > self.max_body_bytes:
+            raise HTTPError(413, "body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes, peer: Any) -> bytes:
+        path = unquote(urlsplit(target).path)
+        if path == "/healthz":
+            return b'{"ok":true}'
+        if path == "/v1/prompts":
+            if method != "GET":
+                raise HTTPError(405, "method not allowed")
+            return self.service.prompts_body()
+        m = _RENDER_PATH_RE.match(path)
+        if m:
+            if method != "POST":
+                raise HTTPError(405, "method not allowed")
+            try:
+                payload = json.loads(body.decode("utf-8") or "{}")
+            except ValueError:
+                raise HTTPError(400, "invalid JSON")
+            req = _parse_render_request(payload)
+            result = await self.service.render(m.group(1), req, self._context(headers, peer))
+            return json.dumps(result, ensure_ascii=False).encode("utf-8")
+        raise HTTPError(404, "not found")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    conn_hdr = headers.get("connection", "").lower()
+                    keep_alive = conn_hdr != "close" and (headers["_version"] != "HTTP/1.0" or conn_hdr == "keep-alive")
+                    status, data = 200, await self._dispatch(method, target, headers, body, peer)
+                except HTTPError as e:
+                    status = e.status
+                    data = json.dumps({"error": str(e), **e.extra}, ensure_ascii=False).encode("utf-8")
+                    # After a framing error the stream position is unknown.
+                    keep_alive = keep_alive and status not in (400, 411, 413, 414, 431)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    logger.exception("Unhandled error while serving request")
+                    status = 500
+                    detail = str(e) if self.service.cfg.debug_errors else "internal error"
+                    data = json.dumps({"error": detail}, ensure_ascii=False).encode("utf-8")
+
+                HTTP_RESPONSES.inc(status=str(status))
+                head = (
+                    f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                )
+                writer.write(head.encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        srv = await asyncio.start_server(self.handle, host, port)
+        addrs = ", ".join(str(s.getsockname()) for s in srv.sockets or [])
+        logger.info("Serving on %s", addrs)
+        watcher = None
+        if PROMPTS_RELOAD_INTERVAL_SEC > 0:
+            watcher = asyncio.create_task(self.service.watch_catalog(PROMPTS_RELOAD_INTERVAL_SEC))
+        try:
+            async with srv:
+                await srv.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default=SERVER_HOST, help="bind address (NANOBANANO_SERVER_HOST, default 127.0.0.1)")
+    ap.add_argument("--port", type=int, default=SERVER_PORT, help="port (NANOBANANO_SERVER_PORT, default 8080)")
+    ap.add_argument("--prompts", default=str(PROMPTS_PATH), help="prompt catalog: prompts.json, shard dir or SQLite (default: NANOBANANO_PROMPTS_PATH)")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics.start_exporters_from_env()
+    backend = (os.getenv("NANOBANANO_TRANSLATOR_BACKEND") or "glossary,google").strip()
+    service = PromptService(
+        PromptManager(args.prompts),
+        translator=create_translator(backend) if TRANSLATION_ENABLED_DEFAULT else None,
+    )
+    try:
+        asyncio.run(PromptServer(service).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        service.recorder.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
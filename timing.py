@@ -0,0 +1,260 @@
+"""Per-stage timing of the generate pipeline (кнопка 🍌, build_prompt, перевод).
+
+Streamlit-free. Один `Trace` на клик: этапы накапливают время через
+`with trace.span("generate"):` или `trace.add(stage, seconds)`, в конце
+`finish()` отдаёт запись {name, at, total_ms, stages: {stage: ms}, counts, meta}
+во все sinks:
+
+- `log`  — одна строка INFO в logger "timing"
+- `ring` — последние N записей в памяти процесса (app.py показывает их
+  в «Дополнительно»: этапы последнего клика + p50/p95 по процессу)
+- `prom` — гистограмма `nanobanano_generate_stage_seconds{stage=...}` в реестре
+  metrics.py; в файл / на `/metrics` её выгружают экспортёры metrics.py
+  (NANOBANANO_METRICS_TEXTFILE, NANOBANANO_METRICS_PORT), не сам клик
+
+Sinks выбираются NANOBANANO_TIMING_SINKS ("ring" по умолчанию, "off" — выключить),
+свои: register_timing_sink(name, factory). В записях только имена этапов,
+длительности и id промпта — никаких пользовательских текстов.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from metrics import Histogram, histogram
+
+logger = logging.getLogger(__name__)
+
+# Stage names used by build_prompt / translate_fields / app.py.
+STAGE_UPLOAD_VALIDATION = "upload_validation"
+STAGE_NORMALIZE = "normalize_special_vars"
+STAGE_TRANSLATE = "translate"
+STAGE_TRANSLATE_CACHE = "translate.cache"
+STAGE_TRANSLATE_QUEUE = "translate.queue"
+STAGE_TRANSLATE_NETWORK = "translate.network"
+STAGE_GENERATE = "generate"
+STAGE_CLEANUP = "cleanup"
+STAGE_NEGATIVE = "negative"
+STAGE_HISTORY = "history"
+STAGE_USAGE = "usage"
+
+# Histogram buckets of the "prom" sink, seconds.
+PROM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGE_SECONDS = histogram(
+    "nanobanano_generate_stage_seconds", "Time spent per generate pipeline stage.", ("stage",), buckets=PROM_BUCKETS
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        raw = (os.getenv(name) or "").strip()
+        return int(raw) if raw else int(default)
+    except Exception:
+        return int(default)
+
+
+class _Span:
+    __slots__ = ("_trace", "_stage", "_t0")
+
+    def __init__(self, trace: "Trace", stage: str):
+        self._trace = trace
+        self._stage = stage
+
+    def __enter__(self) -> None:
+        self._t0 = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        self._trace.add(self._stage, time.perf_counter() - self._t0)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """Accumulates seconds per stage for one pipeline run (one thread writes, `add` is locked)."""
+
+    enabled = True
+
+    def __init__(self, name: str = "generate", meta: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.meta: Dict[str, str] = dict(meta or {})
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def span(self, stage: str) -> Any:
+        return _Span(self, stage)
+
+    def add(self, stage: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + max(0.0, float(seconds))
+            self.counts[stage] = self.counts.get(stage, 0) + int(count)
+
+    def finish(self) -> Dict[str, Any]:
+        total = time.perf_counter() - self._t0
+        with self._lock:
+            stages = {k: round(v * 1000.0, 3) for k, v in self.stages.items()}
+            counts = dict(self.counts)
+        return {
+            "name": self.name,
+            "at": time.time(),
+            "total_ms": round(total * 1000.0, 3),
+            "stages": stages,
+            "counts": counts,
+            "meta": dict(self.meta),
+        }
+
+
+class NullTrace(Trace):
+    """No-op trace: the default for callers that do not measure (CLI, HTTP, benchmarks)."""
+
+    enabled = False
+
+    def __init__(self) -> None:
+        super().__init__("null")
+
+    def span(self, stage: str) -> Any:
+        return _NULL_SPAN
+
+    def add(self, stage: str, seconds: float, count: int = 1) -> None:
+        return None
+
+
+NULL_TRACE = NullTrace()
+
+
+# ---- sinks ----
+
+
+class TimingSink:
+    """Receives finished trace records. `emit` must not raise into the UI."""
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class LogSink(TimingSink):
+    def __init__(self, log: Optional[logging.Logger] = None):
+        self.log = log or logging.getLogger("timing")
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        stages = " ".join(f"{k}={v:.1f}ms" for k, v in sorted(record.get("stages", {}).items()))
+        self.log.info(
+            "%s total=%.1fms %s prompt=%s",
+            record.get("name"), record.get("total_ms", 0.0), stages, record.get("meta", {}).get("prompt_id", "-"),
+        )
+
+
+class RingBufferSink(TimingSink):
+    """Last `maxlen` records of the process (thread-safe)."""
+
+    def __init__(self, maxlen: int = 200):
+        self._records: deque = deque(maxlen=max(1, int(maxlen)))
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{stage: {count, p50_ms, p95_ms}} over the buffered records ("total" = whole run)."""
+        by_stage: Dict[str, List[float]] = {}
+        for rec in self.records():
+            by_stage.setdefault("total", []).append(float(rec.get("total_ms", 0.0)))
+            for stage, ms in rec.get("stages", {}).items():
+                by_stage.setdefault(stage, []).append(float(ms))
+        out: Dict[str, Dict[str, float]] = {}
+        for stage, values in by_stage.items():
+            values.sort()
+            out[stage] = {
+                "count": len(values),
+                "p50_ms": values[(len(values) - 1) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            }
+        return out
+
+
+class MetricsSink(TimingSink):
+    """Observes stage durations into the `metrics` histogram STAGE_SECONDS (exported by metrics.py)."""
+
+    def __init__(self, hist: Optional[Histogram] = None):
+        self.hist = hist or STAGE_SECONDS
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        self.hist.observe(float(record.get("total_ms", 0.0)) / 1000.0, stage="total")
+        for stage, ms in record.get("stages", {}).items():
+            self.hist.observe(float(ms) / 1000.0, stage=stage)
+
+
+def emit(record: Dict[str, Any], sinks: Iterable[TimingSink]) -> None:
+    """Send a finished record to every sink; a failing sink never breaks the caller."""
+    for sink in sinks:
+        try:
+            sink.emit(record)
+        except Exception as e:
+            logger.warning("Timing sink %s failed (%s)", type(sink).__name__, type(e).__name__)
+
+
+# ---- sink registry (same shape as translation.register_translator_backend) ----
+
+TimingSinkFactory = Callable[[], Optional[TimingSink]]
+
+_SINK_FACTORIES: Dict[str, TimingSinkFactory] = {}
+
+
+def register_timing_sink(name: str, factory: TimingSinkFactory) -> None:
+    """Register a sink factory. The factory returns a sink or None if unavailable."""
+    key = (name or "").strip().lower()
+    if not key:
+        raise ValueError("Timing sink name must be non-empty")
+    _SINK_FACTORIES[key] = factory
+
+
+def available_timing_sinks() -> List[str]:
+    return sorted(_SINK_FACTORIES)
+
+
+def create_timing_sinks(spec: str) -> List[TimingSink]:
+    """Sinks from a spec like "ring" or "ring,log,prom"; "off"/"" → []. Unknown names are skipped."""
+    sinks: List[TimingSink] = []
+    for name in (spec or "").split(","):
+        key = name.strip().lower()
+        if not key or key in {"off", "none", "0"}:
+            continue
+        factory = _SINK_FACTORIES.get(key)
+        if factory is None:
+            logger.warning("Unknown timing sink '%s'", key)
+            continue
+        try:
+            sink = factory()
+        except Exception as e:
+            logger.warning("Timing sink '%s' failed to initialize (%s)", key, type(e).__name__)
+            sink = None
+        if sink is not None:
+            sinks.append(sink)
+    return sinks
+
+
+register_timing_sink("log", LogSink)
+register_timing_sink("ring", lambda: RingBufferSink(_env_int("NANOBANANO_TIMING_RING_SIZE", 200)))
+register_timing_sink("prom", MetricsSink)
@@ -0,0 +1,822 @@
+"""RU→EN translation helpers shared across Streamlit sessions.
+
+Streamlit-free on purpose: app.py wires these objects into `st.cache_resource`,
+other entry points can use them directly.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Executor, wait as futures_wait
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from metrics import Sample, counter, histogram
+from timing import NULL_TRACE, STAGE_TRANSLATE_CACHE, STAGE_TRANSLATE_NETWORK, STAGE_TRANSLATE_QUEUE, Trace
+
+
+logger = logging.getLogger(__name__)
+
+# Generated by scripts/prewarm_translations.py; loaded by the glossary backend.
+DEFAULT_PHRASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translations_en.json")
+
+
+CACHE_REQUESTS = counter(
+    "nanobanano_translate_cache_requests_total", "Translation cache lookups by result (hit/miss).", ("result",)
+)
+SEMAPHORE_WAIT = histogram(
+    "nanobanano_translate_semaphore_wait_seconds", "Wait for the translator concurrency semaphore."
+)
+OVERLOADED = counter(
+    "nanobanano_translate_overloaded_total", "Translator jobs skipped: semaphore not acquired in time."
+)
+TRANSLATE_SECONDS = histogram(
+    "nanobanano_translate_request_seconds", "Translator call duration (one batch or field) by result.", ("result",)
+)
+TRANSLATE_TIMEOUTS = counter(
+    "nanobanano_translate_budget_exceeded_total", "Translator jobs abandoned at the global time budget."
+)
+
+_SPACE_RUN_RE = re.compile(r"[ \t\r\f\v]+")
+_CYRILLIC_RE = re.compile(r"[А-Яа-яЁё]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+
+
+def normalize_translate_cache_key(text: str) -> str:
+    """Нормализует текст для ключа кэша перевода (консервативно).
+
+    - strip()
+    - нормализует переносы строк в \\n
+    - схлопывает пробелы/табы внутри строк (не трогая границы строк)
+    """
+    raw = "" if text is None else str(text)
+    raw = unicodedata.normalize("NFKC", raw)
+    raw = raw.replace("\r\n", "\n").replace("\r", "\n").strip()
+    if not raw:
+        return ""
+    lines = raw.split("\n")
+    lines = [_SPACE_RUN_RE.sub(" ", line.strip()) for line in lines]
+    return "\n".join(lines)
+
+
+def _approx_utf8_size(s: str) -> int:
+    try:
+        return len((s or "").encode("utf-8", errors="ignore"))
+    except Exception:
+        return len(s or "")
+
+
+class TranslationCache:
+    """Process-wide, thread-safe LRU cache for translations.
+
+    Caps:
+      - ttl_sec: entries older than this are treated as missing (0 => no expiry)
+      - max_entries / max_bytes: in-memory LRU limits (approximate UTF-8 size of key+value)
+
+    Optional SQLite backing (`path`) keeps translations across restarts and lets
+    several worker processes on one host share them. Disk I/O is best-effort:
+    any sqlite error degrades to memory-only behaviour for that call.
+
+    Locking: `_lock` guards only the in-memory LRU; the SQLite connection has
+    its own `_db_lock`, so a slow disk (or another process holding the
+    database) never blocks memory hits.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_sec: float = 3600,
+        max_entries: int = 256,
+        max_bytes: int = 2_000_000,
+        path: str = "",
+        disk_max_entries: int = 50_000,
+    ):
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk_max_entries = max(1, int(disk_max_entries))
+
+        self._lock = threading.Lock()
+        # key -> (value, created_at wall-clock); insertion order == LRU order.
+        self._mem: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+
+        self._db_lock = threading.Lock()
+        self._puts_since_prune = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = self._open_db(path)
+
+    # ---- disk backing ----
+
+    def _open_db(self, path: str) -> Optional[sqlite3.Connection]:
+        try:
+            db = sqlite3.connect(path, timeout=1.0, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS translations_created ON translations(created)")
+        except sqlite3.Error as e:
+            logger.warning("Translation cache: disk backing disabled (%s)", type(e).__name__)
+            return None
+        self._prune_db(db)
+        return db
+
+    def _prune_db(self, db: sqlite3.Connection) -> None:
+        try:
+            if self.ttl_sec:
+                db.execute("DELETE FROM translations WHERE created < ?", (time.time() - self.ttl_sec,))
+            db.execute(
+                "DELETE FROM translations WHERE key IN ("
+                "SELECT key FROM translations ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,),
+            )
+        except sqlite3.Error as e:
+            logger.debug("Translation cache: prune failed (%s)", type(e).__name__)
+
+    def _db_get(self, key: str) -> Optional[Tuple[str, float]]:
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute("SELECT value, created FROM translations WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.debug("Translation cache: read failed (%s)", type(e).__name__)
+            return None
+        if not row or not isinstance(row[0], str):
+            return None
+        return row[0], float(row[1])
+
+    def _db_put(self, key: str, value: str, created: float) -> None:
+        if self._db is None:
+            return
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO translations(key, value, created) VALUES (?, ?, ?)",
+                    (key, value, created),
+                )
+            except sqlite3.Error as e:
+                logger.debug("Translation cache: write failed (%s)", type(e).__name__)
+                return
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= 256:
+                self._puts_since_prune = 0
+                self._prune_db(self._db)
+
+    # ---- memory LRU ----
+
+    def _expired(self, created: float, now: float) -> bool:
+        return bool(self.ttl_sec) and (now - created) > self.ttl_sec
+
+    def _mem_insert(self, key: str, value: str, created: float) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._bytes -= _approx_utf8_size(key) + _approx_utf8_size(old[0])
+        self._mem[key] = (value, created)
+        self._bytes += _approx_utf8_size(key) + _approx_utf8_size(value)
+
+        # Evict oldest entries until within caps.
+        while self._mem and (len(self._mem) > self.max_entries or self._bytes > self.max_bytes):
+            old_key, (old_val, _) = self._mem.popitem(last=False)
+            self._bytes -= _approx_utf8_size(old_key) + _approx_utf8_size(old_val)
+        self._bytes = max(0, self._bytes)
+
+    def get(self, key: str) -> Optional[str]:
+        if not isinstance(key, str) or not key:
+            return None
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if self._expired(hit[1], now):
+                    self._mem.pop(key, None)
+                    self._bytes = max(0, self._bytes - _approx_utf8_size(key) - _approx_utf8_size(hit[0]))
+                else:
+                    # Refresh LRU order.
+                    self._mem.move_to_end(key)
+                    CACHE_REQUESTS.inc(result="hit")
+                    return hit[0]
+
+        disk = self._db_get(key)
+        if disk is None or self._expired(disk[1], now):
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        with self._lock:
+            # A concurrent put() may have stored a newer value meanwhile; keep it.
+            hit = self._mem.get(key)
+            if hit is None or hit[1] < disk[1]:
+                self._mem_insert(key, disk[0], disk[1])
+        CACHE_REQUESTS.inc(result="hit")
+        return disk[0]
+
+    def put(self, key: str, value: str) -> None:
+        if not isinstance(key, str) or not key or not isinstance(value, str):
+            return
+        created = time.time()
+        with self._lock:
+            self._mem_insert(key, value, created)
+        self._db_put(key, value, created)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._bytes = 0
+        if self._db is not None:
+            with self._db_lock:
+                try:
+                    self._db.execute("DELETE FROM translations")
+                except sqlite3.Error:
+                    pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._mem), "bytes": int(self._bytes), "disk": int(self._db is not None)}
+
+    def metric_samples(self, **labels: str) -> List[Sample]:
+        """Collector for metrics.register_collector: entries/bytes of the in-memory LRU."""
+        st = self.stats()
+        return [
+            Sample("nanobanano_translate_cache_entries", "gauge", "Translation cache entries in memory.", labels, st["entries"]),
+            Sample("nanobanano_translate_cache_bytes", "gauge", "Translation cache size in memory (approx. UTF-8 bytes).", labels, st["bytes"]),
+        ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._mem)
+
+
+# ---- batched translation ----
+#
+# Several fields of one form are packed into a single translator request,
+# separated by a delimiter line the translator leaves untouched, and split back.
+# If the split does not yield exactly one segment per field, fall back to
+# per-field calls.
+
+BATCH_DELIMITER = "\n|||\n"
+_BATCH_SPLIT_RE = re.compile(r"\s*\|\|\|\s*")
+
+
+def pack_batch(texts: Sequence[str]) -> str:
+    return BATCH_DELIMITER.join(texts)
+
+
+def split_batch(joined: Any, n: int) -> Optional[List[str]]:
+    """Split a translated batch back into `n` segments; None if the shape is off."""
+    if not isinstance(joined, str):
+        return None
+    parts = [p.strip() for p in _BATCH_SPLIT_RE.split(joined.strip())]
+    if len(parts) != n or any(not p for p in parts):
+        return None
+    return parts
+
+
+def plan_batches(texts: Sequence[str], max_chars: int) -> List[List[int]]:
+    """Group text indices into batches whose packed size stays within max_chars.
+
+    Texts that contain the delimiter themselves always go alone.
+    """
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_len = 0
+    for i, t in enumerate(texts):
+        if "|||" in t:
+            batches.append([i])
+            continue
+        add = len(t) + (len(BATCH_DELIMITER) if cur else 0)
+        if cur and cur_len + add > max_chars:
+            batches.append(cur)
+            cur, cur_len = [], 0
+            add = len(t)
+        cur.append(i)
+        cur_len += add
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def translate_many(tr: Any, texts: Sequence[str], *, batch: bool = True) -> List[str]:
+    """Translate `texts` with as few translator round trips as possible.
+
+    Backends with `supports_batch = True` get the list as is; others get a
+    delimiter-joined request. Network/translator exceptions propagate; only a
+    failed split falls back to one call per text.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    if getattr(tr, "supports_batch", False):
+        return list(tr.translate_batch(texts))
+    if len(texts) == 1:
+        return [tr.translate(texts[0])]
+
+    if batch:
+        parts = split_batch(tr.translate(pack_batch(texts)), len(texts))
+        if parts is not None:
+            return parts
+        logger.info("Batched translation split failed (%d fields); falling back to per-field calls", len(texts))
+
+    return [tr.translate(t) for t in texts]
+
+
+# ---- form fields → EN ----
+#
+# The orchestration the Generate button runs: pick the fields worth translating,
+# dedupe them, serve what the cache has, and send the rest in batches with a
+# concurrency cap and one global time budget. Streamlit-free: the caller passes
+# the executor/semaphore/cache and a `notice` callback for user-facing messages.
+
+_CHOICE_LABEL_RES = (
+    re.compile(r"Optional:\s*(.*?)\s*\((.*?)\)\s*$"),
+    re.compile(r"Выберите:\s*(.*?)\s*\((.*?)\)\s*$"),
+)
+# Free-text fields are intentionally multilingual (text rendered on the image).
+UNTRANSLATED_FIELDS = frozenset({"text", "text_content"})
+
+
+def has_cyrillic(s: str) -> bool:
+    return bool(_CYRILLIC_RE.search(s))
+
+
+def unwrap_choice_label(raw: str) -> str:
+    """'Optional: мягкий (soft)' / 'Выберите: ... (...)' → значение без UI-обёртки."""
+    for prefix, rx in zip(("Optional:", "Выберите:"), _CHOICE_LABEL_RES):
+        if raw.startswith(prefix) and "(" in raw and raw.endswith(")"):
+            m = rx.match(raw)
+            if m:
+                raw = m.group(1).strip() or raw
+    return raw
+
+
+def _no_notice(msg: str) -> None:
+    pass
+
+
+def translate_fields(
+    user_inputs: Mapping[str, Any],
+    tr: Any,
+    *,
+    executor: Executor,
+    semaphore: Optional[threading.Semaphore] = None,
+    cache: Optional[TranslationCache] = None,
+    enabled: bool = True,
+    max_chars: int = 4000,
+    max_concurrency: int = 1,
+    acquire_timeout: float = 0.1,
+    budget_sec: float = 2.0,
+    batch: bool = True,
+    notice: Callable[[str], None] = _no_notice,
+    counters: Optional[Dict[str, int]] = None,
+    trace: Trace = NULL_TRACE,
+) -> Tuple[dict, List[str]]:
+    """Translate all eligible fields RU->EN with a global time budget to avoid N*timeout stalls.
+
+    Returns (inputs with translated values, names of fields that fell back to the original).
+    `tr` may be None (translator unavailable). `counters` gets translate_calls /
+    translate_chars added (usage metadata). `trace` gets translate.cache (lookups),
+    translate.queue (semaphore + executor wait) and translate.network (translator call)
+    seconds; the network/queue parts of jobs cut off by the budget are not counted.
+    """
+    i_en: dict = {}
+    fallback_keys: List[str] = []
+
+    # Collect translation tasks keyed by cache_key (dedupe within the run).
+    key_order: List[str] = []
+    field_to_key: dict = {}
+    key_to_raw: dict = {}
+    key_to_var: dict = {}
+
+    cache_hits = 0
+
+    for k, v in (user_inputs or {}).items():
+        sv = "" if v is None else str(v)
+
+        if k in UNTRANSLATED_FIELDS:
+            i_en[k] = v
+            continue
+
+        # Don't translate file placeholders.
+        if sv.startswith("[") and ("FILE" in sv or "ATTACHED" in sv):
+            i_en[k] = v
+            continue
+
+        # Enum-like values: keep the chosen option stable.
+        raw = unwrap_choice_label(sv)
+
+        # URL-like values should not be translated.
+        s = raw.strip().lower()
+        if s.startswith(("http://", "https://", "www.")) or not raw:
+            i_en[k] = v
+            continue
+
+        # No translation needed.
+        if not has_cyrillic(raw) or not enabled:
+            i_en[k] = v
+            continue
+
+        if len(raw) > max_chars:
+            notice(f"Перевод пропущен: поле '{k}' слишком длинное ({len(raw)} символов, лимит {max_chars}).")
+            i_en[k] = v
+            fallback_keys.append(k)
+            continue
+
+        cache_key = normalize_translate_cache_key(raw)
+        cached = None
+        if cache is not None:
+            t0 = time.perf_counter()
+            cached = cache.get(cache_key)
+            trace.add(STAGE_TRANSLATE_CACHE, time.perf_counter() - t0)
+        if cached is not None:
+            cache_hits += 1
+            i_en[k] = cached
+            continue
+
+        # Defer translation; we'll submit with a global budget below.
+        field_to_key[k] = cache_key
+        key_to_var.setdefault(cache_key, k)
+        key_to_raw.setdefault(cache_key, raw)
+        if cache_key not in key_order:
+            key_order.append(cache_key)
+
+    if trace.enabled:
+        trace.meta["translate_cache_hits"] = str(cache_hits)
+        trace.meta["translate_cache_misses"] = str(len(key_order))
+    if not key_order:
+        return i_en, fallback_keys
+
+    if tr is None:
+        for k in field_to_key:
+            fallback_keys.append(k)
+        notice("Перевод пропущен: переводчик не доступен.")
+        for k, v in (user_inputs or {}).items():
+            i_en.setdefault(k, v)
+        return i_en, fallback_keys
+
+    deadline = time.monotonic() + float(budget_sec)
+    max_inflight = max(1, int(max_concurrency))
+
+    # Jobs: lists of cache keys sent in one translator request (batch mode)
+    # or one key per job (per-field mode).
+    if batch and len(key_order) > 1:
+        jobs = [[key_order[i] for i in b] for b in plan_batches(key_order, max_chars)]
+    else:
+        jobs = [[key] for key in key_order]
+
+    results: dict = {}  # cache_key -> (translated, ok)
+
+    inflight: dict = {}  # job index -> future
+    idx = 0
+
+    def _make_release_cb() -> Callable[[Any], None]:
+        released = {"v": False}
+
+        def _cb(_fut: Any = None) -> None:
+            if released["v"] or semaphore is None:
+                return
+            released["v"] = True
+            try:
+                semaphore.release()
+            except Exception:
+                pass
+
+        return _cb
+
+    def _timed_job(keys: list, submitted: float) -> List[str]:
+        # Runs on the executor thread: queue = submit → start, network = the translator call.
+        started = time.perf_counter()
+        result = "error"
+        try:
+            out = translate_many(tr, keys, batch=batch)
+            result = "ok"
+            return out
+        finally:
+            elapsed = time.perf_counter() - started
+            TRANSLATE_SECONDS.observe(elapsed, result=result)
+            trace.add(STAGE_TRANSLATE_QUEUE, started - submitted)
+            trace.add(STAGE_TRANSLATE_NETWORK, elapsed)
+
+    def _fields(keys: list) -> str:
+        return ", ".join(f"'{key_to_var.get(k, '?')}'" for k in keys)
+
+    while time.monotonic() < deadline and (idx < len(jobs) or inflight):
+        # Fill inflight up to concurrency.
+        while idx < len(jobs) and len(inflight) < max_inflight and time.monotonic() < deadline:
+            job_idx = idx
+            keys = jobs[idx]
+            idx += 1
+
+            t_acquire = time.perf_counter()
+            acquired = semaphore is None or semaphore.acquire(timeout=acquire_timeout)
+            waited = time.perf_counter() - t_acquire
+            trace.add(STAGE_TRANSLATE_QUEUE, waited, count=0)
+            if semaphore is not None:
+                SEMAPHORE_WAIT.observe(waited)
+            if not acquired:
+                OVERLOADED.inc()
+                # Overloaded: fall back for these keys.
+                for key in keys:
+                    results[key] = (key_to_raw.get(key, ""), False)
+                notice(f"Перевод пропущен: переводчик перегружен (поле {_fields(keys)}).")
+                continue
+
+            # Usage counters are metadata-only; ignore failures.
+            try:
+                if isinstance(counters, dict):
+                    counters["translate_calls"] = int(counters.get("translate_calls", 0)) + 1
+                    counters["translate_chars"] = int(counters.get("translate_chars", 0)) + sum(
+                        len(key_to_raw.get(key, "")) for key in keys
+                    )
+            except Exception:
+                pass
+
+            fut = executor.submit(_timed_job, keys, time.perf_counter())
+            fut.add_done_callback(_make_release_cb())
+            inflight[job_idx] = fut
+
+        if not inflight:
+            break
+
+        remaining = max(0.0, deadline - time.monotonic())
+        done, _ = futures_wait(list(inflight.values()), timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+
+        for job_idx, fut in list(inflight.items()):
+            if fut not in done:
+                continue
+            keys = jobs[job_idx]
+            try:
+                translated_list = fut.result()
+                for key, translated in zip(keys, translated_list):
+                    if isinstance(translated, str) and translated.strip():
+                        if cache is not None:
+                            cache.put(key, translated)
+                        results[key] = (translated, True)
+                    else:
+                        results[key] = (key_to_raw.get(key, ""), False)
+                        notice(f"Перевод не удался: пустой ответ (поле '{key_to_var.get(key, '?')}').")
+            except Exception as e:
+                for key in keys:
+                    results[key] = (key_to_raw.get(key, ""), False)
+                notice(f"Перевод не удался для поля {_fields(keys)}: {type(e).__name__}. Используется исходный текст.")
+            inflight.pop(job_idx, None)
+
+    # Global budget expired: cancel inflight and fall back.
+    for job_idx, fut in list(inflight.items()):
+        try:
+            fut.cancel()
+        except Exception:
+            pass
+        keys = jobs[job_idx]
+        TRANSLATE_TIMEOUTS.inc()
+        for key in keys:
+            results.setdefault(key, (key_to_raw.get(key, ""), False))
+        notice(f"Перевод превысил таймаут для поля {_fields(keys)}. Используется исходный текст.")
+
+    # Fill outputs for fields that were deferred.
+    for field, key in field_to_key.items():
+        translated, ok = results.get(key, (key_to_raw.get(key, ""), False))
+        i_en[field] = translated
+        if not ok and has_cyrillic(key_to_raw.get(key, "")):
+            fallback_keys.append(field)
+
+    # Preserve non-translated fields that might not have been set above.
+    for k, v in (user_inputs or {}).items():
+        i_en.setdefault(k, v)
+
+    return i_en, fallback_keys
+
+
+# ---- translator backends ----
+#
+# A backend is any object with `translate(text) -> str` (deep_translator's
+# GoogleTranslator qualifies as is). Backends may also expose
+# `translate_batch(texts) -> list` with `supports_batch = True`.
+# An empty string means "no translation" and is treated as a failure upstream.
+
+
+class TranslatorBackend:
+    """Base class for local translator backends."""
+
+    name = "base"
+    supports_batch = False
+
+    def translate(self, text: str) -> str:
+        raise NotImplementedError
+
+    def translate_batch(self, texts: Sequence[str]) -> List[str]:
+        return [self.translate(t) for t in texts]
+
+
+def _glossary_key(text: str) -> str:
+    return normalize_translate_cache_key(text).casefold()
+
+
+class GlossaryTranslator(TranslatorBackend):
+    """Offline phrase-table translator (no network, deterministic).
+
+    Looks up the whole normalized value first, then each comma-separated part;
+    returns "" unless every part is known.
+    """
+
+    name = "glossary"
+    supports_batch = True
+
+    def __init__(self, phrases: Optional[Mapping[str, str]] = None):
+        self._phrases: Dict[str, str] = {}
+        self.update(phrases or {})
+
+    def update(self, phrases: Mapping[str, str]) -> None:
+        for ru, en in phrases.items():
+            if isinstance(ru, str) and isinstance(en, str) and ru.strip() and en.strip():
+                self._phrases[_glossary_key(ru)] = en.strip()
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    def lookup(self, text: str) -> Optional[str]:
+        return self._phrases.get(_glossary_key(text))
+
+    def translate(self, text: str) -> str:
+        hit = self.lookup(text)
+        if hit is not None:
+            return hit
+        parts = [p for p in (x.strip() for x in str(text or "").split(",")) if p]
+        if len(parts) < 2:
+            return ""
+        out = []
+        for p in parts:
+            hit = self.lookup(p)
+            if hit is None:
+                return ""
+            out.append(hit)
+        return ", ".join(out)
+
+    def translate_batch(self, texts: Sequence[str]) -> List[str]:
+        return [self.translate(t) for t in texts]
+
+
+class ChainTranslator(TranslatorBackend):
+    """Tries backends in order; texts left untranslated go to the next one."""
+
+    name = "chain"
+    supports_batch = True
+
+    def __init__(self, backends: Sequence[Any]):
+        self.backends = [b for b in backends if b is not None]
+
+    def translate(self, text: str) -> str:
+        return self.translate_batch([text])[0]
+
+    def translate_batch(self, texts: Sequence[str]) -> List[str]:
+        out = [""] * len(texts)
+        pending = list(range(len(texts)))
+        for backend in self.backends:
+            if not pending:
+                break
+            got = translate_many(backend, [texts[i] for i in pending])
+            still = []
+            for i, val in zip(pending, got):
+                if isinstance(val, str) and val.strip():
+                    out[i] = val
+                else:
+                    still.append(i)
+            pending = still
+        return out
+
+
+def split_enum_option(option: str) -> Optional[Tuple[str, str]]:
+    """'Слабая (Low)' -> ('Слабая (Low)', 'Low').
+
+    Only the "RU (EN)" form has a complete EN value. "EN (RU)" options such as
+    '16mm (Очень широкий)' return None: the head alone would drop the RU
+    description, so they go to the phrase table / next backend instead.
+    """
+    m = re.match(r"^\s*(.*?)\s*\((.*?)\)\s*$", option or "")
+    if not m:
+        return None
+    head, tail = m.group(1), m.group(2)
+    if _CYRILLIC_RE.search(head) and _LATIN_RE.search(tail) and not _CYRILLIC_RE.search(tail):
+        return option, tail
+    return None
+
+
+def glossary_from_ui_tables(
+    enum_options: Mapping[str, Iterable[str]],
+    presets: Optional[Mapping[str, Iterable[str]]] = None,
+) -> Dict[str, str]:
+    """Build RU→EN phrases from the UI enum options (and presets).
+
+    Enum options carry their own EN label ("Слабая (Low)"). Presets are
+    already English and need no entry; a preset in the same "RU (EN)" form
+    is added with its EN part. Cyrillic text without an EN value is never
+    mapped to itself: it must reach a real backend (or the fallback notice).
+    """
+    phrases: Dict[str, str] = {}
+    for options in (enum_options or {}).values():
+        for opt in options or []:
+            pair = split_enum_option(str(opt))
+            if pair:
+                phrases[pair[0]] = pair[1]
+                # The bare RU label ("Слабая") maps to the same EN value.
+                head = re.sub(r"\s*\(.*\)\s*$", "", pair[0]).strip()
+                if _CYRILLIC_RE.search(head):
+                    phrases.setdefault(head, pair[1])
+    for values in (presets or {}).values():
+        for v in values or []:
+            pair = split_enum_option(v) if isinstance(v, str) else None
+            if pair:
+                phrases.setdefault(pair[0], pair[1])
+    return phrases
+
+
+def load_phrase_file(path: str) -> Dict[str, str]:
+    """Read a {ru: en} JSON phrase table; missing/invalid file -> {}."""
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Phrase table '%s' could not be loaded (%s)", path, type(e).__name__)
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {k: v for k, v in data.items() if isinstance(k, str) and isinstance(v, str)}
+
+
+TranslatorFactory = Callable[[], Any]
+
+_TRANSLATOR_FACTORIES: Dict[str, TranslatorFactory] = {}
+
+
+def register_translator_backend(name: str, factory: TranslatorFactory) -> None:
+    """Register a backend factory. The factory returns a translator or None if unavailable."""
+    key = (name or "").strip().lower()
+    if not key:
+        raise ValueError("Translator backend name must be non-empty")
+    _TRANSLATOR_FACTORIES[key] = factory
+
+
+def available_translator_backends() -> List[str]:
+    return sorted(_TRANSLATOR_FACTORIES)
+
+
+def create_translator(spec: str) -> Any:
+    """Create a translator from a spec like "google" or "glossary,google" (chain).
+
+    Unknown or unavailable backends are skipped; returns None if nothing is left.
+    """
+    backends = []
+    for name in (spec or "").split(","):
+        key = name.strip().lower()
+        if not key:
+            continue
+        factory = _TRANSLATOR_FACTORIES.get(key)
+        if factory is None:
+            logger.warning("Unknown translator backend '%s'", key)
+            continue
+        try:
+            backend = factory()
+        except Exception as e:
+            logger.warning("Translator backend '%s' failed to initialize (%s)", key, type(e).__name__)
+            backend = None
+        if backend is not None:
+            backends.append(backend)
+    if not backends:
+        return None
+    if len(backends) == 1:
+        return backends[0]
+    return ChainTranslator(backends)
+
+
+def _google_factory() -> Any:
+    try:
+        from deep_translator import GoogleTranslator
+    except Exception:
+        return None
+    return GoogleTranslator(source="auto", target="en")
+
+
+def _glossary_factory() -> Any:
+    from catalog import PRESETS
+    from ui_tables import ENUM_OPTIONS
+
+    glossary = GlossaryTranslator(glossary_from_ui_tables(ENUM_OPTIONS, PRESETS))
+    glossary.update(load_phrase_file(DEFAULT_PHRASE_FILE))
+    glossary.update(load_phrase_file((os.getenv("NANOBANANO_TRANSLATE_GLOSSARY_PATH") or "").strip()))
+    return glossary
+
+
+register_translator_backend("google", _google_factory)
+register_translator_backend("glossary", _glossary_factory)
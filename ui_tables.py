@@ -0,0 +1,320 @@
+"""
+Таблицы UI-формы: подписи полей, подсказки, списки выбора, вложения.
+
+Вынесены из app.py, чтобы их можно было импортировать без Streamlit
+(офлайн-переводчик, батч-скрипты, прогрев кэша переводов).
+"""
+
+# --- B. LABELS & EXAMPLES (HUMANIZED RUSSIAN UI) ---
+
+VAR_MAP = {
+    # Common
+    "image_1": "Исходное изображение / Ссылка",
+    "image_2": "Референс / Второе изображение",
+    "aspect_ratio": "Формат (Пропорции)",
+    "background": "Фон / Стиль фона",
+    "background_type": "Тип фона (для мокапа)",
+    "environment": "Окружение",
+    "lighting": "Схема освещения",
+    "style": "Художественный стиль",
+    "colors": "Цветовая гамма",
+    
+    # People
+    "person": "Персонаж (описание)",
+    "person_image": "Фото человека",
+    "people_links": "Фото персонажей",
+    "emotion": "Желаемая эмоция",
+    "intensity": "Сила эмоции",
+    "camera_angle": "Ракурс камеры",
+    "action_description": "Поза / Действие",
+    
+    # Clothing / Products
+    "fabric_material": "Материал ткани",
+    "clothing_image": "Фото одежды (на вешалке/модели)",
+    "footwear_image": "Фото обуви",
+    "accessory_image": "Аксессуар (сумка/очки)",
+    "model_image": "Фото модели (База)",
+    
+    # Objects
+    "object": "Объект",
+    "placement_details": "Где разместить?",
+    "object_to_replace": "Что заменяем?",
+    "new_object": "На что заменяем?",
+    "element_1": "Фоновый объект / Сцена",
+    "element_2": "Вставляемый объект",
+    
+    # Tech / Design
+    "product": "Название товара",
+    "text": "Текст (Точно)",
+    "text_content": "Текст надписи",
+    "features_list": "Список преимуществ",
+    "object_type": "На какой предмет наносим?",
+    "print_finish": "Фактура нанесения",
+    "brand": "Бренд / Компания",
+    "imagery": "Символ / Графика",
+    "materials": "Материалы",
+    "screen_type": "Тип экрана",
+    
+    # Other
+    "scene_description": "Описание итоговой сцены",
+    "description": "Описание персонажа",
+    "platform": "Платформа",
+    "theme": "Тема",
+    "character": "Персонаж (референс)",
+    "lens_match_mode": "Режим сведения (Линзы)",
+    "target_object": "Поверхность нанесения",
+    "material_type": "Материал поверхности",
+    "application_style": "Способ нанесения (краска/вышивка)",
+    "character_description": "Внешность персонажа",
+    "activity": "Действие",
+    "lighting_condition": "Новое освещение",
+    "environment_description": "Описание окружения/фона",
+    
+    # Updated Items
+    "industry": "Индустрия / Ниша",
+    "font_style": "Стиль шрифта",
+    "medium": "Техника (Материал)",
+    "level": "Сила стилизации",
+    "labels_visibility": "Подписи (спереди/сбоку)",
+    "count": "Количество",
+    "list": "Список эмоций/поз",
+    "scene": "Описание сцены (Сюжет)",
+    "language": "Язык",
+    "layout": "Компоновка (Сетка)",
+    "action_sequence": "Последовательность действий",
+    "show_preview": "Режим превью (2x2)",
+    "room_type": "Тип комнаты",
+    "room": "Комната (фото/ссылка/описание)",
+    "building_type": "Тип здания",
+    "time": "Время суток / Погода",
+    "lens": "Объектив",
+    "background_color": "Цвет фона",
+    "type": "Тип (Фото/Иллюстрация)",
+    "expression": "Выражение лица (превью)",
+    "subject": "Главный объект",
+    "focus_stacking": "Глубина резкости (фокус-стекинг)",
+    "additional_details": "Дополнительные детали",
+}
+
+# -------------------------------------------------------------
+# GENERIC HINTS (Fallback)
+# -------------------------------------------------------------
+EXAMPLES_DB = {
+    # Common
+    "image_1": {"ph": "Ссылка или файл...", "help": "Основное изображение."},
+    "image_2": {"ph": "Ссылка или файл...", "help": "Референс стиля или объект."},
+    "aspect_ratio": {"ph": "9:16 (Сторис)...", "help": "Выберите формат."},
+    "background": {"ph": "современный офис, размытый фон", "help": "Примеры: белая циклорама, ночной город, стиль киберпанк."},
+    "style": {"ph": "фотореализм, 8k", "help": "Примеры: фотореализм, 3D-рендер, акварель, нуар."},
+    "lighting": {"ph": "мягкий свет, неон", "help": "Примеры: мягкий студийный свет, неоновый синий, золотой час."},
+    "object": {"ph": "красная машина, лампа", "help": "Какой именно объект удалить или добавить? Пиши конкретно."},
+    "text": {"ph": "SALE 50%", "help": "Текст должен быть написан ТОЧНО так, как нужно (без перевода)."},
+    "text_content": {"ph": "SALE, Love, 2025", "help": "Сам текст надписи. Соблюдай регистр."},
+    "materials": {"ph": "дерево, стекло", "help": "Материалы объекта."},
+}
+
+# -------------------------------------------------------------
+# SPECIFIC OVERRIDES (МАТРИЦА УМНЫХ ПОДСКАЗОК)
+# -------------------------------------------------------------
+SPECIFIC_HINTS = {
+    "studio_portrait": { # 03
+        "background": {"ph": "белая циклорама, цветной фон", "help": "Фон: однотонный, размытый лофт, текстура бумаги."},
+        "lighting": {"ph": "Rembrandt, softbox", "help": "Схемы света: Рембрандт, бабочка (butterfly), мягкий софтбокс."},
+    },
+    "background_change": { # 04
+        "background": {"ph": "париж, пляж, офис", "help": "Новый фон: Эйфелева башня, пляж на закате, современный офис."}
+    },
+    "expression_change": { # 06
+        "emotion": {"ph": "радость, гнев", "help": "Эмоции: страх, радость, удивление, гнев, восторг."}
+    },
+    "pose_change": { # 07
+        "action_description": {"ph": "бежит, сидит на стуле", "help": "Что делает персонаж? (прыгает, танцует, скрестил руки)."}
+    },
+    "camera_angle_change": { # 08
+        "camera_angle": {
+            "ph": "top-down 90° overhead", 
+            "help": "ВАЖНО: Для вида строго сверху пиши 'top-down 90° overhead'. Для вида сбоку: 'side view eye-level'. Снизу: 'low angle'."
+        }
+    },
+    "cloth_swap": { # 09
+        "fabric_material": {"ph": "кожа, шелк", "help": "Материал: оставить как на фото, кожа, бархат, шелк, хлопок."}
+    },
+    "object_addition": { # 11
+        "placement_details": {"ph": "на столе, в руке", "help": "Где разместить? Примеры: на столе справа, в левой руке, на заднем плане."}
+    },
+    "semantic_replacement": { # 12
+        "object_to_replace": {"ph": "старый диван, ваза", "help": "Что заменяем? Примеры: красная ваза, старое кресло, картина на стене."}
+    },
+    "scene_relighting": { # 13
+        "lighting_condition": {"ph": "закат, неон, лунный свет", "help": "Новый свет: золотой час, киберпанк неон, холодная ночь."}
+    },
+    "team_composite": { # 15
+        "activity": {"ph": "танцуют, совещание", "help": "Что делают люди? (идут, работают, празднуют, танцуют)."},
+        "environment": {"ph": "офис, сцена, парк", "help": "Где находятся люди? (Офис, сцена, пляж, улица)."},
+        "people_links": {"ph": "Ссылки или файлы...", "help": "Укажите несколько людей, до 5 человек."}
+    },
+    "scene_composite": { # 16
+        "scene_description": {"ph": "Медведь играет на гитаре в лесу", "help": "Опиши сюжет, который должен получиться."}
+    },
+    "product_card": { # 17
+        "product": {"ph": "Nike Air Max, iPhone 15", "help": "Название бренда и модели (Nike, Adidas, iPhone, Snickers)."},
+        "features_list": {"ph": "Водостойкий, 24ч батарея", "help": "Список преимуществ через запятую."}
+    },
+    "mockup_generation": { # 18
+        "object_type": {"ph": "кофейный стакан, футболка", "help": "Загрузи фото предмета (футболка, кружка) или опиши его словами."},
+        "background_type": {"ph": "деревянный стол, мрамор", "help": "На чем стоит предмет? (стол, бетон, цветной фон)."},
+        "print_finish": {"ph": "золотое тиснение, матовый", "help": "Фактура: вышивка, глянец, матовая бумага."},
+        "image_1": {"ph": "Загрузите файл...", "help": "Загрузите логотип, картинку или обложку, которую наносим."}
+    },
+    "environmental_text": { # 19
+        "environment_description": {"ph": "песчаный пляж, стена", "help": "Где написан текст? (песок, кирпичная стена, снег)."},
+        "target_object": {"ph": "песок, бетон, ткань", "help": "Поверхность: песок, футболка, асфальт."},
+        "material_type": {"ph": "песок, камень, хлопок", "help": "Материал поверхности: песок, бетон, деним."}
+    },
+    "knolling_photography": { # 20
+        "object": {"ph": "фототехника, инструменты", "help": "С каким именно объектом производим действия (предметы для раскладки)."}
+    },
+    "logo_creative": { # 21
+        "imagery": {"ph": "лев, молния, гора", "help": "Образ или символ для логотипа."}
+    },
+    "logo_stylization": { # 22
+        "materials": {"ph": "овощи, бумага, стекло", "help": "Из чего собран логотип? (фрукты, механизмы, сладости, бумага)."}
+    },
+    "ui_design": { # 23
+        "industry": {"ph": "Финтех, Бьюти, Еда", "help": "Ниша: Банкинг, Салон красоты, Доставка еды."},
+        "screen_type": {"ph": "Главный экран, Дашборд", "help": "Тип экрана: главный, лендинг, профиль."}
+    },
+    "text_design": { # 24
+        "font_style": {"ph": "Жирный, Рукописный", "help": "Шрифт. Примеры: Жирный Sans, Рукописный, Граффити."},
+        "colors": {"ph": "Черно-желтый, Пастель", "help": "Цвета: Черно-желтый, Пастель, Неон, Монохром."}
+    },
+    "image_restyling": { # 25 (art_style)
+        "medium": {"ph": "Масло, Карандаш, Вектор", "help": "Техника: Акварель, Гуашь, Маркеры, Пиксель-арт."}
+    },
+    "sketch_to_photo": { # 26
+        "materials": {"ph": "стекло, кожа, металл", "help": "Материалы для реализма: дерево, пластик, ткань."},
+        "lighting": {"ph": "студийный свет, закат", "help": "Примеры: мягкий свет, неон, закат, студийное освещение."}
+    },
+    "character_sheet": { # 27
+        "description": {"ph": "девушка киборг, рыжие волосы", "help": "Описание внешности персонажа."}
+    },
+    "sticker_pack": { # 28
+        "count": {"ph": "6, 9, 12", "help": "Сколько стикеров?"},
+        "list": {"ph": "смех, гнев, лайк", "help": "Список эмоций."}
+    },
+    "comic_page": { # 29
+        "scene": {"ph": "Детектив входит в комнату", "help": "Описание сцены (сюжет страницы)."},
+        "language": {"ph": "Английский, Русский", "help": "Язык текста в бабблах (если есть)."}
+    },
+    "storyboard_sequence": { # 30
+        "action_sequence": {"ph": "1. входит 2. смотрит 3. бежит", "help": "Примеры: 1. Просыпается 2. Пьет кофе 3. Выходит."},
+        "layout": {"ph": "сетка 2x3", "help": "Количество кадров, формат (напр. сетка 2x3, 3 горизонтальные панели)."}
+    },
+    "seamless_pattern": { # 31
+        "theme": {"ph": "тропические листья, геометрия", "help": "Тема узора."},
+        "colors": {"ph": "Пастель, Неон", "help": "Цвета: Пастель, Неон, Черно-белый, Золотой."}
+    },
+    "interior_design": { # 32
+        "materials": {"ph": "дуб, мрамор, бетон", "help": "Материалы отделки: дерево, камень, стекло, велюр."},
+        "room_type": {"ph": "Спальня, Кухня, Лофт", "help": "Тип помещения."}
+    },
+    "architecture_exterior": { # 33
+        "building_type": {"ph": "Вилла, Небоскреб", "help": "Тип здания."},
+        "time": {"ph": "солнечный день, туман", "help": "Погода и время суток."},
+        "environment": {"ph": "лес, центр города", "help": "Где стоит здание? (мегаполис, горы, пляж)."}
+    },
+    "isometric_room": { # 34
+        "background_color": {"ph": "белый, синий градиент", "help": "Цвет фона: белый, синий, градиент."}
+    },
+    "youtube_thumbnail": { # 35
+        "type": {"ph": "Влог, Обзор, Реакция", "help": "Тип видео: Влог, Обзор, Реакция."},
+        "expression": {"ph": "шок, радость", "help": "Эмоция на лице: шок, радость, крик."}
+    },
+    "cinematic_atmosphere": { # 36
+        "style": {"ph": "Нуар, Киберпанк, Уэс Андерсон", "help": "Киностиль: Тарантино, Неон, Винтаж 80х."}
+    },
+    "technical_blueprint": { # 37
+        "object": {"ph": "двигатель, кроссовок", "help": "Чертеж чего делаем? Примеры: двигатель, кроссовок, стул, смартфон."}
+    },
+    "anatomical_infographic": { # 39
+        "background": {"ph": "стиль Да Винчи, чертеж", "help": "Фон: старая бумага, медицинский плакат, грифельная доска."}
+    },
+    "macro_extreme": { # 40
+        "object": {"ph": "глаз, насекомое, капля", "help": "Объект макросъемки."}
+    }
+}
+
+# Списки выбора (РУССИФИЦИРОВАННЫЕ ДЛЯ UI)
+ENUM_OPTIONS = {
+    # ВАЖНО: Добавлен "Свой вариант (Custom)" в конце списка
+    "aspect_ratio": ["9:16 (Stories / Reels)", "16:9 (YouTube / TV)", "1:1 (Post / Square)", "4:5 (Portrait)", "3:2 (Photo)", "2:3 (Photo)", "Свой вариант (Custom)"],
+    "intensity": ["Слабая (Low)", "Средняя (Medium)", "Сильная (High)"],
+    "level": ["Легкая (Light)", "Средняя (Medium)", "Сильная (Strong)"],
+    "labels_visibility": ["Вкл (On)", "Выкл (Off)"],
+    "show_preview": ["Да (Превью 2x2)", "Нет (Один кадр)"],
+    "focus_stacking": ["Включено (Всё резко)", "Выключено (Боке)"],
+    "lens_match_mode": ["Визуально (Feel)", "Строго (Strict)"],
+    "language": ["Русский (ru)", "English (en)"],
+    "platform": ["Web", "iOS", "Android"],
+    "type": ["Photo", "Illustration"],
+    "layout": ["2x3 grid", "3x2 grid", "3 horizontal panels", "2x2 grid"],
+    # Added LENS options for Item 33
+    "lens": ["16mm (Очень широкий)", "24mm (Архитектурный)", "35mm (Глаз человека)", "50mm (Стандарт)", "85mm (Портрет)", "200mm (Телевик)"],
+}
+
+DEFAULT_ENUM_VALUE = {
+    "aspect_ratio": "9:16 (Stories / Reels)",
+    "intensity": "Средняя (Medium)",
+    "level": "Средняя (Medium)",
+    "language": "Русский (ru)",
+    "labels_visibility": "Выкл (Off)",
+    "show_preview": "Нет (Один кадр)",
+    "focus_stacking": "Выключено (Боке)",
+    "lens_match_mode": "Визуально (Feel)",
+    "platform": "Web",
+    "type": "Photo",
+    "layout": "2x3 grid",
+    "lens": "24mm (Архитектурный)",
+}
+
+# --- C. ATTACHMENT CONFIGURATION ---
+IMAGE_FILE_EXTS = ["png", "jpg", "jpeg", "webp"]
+
+ATTACHMENT_VARS = {
+    "image_1", "image_2",
+    "model_image", "clothing_image", "footwear_image", "accessory_image",
+    "element_1", "element_2",
+    "person_image",
+    "people_links"
+}
+
+PROMPT_FIELD_OVERRIDES = {
+    "studio_portrait": {"person": {"attachment": True, "default_src": "Файл"}},
+    "semantic_replacement": {"new_object": {"attachment": True, "default_src": "Ссылка / описание"}},
+    # MOCKUP UPDATE: object_type is now attachable
+    "mockup_generation": {
+        "object_type": {"attachment": True, "default_src": "Файл"},
+        "image_1": {"attachment": True, "default_src": "Файл"} # Forcing logo/design input
+    },
+    "knolling_photography": {"object": {"attachment": True, "default_src": "Файл", "multi": True}},
+    "logo_creative": {"imagery": {"attachment": True, "default_src": "Ссылка / описание", "optional": True}},
+    "character_sheet": {"description": {"attachment": True, "default_src": "Файл"}},
+    "sticker_pack": {"character": {"attachment": True, "default_src": "Файл"}},
+    "comic_page": {"character": {"attachment": True, "default_src": "Файл"}},
+    "storyboard_sequence": {"character_description": {"attachment": True, "default_src": "Файл"}},
+    "seamless_pattern": {"theme": {"attachment": True, "default_src": "Ссылка / описание"}},
+    "isometric_room": {"room": {"attachment": True, "default_src": "Файл"}},
+    "cinematic_atmosphere": {"subject": {"attachment": True, "default_src": "Файл"}},
+    "technical_blueprint": {"object": {"attachment": True, "default_src": "Файл"}},
+    "exploded_view": {"object": {"attachment": True, "default_src": "Файл"}},
+    "anatomical_infographic": {"subject": {"attachment": True, "default_src": "Файл"}},
+    "macro_extreme": {"object": {"attachment": True, "default_src": "Файл"}},
+    "youtube_thumbnail": {"object": {"attachment": True, "default_src": "Файл"}},
+}
+
+OPTIONAL_FIELD_TOGGLES = {
+    ("total_look_builder", "footwear_image"): {"label": "Добавить обувь", "default": True},
+    ("total_look_builder", "accessory_image"): {"label": "Добавить аксессуар", "default": False},
+    ("logo_creative", "imagery"): {"label": "Добавить образ-символ", "default": False},
+    ("macro_extreme", "additional_details"): {"label": "Добавить: Дополнительные детали", "default": False},
+}